@@ -1,4 +1,5 @@
 # Agents module
 from .base_agent import BaseAgent
+from .client_registry import client_registry, OpenRouterClientRegistry
 
-__all__ = ['BaseAgent']
\ No newline at end of file
+__all__ = ['BaseAgent', 'client_registry', 'OpenRouterClientRegistry']
\ No newline at end of file
@@ -1,13 +1,24 @@
 import asyncio
+import functools
 import logging
+import time
+from contextlib import AsyncExitStack
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Tuple
 from datetime import datetime
 import os
-import re
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from utils.text_sanitizer import sanitize_text
+from agents.client_registry import client_registry
+from agents.llm_scheduler import llm_scheduler, PRIORITY_INTERACTIVE
+from agents.model_router import model_router, should_fall_back
+from agents.prompt_cache import cache_request_options, with_cache_breakpoints
+from agents.context_builder import ContextBuilder
+from agents.usage import TurnUsage
+from agents.resilience import (
+    STREAM_RESTART, STREAM_TIMEOUT, OpenedStream, ResumeTrimmer, continuation_messages, hedge_policy, open_hedged,
+    retry_policy, supports_prefill
+)
 
 # Load environment variables
 load_dotenv()
@@ -19,7 +30,9 @@ class BaseAgent:
     """Base class for all agents in the SCP writer system using OpenRouter."""
     
     def __init__(self, name: str, system_prompt: str, orchestrator_callback=None, model: Optional[str] = None, 
-                 api_key: Optional[str] = None, session_manager=None, session_id: Optional[str] = None):
+                 api_key: Optional[str] = None, session_manager=None, session_id: Optional[str] = None,
+                 priority: int = PRIORITY_INTERACTIVE, prompt_cache_key: Optional[str] = None,
+                 system_prefix_length: Optional[int] = None):
         self.name = name
         self.system_prompt = system_prompt
         self.conversation_history: List[Dict[str, str]] = []
@@ -28,22 +41,32 @@ class BaseAgent:
         self.session_manager = session_manager
         self.session_id = session_id
         
-        # Initialize OpenAI client with OpenRouter configuration
-        # Use provided API key or fall back to environment variable
-        self.client = AsyncOpenAI(
-            api_key=api_key or os.getenv("OPENROUTER_API_KEY"),
-            base_url="https://openrouter.ai/api/v1",
-            default_headers={
-                "HTTP-Referer": "https://plotcraft.up.railway.app",
-                "X-Title": "PlotCraft"
-            }
-        )
+        # Use provided API key or fall back to environment variable.
+        # The OpenRouter client itself is shared per key via the client registry.
+        self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
+        
+        # Provided model first, then this role's fallback chain (WRITER_MODELS etc.),
+        # then OPENROUTER_MODEL or the default. The router may reorder the chain per call.
+        self.model_chain = model_router.chain_for(name, model)
+        self.model = self.model_chain[0]
+        # A model chosen for the story is only fallen back from once it fails
+        self.pinned_model = model
+        # The model that answered the latest call, after any fallback
+        self.served_model: Optional[str] = None
+        
+        # Keeps each prompt within the model's token budget
+        self.context_builder = ContextBuilder(self.model)
+        
+        # Scheduling priority of this agent's model calls (lower is served first)
+        self.priority = priority
+        
+        # The first system_prefix_length characters of the system prompt are shared
+        # with other stories of the same theme configuration, identified by prompt_cache_key
+        self.prompt_cache_key = prompt_cache_key
+        self.system_prefix_length = system_prefix_length
         
-        # Use provided model or fall back to environment variable or default
-        if model:
-            self.model = model
-        else:
-            self.model = os.getenv("OPENROUTER_MODEL", "google/gemini-2.5-flash")
+        # Token usage and timings of the most recent model call
+        self.last_usage: Optional[TurnUsage] = None
         
     def _format_timestamp(self) -> str:
         """Generate a formatted timestamp for messages."""
@@ -83,7 +106,14 @@ class BaseAgent:
             self.logger.info(f"Appended message to session {self.session_id}")
     
     def _build_messages(self, trigger_message: str, include_output: bool = False) -> List[Dict[str, str]]:
-        """Build the message history for the API call."""
+        """
+        Build the message history for the API call.
+        
+        Messages run from most to least stable (system prompt, conversation
+        history, then this turn's context and trigger) so the provider's prompt
+        cache can reuse the longest possible prefix between turns; cache
+        breakpoints are added per model when the request is sent.
+        """
         messages = []
         
         # Add system prompt
@@ -92,17 +122,26 @@ class BaseAgent:
             "content": self.system_prompt
         })
         
-        # Add conversation history
-        for msg in self.conversation_history:
-            messages.append(msg)
-        
-        # Build context from discussion and optionally output file
+        # Build context from discussion and optionally output file. The context
+        # builder trims history, drops duplicated turns and summarizes older ones
+        # so the prompt stays within the model's token budget.
         discussion_content = self._read_discussion_content()
-        context = f"Current discussion:\n{discussion_content}"
+        output_content = self._read_output_file() if include_output else None
+        latest_story = None
+        if self.session_manager and self.session_id:
+            latest_story = self.session_manager.extract_story_from_draft(self.session_id) or ""
+        history, context = self.context_builder.build(
+            self.system_prompt,
+            self.conversation_history,
+            discussion_content,
+            trigger_message,
+            output_content,
+            latest_story
+        )
         
-        if include_output:
-            output_content = self._read_output_file()
-            context += f"\n\nCurrent story output:\n{output_content}"
+        # Add conversation history
+        for msg in history:
+            messages.append(msg)
         
         # Create the user message with context and trigger
         user_content = f"""
@@ -123,7 +162,149 @@ Use ---BEGIN STORY--- and ---END STORY--- markers when sharing story content.
         
         return messages
     
-    async def respond(self, trigger_message: str, include_output: bool = False, skip_callback: bool = False, stream_output: bool = True) -> str:
+    async def _open_stream(self, model: str, messages: List[Dict[str, str]]) -> OpenedStream:
+        """
+        Start one completion request and wait for its first content.
+        
+        The scheduler slot and client lease are held by the returned stream
+        until it is closed.
+        """
+        stack = AsyncExitStack()
+        try:
+            await stack.enter_async_context(llm_scheduler.slot(self.api_key, self.priority))
+            client = await stack.enter_async_context(client_registry.lease(self.api_key))
+            started = time.perf_counter()
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=with_cache_breakpoints(messages, model, self.system_prefix_length),
+                stream=True,
+                temperature=0.7,
+                max_tokens=4000,
+                stream_options={"include_usage": True},
+                extra_body={"usage": {"include": True}, **cache_request_options(model, self.prompt_cache_key)},
+                timeout=STREAM_TIMEOUT
+            )
+            stack.push_async_callback(stream.close)
+            opened = OpenedStream(stack, stream)
+            await opened.read_first_content()
+            ttft = time.perf_counter() - started
+            hedge_policy.record(model, ttft)
+            model_router.record_ttft(model, ttft)
+            return opened
+        except BaseException:
+            await stack.aclose()
+            raise
+    
+    async def _stream_completion(self, messages: List[Dict[str, str]],
+                                 on_chunk: Optional[Callable[[str], None]] = None):
+        """
+        Stream a chat completion on the shared client, yielding content chunks.
+        
+        Token usage (requested via stream_options and OpenRouter usage accounting)
+        and timings are recorded on ``self.last_usage`` once the stream ends. Each
+        request waits for a slot from the process-wide LLM scheduler first.
+        
+        Transient failures are retried with backoff. A request that is slow to
+        produce its first token may be hedged with a second one. If the stream
+        breaks after content was yielded, models that honour a pre-filled
+        assistant turn are asked to continue from the partial response, so
+        callers never see a chunk twice; for other models the turn starts over
+        and ``STREAM_RESTART`` is yielded first, telling callers to discard the
+        text received so far. When a model keeps failing, the call moves on to
+        the next model in the agent's fallback chain.
+        """
+        models = model_router.order(self.model_chain, self.name, self.pinned_model)
+        model_index = 0
+        model = models[0]
+        usage = TurnUsage(model)
+        self.last_usage = None
+        response_text = ""
+        request_messages = messages
+        attempt = 0
+        
+        while True:
+            trimmer = ResumeTrimmer(response_text) if response_text else None
+            sent_before = len(response_text)
+            try:
+                opened = await open_hedged(
+                    functools.partial(self._open_stream, model, request_messages),
+                    hedge_policy.delay_for(model), hedge_policy
+                )
+                usage.model = model
+                try:
+                    async for chunk in opened.chunks():
+                        # The final usage chunk carries no choices
+                        if chunk.usage:
+                            usage.record(chunk.usage)
+                        if not chunk.choices:
+                            continue
+                        text = chunk.choices[0].delta.content
+                        if text and trimmer:
+                            text = trimmer.feed(text)
+                        if text:
+                            usage.mark_token()
+                            response_text += text
+                            if on_chunk:
+                                on_chunk(text)
+                            yield text
+                finally:
+                    await opened.aclose()
+                text = trimmer.flush() if trimmer else ""
+                if text:
+                    usage.mark_token()
+                    response_text += text
+                    if on_chunk:
+                        on_chunk(text)
+                    yield text
+                break
+            except Exception as e:
+                if should_fall_back(e):
+                    model_router.record_failure(model)
+                # A stream that made progress before breaking starts a fresh retry budget
+                if len(response_text) > sent_before:
+                    attempt = 0
+                delay = retry_policy.retry_delay(e, attempt)
+                if delay is None:
+                    if model_index + 1 >= len(models) or not should_fall_back(e):
+                        raise
+                    model_index += 1
+                    self.logger.warning(f"{model} failed ({type(e).__name__}: {e}); "
+                                        f"falling back to {models[model_index]}")
+                    model = models[model_index]
+                    attempt = 0
+                    delay = 0.0
+                else:
+                    attempt += 1
+                if response_text and supports_prefill(model):
+                    retry_policy.resumes += 1
+                    request_messages = continuation_messages(messages, response_text)
+                elif response_text:
+                    # Without prefill the model would answer from the top again
+                    retry_policy.restarts += 1
+                    usage.restarts += 1
+                    response_text = ""
+                    request_messages = messages
+                    yield STREAM_RESTART
+                if delay:
+                    self.logger.warning(
+                        f"Model call failed ({type(e).__name__}: {e}); retry {attempt} in {delay:.2f}s"
+                        f"{f' resuming after {len(response_text)} characters' if response_text else ''}"
+                    )
+                    await asyncio.sleep(delay)
+        
+        prompt_text = "".join(message["content"] for message in messages)
+        self.last_usage = usage.finish(prompt_text, response_text)
+        self.served_model = model
+        model_router.record_success(model, usage.completion_tokens, usage.generation_time)
+        self.logger.info(
+            f"Usage: {usage.prompt_tokens} prompt ({usage.cached_tokens} cached, "
+            f"{usage.cache_hit_rate:.0%} hit) + "
+            f"{usage.completion_tokens} completion tokens"
+            f"{' (estimated)' if usage.estimated else ''}"
+        )
+    
+    async def respond(self, trigger_message: str, include_output: bool = False, skip_callback: bool = False, stream_output: bool = True,
+                      on_chunk: Optional[Callable[[str], None]] = None, record: bool = True) -> str:
         """
         Generate a response based on the trigger message and current context.
         
@@ -132,6 +313,10 @@ Use ---BEGIN STORY--- and ---END STORY--- markers when sharing story content.
             include_output: Whether to include the story output file in context
             skip_callback: Whether to skip triggering the orchestrator callback
             stream_output: Whether to print response in real-time as it streams
+            on_chunk: Optional callback invoked with each streamed text chunk
+            record: Whether to add the response to the conversation; if False,
+                the caller adds the final text itself with ``record_response``
+                (or drops it with ``discard_response``)
             
         Returns:
             The agent's response
@@ -146,22 +331,16 @@ Use ---BEGIN STORY--- and ---END STORY--- markers when sharing story content.
             
             response_text = ""
             
-            # Make the API call with streaming
-            stream = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                stream=True,
-                temperature=0.7,
-                max_tokens=4000
-            )
-            
-            # Process the stream
-            async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    text = chunk.choices[0].delta.content
+            # Stream the completion from the shared client
+            async for text in self._stream_completion(messages, on_chunk):
+                if text is STREAM_RESTART:
                     if stream_output:
-                        print(text, end="", flush=True)
-                    response_text += text
+                        print(f"\n[{self.name} restarting response]\n{self.name}: ", end="", flush=True)
+                    response_text = ""
+                    continue
+                if stream_output:
+                    print(text, end="", flush=True)
+                response_text += text
             
             if stream_output:
                 print()  # New line after streaming completes
@@ -169,31 +348,11 @@ Use ---BEGIN STORY--- and ---END STORY--- markers when sharing story content.
             # Clean up response text
             response_text = response_text.strip()
             
-            # Add to conversation history
-            self.conversation_history.append({
-                "role": "user",
-                "content": trigger_message
-            })
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": response_text
-            })
-            
-            # Limit conversation history to prevent token overflow
-            # Keep system prompt + last 10 exchanges (20 messages)
-            if len(self.conversation_history) > 20:
-                self.conversation_history = self.conversation_history[-20:]
-            
             # Log the interaction
             self.logger.info(f"Generated response of {len(response_text)} characters")
             
-            # Only write non-empty responses to discussion file
-            if response_text:
-                await self._append_to_discussion(response_text)
-                
-                # Notify orchestrator if callback is set and not skipped
-                if self.orchestrator_callback and not skip_callback:
-                    await self.orchestrator_callback(self.name, response_text)
+            if record:
+                await self.record_response(trigger_message, response_text, skip_callback)
             
             return response_text
             
@@ -201,7 +360,8 @@ Use ---BEGIN STORY--- and ---END STORY--- markers when sharing story content.
             self.logger.error(f"Error generating response: {e}")
             raise
     
-    async def respond_streaming(self, trigger_message: str, include_output: bool = False, skip_callback: bool = False):
+    async def respond_streaming(self, trigger_message: str, include_output: bool = False, skip_callback: bool = False,
+                                on_chunk: Optional[Callable[[str], None]] = None, record: bool = True):
         """
         Generate a streaming response based on the trigger message and current context.
         Yields chunks of text as they arrive from the API.
@@ -210,64 +370,101 @@ Use ---BEGIN STORY--- and ---END STORY--- markers when sharing story content.
             trigger_message: The message that triggered this response
             include_output: Whether to include the story output file in context
             skip_callback: Whether to skip triggering the orchestrator callback
+            on_chunk: Optional callback invoked with each streamed text chunk
+            record: Whether to add the response to the conversation (see ``respond``)
             
         Yields:
-            Text chunks as they arrive
+            Text chunks as they arrive, or ``STREAM_RESTART`` if the response
+            had to start over and the chunks so far should be discarded
         """
         try:
             # Build messages for the API call
             messages = self._build_messages(trigger_message, include_output)
             
-            # Make the API call with streaming
-            stream = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                stream=True,
-                temperature=0.7,
-                max_tokens=4000
-            )
-            
             response_text = ""
             
-            # Process and yield chunks
-            async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    text = chunk.choices[0].delta.content
+            # Stream the completion from the shared client and yield chunks
+            async for text in self._stream_completion(messages, on_chunk):
+                if text is STREAM_RESTART:
+                    response_text = ""
+                else:
                     response_text += text
-                    yield text
+                yield text
             
             # Clean up response text
             response_text = response_text.strip()
             
-            # Add to conversation history
-            self.conversation_history.append({
-                "role": "user",
-                "content": trigger_message
-            })
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": response_text
-            })
-            
-            # Limit conversation history to prevent token overflow
-            if len(self.conversation_history) > 20:
-                self.conversation_history = self.conversation_history[-20:]
-            
             # Log the interaction
             self.logger.info(f"Generated streaming response of {len(response_text)} characters")
             
-            # Only write non-empty responses to discussion file
-            if response_text:
-                await self._append_to_discussion(response_text)
-                
-                # Notify orchestrator if callback is set and not skipped
-                if self.orchestrator_callback and not skip_callback:
-                    await self.orchestrator_callback(self.name, response_text)
+            if record:
+                await self.record_response(trigger_message, response_text, skip_callback)
             
         except Exception as e:
             self.logger.error(f"Error generating streaming response: {e}")
             raise
     
+    async def generate(self, trigger_message: str, include_output: bool = False) -> Tuple[str, Optional[TurnUsage]]:
+        """
+        Generate a candidate response without adding it to the conversation.
+        
+        Several candidates for one turn can be generated concurrently; the one
+        that is kept is then added with ``record_response``.
+        
+        Args:
+            trigger_message: The message that triggered this response
+            include_output: Whether to include the story output file in context
+            
+        Returns:
+            The response and the token usage of its model call
+        """
+        messages = self._build_messages(trigger_message, include_output)
+        response_text = ""
+        async for text in self._stream_completion(messages):
+            response_text = "" if text is STREAM_RESTART else response_text + text
+        # Concurrent calls each set last_usage when their stream ends; nothing
+        # is awaited between that and here, so this is still this call's usage
+        return response_text.strip(), self.last_usage
+    
+    async def record_response(self, trigger_message: str, response_text: str, skip_callback: bool = False):
+        """
+        Add a response to the conversation history and the session discussion.
+        
+        Args:
+            trigger_message: The message that triggered the response
+            response_text: The response to keep
+            skip_callback: Whether to skip triggering the orchestrator callback
+        """
+        self.conversation_history.append({
+            "role": "user",
+            "content": trigger_message
+        })
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": response_text
+        })
+        
+        # Limit conversation history to prevent token overflow
+        # Keep system prompt + last 10 exchanges (20 messages)
+        if len(self.conversation_history) > 20:
+            self.conversation_history = self.conversation_history[-20:]
+        
+        # Only write non-empty responses to discussion file
+        if response_text:
+            await self._append_to_discussion(response_text)
+            
+            # Notify orchestrator if callback is set and not skipped
+            if self.orchestrator_callback and not skip_callback:
+                await self.orchestrator_callback(self.name, response_text)
+    
+    async def discard_response(self):
+        """
+        Drop a response generated with ``record=False`` instead of recording it.
+        
+        Nothing was added to the conversation, so there is nothing to undo
+        here; wrappers that already showed the response override this.
+        """
+    
     async def continue_session(self, new_prompt: str) -> str:
         """Continue the conversation with a new prompt."""
         # Since we maintain conversation history, this is just a regular respond call
@@ -280,4 +477,9 @@ Use ---BEGIN STORY--- and ---END STORY--- markers when sharing story content.
             "model": self.model,
             "message_count": len(self.conversation_history),
             "history": self.conversation_history
-        }
\ No newline at end of file
+        }
+    
+    @property
+    def client(self):
+        """The pooled OpenRouter client shared by every agent using this API key."""
+        return client_registry.get_client(self.api_key)
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""Process-wide registry of pooled OpenRouter clients keyed by API key."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_HEADERS = {
+    "HTTP-Referer": "https://plotcraft.up.railway.app",
+    "X-Title": "PlotCraft"
+}
+
+
+class _PooledClient:
+    """A cached client plus the bookkeeping needed for safe eviction."""
+
+    def __init__(self, client: AsyncOpenAI):
+        self.client = client
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.evicted = False
+
+
+class OpenRouterClientRegistry:
+    """
+    Shares one AsyncOpenAI client (and its keep-alive connection pool) per API key.
+
+    Clients are kept in LRU order. When the registry is over capacity, or a client
+    has been idle longer than ``idle_ttl`` seconds, it is evicted. A client that is
+    still streaming when evicted is closed once its last lease is released.
+    """
+
+    def __init__(self, max_clients: int = 64, idle_ttl: float = 900.0,
+                 max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 60.0):
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._clients: "OrderedDict[str, _PooledClient]" = OrderedDict()
+        self._pending_close: set = set()
+
+    @staticmethod
+    def _cache_key(api_key: Optional[str]) -> str:
+        """Hash the API key so raw secrets are never used as dict keys or logged."""
+        return hashlib.sha256((api_key or "").encode()).hexdigest()
+
+    def _create_client(self, api_key: Optional[str]) -> AsyncOpenAI:
+        return AsyncOpenAI(
+            api_key=api_key,
+            base_url=OPENROUTER_BASE_URL,
+            default_headers=OPENROUTER_HEADERS,
+            # Retries are handled by the agents' retry policy (agents/resilience.py)
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(limits=self.limits)
+        )
+
+    def _get_entry(self, api_key: Optional[str]) -> _PooledClient:
+        cache_key = self._cache_key(api_key)
+        entry = self._clients.get(cache_key)
+        if entry is None:
+            entry = _PooledClient(self._create_client(api_key))
+            self._clients[cache_key] = entry
+            logger.info(f"Created pooled OpenRouter client ({len(self._clients)} cached)")
+        else:
+            self._clients.move_to_end(cache_key)
+        entry.last_used = time.monotonic()
+        self._evict_idle()
+        return entry
+
+    def get_client(self, api_key: Optional[str]) -> AsyncOpenAI:
+        """Return the shared client for an API key, creating it on first use."""
+        return self._get_entry(api_key).client
+
+    @asynccontextmanager
+    async def lease(self, api_key: Optional[str]):
+        """Borrow the shared client for the duration of a request or stream."""
+        entry = self._get_entry(api_key)
+        entry.in_use += 1
+        try:
+            yield entry.client
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            if entry.evicted and entry.in_use == 0:
+                self._schedule_close(entry)
+
+    def _evict_idle(self) -> None:
+        """Evict clients idle past the TTL, then least-recently-used ones over capacity."""
+        now = time.monotonic()
+        for cache_key, entry in list(self._clients.items()):
+            if entry.in_use == 0 and now - entry.last_used > self.idle_ttl:
+                self._evict(cache_key)
+
+        for cache_key in list(self._clients.keys()):
+            if len(self._clients) <= self.max_clients:
+                break
+            self._evict(cache_key)
+
+    def _evict(self, cache_key: str) -> None:
+        entry = self._clients.pop(cache_key)
+        entry.evicted = True
+        if entry.in_use == 0:
+            self._schedule_close(entry)
+        logger.info(f"Evicted pooled OpenRouter client ({len(self._clients)} cached)")
+
+    def _schedule_close(self, entry: _PooledClient) -> None:
+        try:
+            task = asyncio.get_running_loop().create_task(entry.client.close())
+        except RuntimeError:
+            # No running loop (e.g. interpreter shutdown) - let GC reclaim the pool
+            return
+        self._pending_close.add(task)
+        task.add_done_callback(self._pending_close.discard)
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache statistics for health reporting."""
+        return {
+            "cached_clients": len(self._clients),
+            "clients_in_use": sum(1 for entry in self._clients.values() if entry.in_use)
+        }
+
+    async def aclose(self) -> None:
+        """Close every cached client. Called from the FastAPI lifespan on shutdown."""
+        entries = list(self._clients.values())
+        self._clients.clear()
+        for entry in entries:
+            entry.evicted = True
+            try:
+                await entry.client.close()
+            except Exception as e:
+                logger.error(f"Error closing OpenRouter client: {e}")
+        if self._pending_close:
+            await asyncio.gather(*self._pending_close, return_exceptions=True)
+        logger.info(f"Closed {len(entries)} pooled OpenRouter clients")
+
+
+# Global instance
+client_registry = OpenRouterClientRegistry(
+    max_clients=int(os.getenv("OPENROUTER_MAX_CLIENTS", "64")),
+    idle_ttl=float(os.getenv("OPENROUTER_CLIENT_IDLE_TTL", "900")),
+    max_connections=int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "10"))
+)
@@ -0,0 +1,256 @@
+"""Token-budgeted prompt context assembly for agents."""
+
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from agents.signal_detector import PHRASES, SPEAKER_PATTERNS
+from utils.text_sanitizer import sanitize_text
+
+logger = logging.getLogger(__name__)
+
+# Prompt token budgets by model id prefix. These sit well below each provider's
+# context window so the completion (max_tokens=4000) always fits.
+MODEL_PROMPT_BUDGETS: Dict[str, int] = {
+    "google/gemini": 48000,
+    "anthropic/": 32000,
+    "openai/gpt-4.1": 32000,
+    "openai/": 24000,
+    "meta-llama/": 16000,
+    "mistralai/": 16000,
+    "deepseek/": 24000,
+}
+DEFAULT_PROMPT_BUDGET = 16000
+
+STORY_PATTERN = re.compile(r'---BEGIN STORY---\s*(.*?)\s*---END STORY---', re.DOTALL)
+ENTRY_HEADER_PATTERN = re.compile(r'\n## \[([^\]\n]+)\] - \[([^\]\n]+)\]\n')
+ENTRY_FOOTER = "\n---\n"
+
+SUMMARY_CHARS = 240
+RECENT_ENTRIES = 6
+
+# Lines a summary keeps even when the rest of the turn is cut: its outcome
+# (approval, objections, completion) and who it hands off to
+OUTCOME_PHRASES = tuple(
+    phrase for signal in ("completion", "approval", "technical_review_passed", "conflict", "outline_approval")
+    for phrase in PHRASES[signal]
+)
+HANDOFF_PATTERN = re.compile("|".join(SPEAKER_PATTERNS[:3]), re.IGNORECASE)
+KEY_LINE_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English prose)."""
+    return len(text) // 4 + 1 if text else 0
+
+
+def _normalize(text: str) -> str:
+    """Sanitized text with whitespace collapsed, for comparing history and discussion."""
+    return " ".join(sanitize_text(text).split())
+
+
+def _shorten(text: str, limit: int) -> str:
+    return text[:limit].rsplit(" ", 1)[0] + "..." if len(text) > limit else text
+
+
+def key_lines(body: str) -> List[str]:
+    """The lines of a discussion entry that state its outcome or hand off to another agent."""
+    lines = []
+    for line in body.splitlines():
+        line = " ".join(line.split())
+        lowered = line.lower()
+        if line and (HANDOFF_PATTERN.search(line) or any(phrase in lowered for phrase in OUTCOME_PHRASES)):
+            lines.append(_shorten(line, KEY_LINE_CHARS))
+    return lines
+
+
+def get_prompt_budget(model: Optional[str]) -> int:
+    """Return the prompt token budget for a model, honoring CONTEXT_TOKEN_BUDGET."""
+    override = os.getenv("CONTEXT_TOKEN_BUDGET")
+    if override:
+        return int(override)
+    if model:
+        # Longest matching prefix wins so "openai/gpt-4.1" beats "openai/"
+        for prefix in sorted(MODEL_PROMPT_BUDGETS, key=len, reverse=True):
+            if model.startswith(prefix):
+                return MODEL_PROMPT_BUDGETS[prefix]
+    return DEFAULT_PROMPT_BUDGET
+
+
+class DiscussionEntry:
+    """A single message parsed out of the accumulated session discussion."""
+
+    def __init__(self, speaker: Optional[str], timestamp: Optional[str], body: str):
+        self.speaker = speaker
+        self.timestamp = timestamp
+        self.body = body
+
+    @property
+    def key(self) -> Tuple[Optional[str], Optional[str], int]:
+        return (self.speaker, self.timestamp, len(self.body))
+
+    def render(self) -> str:
+        if self.speaker:
+            return f"## [{self.speaker}] - [{self.timestamp}]\n{self.body}"
+        return self.body
+
+
+def parse_discussion(discussion: str) -> List[DiscussionEntry]:
+    """Split the discussion written by BaseAgent._append_to_discussion into entries."""
+    entries: List[DiscussionEntry] = []
+    headers = list(ENTRY_HEADER_PATTERN.finditer(discussion))
+
+    # Anything before the first header (e.g. a raw draft saved by the coordinator)
+    leading = discussion[:headers[0].start()] if headers else discussion
+    if leading.strip():
+        entries.append(DiscussionEntry(None, None, leading.strip()))
+
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(discussion)
+        body = discussion[header.end():end]
+        if body.endswith(ENTRY_FOOTER):
+            body = body[:-len(ENTRY_FOOTER)]
+        entries.append(DiscussionEntry(header.group(1), header.group(2), body.strip()))
+
+    return entries
+
+
+class ContextBuilder:
+    """
+    Builds the per-turn user context for an agent within a model token budget.
+
+    The latest story draft is always kept verbatim. Discussion entries already
+    present in the agent's own conversation history (or the trigger message) are
+    dropped, the most recent remaining entries are kept verbatim, and everything
+    older is folded into a rolling one-line-per-turn summary that is cached
+    between turns.
+    """
+
+    def __init__(self, model: Optional[str] = None, max_prompt_tokens: Optional[int] = None,
+                 recent_entries: int = RECENT_ENTRIES):
+        self.model = model
+        self.max_prompt_tokens = max_prompt_tokens or get_prompt_budget(model)
+        self.recent_entries = recent_entries
+        self._summary_cache: Dict[Tuple[Optional[str], Optional[str], int], str] = {}
+        self._normalized_cache: Dict[Tuple[Optional[str], Optional[str], int], str] = {}
+        self.last_prompt_tokens = 0
+
+    def summarize_entry(self, entry: DiscussionEntry) -> str:
+        """
+        Return a cached one-line summary of a discussion entry.
+
+        Long entries are cut to their opening, followed by any outcome and
+        handoff lines the cut removed.
+        """
+        summary = self._summary_cache.get(entry.key)
+        if summary is None:
+            body = STORY_PATTERN.sub(
+                lambda m: f"(story draft, {len(m.group(1).split())} words)", entry.body
+            )
+            flat = " ".join(body.split())
+            if len(flat) > SUMMARY_CHARS:
+                opening = _shorten(flat, SUMMARY_CHARS)
+                flat = " / ".join([opening] + [line for line in key_lines(body) if line not in opening])
+            body = flat
+            speaker = entry.speaker or "Draft"
+            summary = f"- [{speaker}]: {body}"
+            self._summary_cache[entry.key] = summary
+        return summary
+
+    def _normalized_body(self, entry: DiscussionEntry) -> str:
+        """An entry's normalized body, cached between turns like its summary."""
+        normalized = self._normalized_cache.get(entry.key)
+        if normalized is None:
+            normalized = _normalize(entry.body)
+            self._normalized_cache[entry.key] = normalized
+        return normalized
+
+    def _fit_history(self, history: List[Dict[str, str]], budget: int) -> List[Dict[str, str]]:
+        """Drop the oldest exchanges until the history fits its share of the budget."""
+        kept = list(history)
+        while kept and sum(estimate_tokens(m["content"]) for m in kept) > budget:
+            kept = kept[2:] if len(kept) > 1 else []
+        return kept
+
+    def build(self, system_prompt: str, history: List[Dict[str, str]], discussion: str,
+              trigger_message: str, output_content: Optional[str] = None,
+              latest_story: Optional[str] = None) -> Tuple[List[Dict[str, str]], str]:
+        """
+        Fit history and discussion into the budget.
+        
+        ``latest_story`` can be passed when the caller already knows it (the
+        session manager caches it per draft version) to skip rescanning.
+
+        Returns:
+            Tuple of (history messages to send, context text for the user message)
+        """
+        if latest_story is None:
+            stories = STORY_PATTERN.findall(discussion)
+            latest_story = stories[-1].strip() if stories else ""
+
+        fixed_tokens = (estimate_tokens(system_prompt) + estimate_tokens(trigger_message) +
+                        estimate_tokens(latest_story) + estimate_tokens(output_content or "") + 200)
+        available = max(self.max_prompt_tokens - fixed_tokens, 0)
+        remaining = available
+
+        # History gets up to half of what is left; discussion gets the rest
+        kept_history = self._fit_history(history, remaining // 2)
+        remaining -= sum(estimate_tokens(m["content"]) for m in kept_history)
+
+        # Skip entries the model will already see verbatim. Discussion entries
+        # are stored sanitized, so both sides are normalized the same way
+        seen_texts = [_normalize(m["content"]) for m in kept_history] + [_normalize(trigger_message)]
+        entries = []
+        for entry in parse_discussion(discussion):
+            if not entry.body:
+                continue
+            body = self._normalized_body(entry)
+            if not any(body in text for text in seen_texts):
+                entries.append(entry)
+
+        # Keep the newest entries verbatim while they fit, summarizing the rest
+        recent: List[str] = []
+        split_at = len(entries)
+        for entry in reversed(entries):
+            rendered = STORY_PATTERN.sub("(story draft - latest version shown below)", entry.render())
+            cost = estimate_tokens(rendered)
+            if cost > remaining or len(recent) >= self.recent_entries:
+                break
+            recent.append(rendered)
+            remaining -= cost
+            split_at -= 1
+        recent.reverse()
+
+        summary_lines: List[str] = []
+        for entry in reversed(entries[:split_at]):
+            line = self.summarize_entry(entry)
+            cost = estimate_tokens(line)
+            if cost > remaining:
+                break
+            summary_lines.append(line)
+            remaining -= cost
+        summary_lines.reverse()
+        omitted = split_at - len(summary_lines)
+
+        sections = []
+        if summary_lines or omitted:
+            summary = "\n".join(summary_lines)
+            if omitted:
+                summary = f"({omitted} earlier turns omitted)\n{summary}"
+            sections.append(f"Summary of earlier discussion:\n{summary}")
+        if recent:
+            sections.append("Recent messages:\n" + "\n\n".join(recent))
+        if latest_story:
+            sections.append(f"Latest story draft:\n---BEGIN STORY---\n{latest_story}\n---END STORY---")
+
+        context = "Current discussion:\n" + "\n\n".join(sections)
+        if output_content is not None:
+            context += f"\n\nCurrent story output:\n{output_content}"
+
+        self.last_prompt_tokens = fixed_tokens + available - remaining
+        logger.debug(
+            f"Built context for {self.model}: ~{self.last_prompt_tokens} tokens, "
+            f"{len(recent)} verbatim, {len(summary_lines)} summarized, {omitted} omitted"
+        )
+        return kept_history, context
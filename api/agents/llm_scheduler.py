@@ -0,0 +1,168 @@
+"""Process-wide admission control for OpenRouter completion calls."""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "batch": PRIORITY_BATCH}
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token, returning how long to wait before it may be used."""
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    @property
+    def idle_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class LLMScheduler:
+    """
+    Bounds how many completions the process streams at once and how fast any
+    single API key may start new ones.
+
+    Each call first takes a token from its key's bucket (waiting for a refill
+    if the key is over its rate), then waits for one of ``max_in_flight``
+    global slots. Waiting calls are granted slots by priority, then FIFO, so
+    interactive sessions overtake batch work queued behind them.
+    """
+
+    def __init__(self, max_in_flight: int = 32, rate_per_key: float = 2.0, burst_per_key: float = 6.0,
+                 wait_samples: int = 1000):
+        self.max_in_flight = max_in_flight
+        self.rate_per_key = rate_per_key
+        self.burst_per_key = burst_per_key
+        self._in_flight = 0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waits: deque = deque(maxlen=wait_samples)
+        self.granted = 0
+        self.rate_limited = 0
+
+    @staticmethod
+    def _bucket_key(api_key: Optional[str]) -> str:
+        return hashlib.sha256((api_key or "").encode()).hexdigest()
+
+    def _bucket(self, api_key: Optional[str]) -> TokenBucket:
+        key = self._bucket_key(api_key)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) > 1000:
+                # Drop buckets that have refilled completely; they carry no state
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.idle_full}
+            bucket = self._buckets[key] = TokenBucket(self.rate_per_key, self.burst_per_key)
+        return bucket
+
+    def _live_waiters(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def _acquire(self, priority: int) -> None:
+        if self._in_flight < self.max_in_flight and not self._live_waiters():
+            self._in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled; pass it on
+                self._release()
+            else:
+                future.cancel()
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        while self._waiters and self._in_flight < self.max_in_flight:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._in_flight += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, api_key: Optional[str], priority: int = PRIORITY_INTERACTIVE):
+        """
+        Hold a completion slot for the duration of a request or stream.
+
+        Args:
+            api_key: The OpenRouter key the call is made with (rate limited per key)
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH; lower is served first
+        """
+        start = time.monotonic()
+        if self.rate_per_key > 0:
+            delay = self._bucket(api_key).reserve()
+            if delay > 0:
+                self.rate_limited += 1
+                await asyncio.sleep(delay)
+        await self._acquire(priority)
+        self._waits.append(time.monotonic() - start)
+        self.granted += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict:
+        """Return queue depth and wait-time metrics for health reporting."""
+        live = [(priority, future) for priority, _, future in self._waiters if not future.done()]
+        waits = sorted(self._waits)
+
+        def percentile(pct: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(pct / 100 * len(waits)))] * 1000, 1)
+
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(live),
+            "queue_depth_by_priority": {
+                name: sum(1 for priority, _ in live if priority == value)
+                for name, value in PRIORITIES.items()
+            },
+            "granted": self.granted,
+            "rate_limited": self.rate_limited,
+            "wait_p50_ms": percentile(50),
+            "wait_p99_ms": percentile(99),
+            "wait_max_ms": round(waits[-1] * 1000, 1) if waits else 0.0
+        }
+
+
+# Global instance
+llm_scheduler = LLMScheduler(
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "32")),
+    rate_per_key=float(os.getenv("LLM_RATE_PER_KEY", "2")),
+    burst_per_key=float(os.getenv("LLM_BURST_PER_KEY", "6"))
+)
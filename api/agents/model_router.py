@@ -0,0 +1,203 @@
+"""Per-role model chains ordered by observed latency, throughput and errors."""
+
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import openai
+
+from agents.resilience import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "google/gemini-2.5-flash"
+
+# Reader and Expert turns are short, so time to first token dominates; Writer
+# turns are long drafts, so sustained tokens/sec matters more
+ROLE_PROFILES = {"Writer": "throughput", "Reader": "latency", "Expert": "latency"}
+
+
+def _parse_chain(value: Optional[str]) -> List[str]:
+    return [model.strip() for model in (value or "").split(",") if model.strip()]
+
+
+def should_fall_back(error: Exception) -> bool:
+    """
+    Whether a failed call should move on to the next model in the chain.
+
+    Transient failures that outlasted their retries, and errors saying the
+    model itself is unknown or unavailable, fall back; errors tied to the
+    user's key or request (auth, credits, bad input) would fail on every
+    model and do not.
+    """
+    if RetryPolicy.classify(error) is not None:
+        return True
+    if isinstance(error, openai.NotFoundError):
+        return True
+    # OpenRouter answers an invalid or retired model ID with a 400
+    return isinstance(error, openai.BadRequestError) and "model" in str(error).lower()
+
+
+class ModelStats:
+    """Rolling TTFT and throughput samples plus failure state for one model."""
+
+    def __init__(self, window: int):
+        self.ttft: deque = deque(maxlen=window)
+        self.tokens_per_second: deque = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.updated_at = 0.0
+
+    @staticmethod
+    def _median(samples: deque) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[len(ordered) // 2]
+
+    @property
+    def ttft_p50(self) -> Optional[float]:
+        return self._median(self.ttft)
+
+    @property
+    def tokens_per_second_p50(self) -> Optional[float]:
+        return self._median(self.tokens_per_second)
+
+
+class ModelRouter:
+    """
+    Chooses which model each agent role calls, in what fallback order.
+
+    Every role has a chain of models (``WRITER_MODELS``, ``READER_MODELS``,
+    ``EXPERT_MODELS``, falling back to ``OPENROUTER_MODEL``). Before each call
+    the chain is reordered: models in an error cooldown go last, and models
+    whose rolling median misses the role's budget (TTFT for latency-sensitive
+    roles, tokens/sec for throughput-bound ones) go after those that meet it
+    or have not been measured yet. Otherwise the configured order is kept.
+    A model the user chose for the story is always tried first; the chain
+    only takes over once it fails.
+    """
+
+    def __init__(self, role_chains: Optional[Dict[str, List[str]]] = None, default_model: str = DEFAULT_MODEL,
+                 max_ttft: float = 8.0, min_tokens_per_second: float = 15.0, min_samples: int = 5,
+                 failure_threshold: int = 3, cooldown: float = 120.0, window: int = 50):
+        self.role_chains = {role: chain for role, chain in (role_chains or {}).items() if chain}
+        self.default_model = default_model
+        self.max_ttft = max_ttft
+        self.min_tokens_per_second = min_tokens_per_second
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.window = window
+        self._stats: Dict[str, ModelStats] = {}
+
+    def _model_stats(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats(self.window)
+        return stats
+
+    def chain_for(self, role: str, preferred: Optional[str] = None) -> List[str]:
+        """
+        The configured fallback chain for a role.
+
+        Args:
+            role: Agent name (Writer, Reader or Expert)
+            preferred: Model chosen for this story, tried before the role's chain
+
+        Returns:
+            Models to try, without duplicates
+        """
+        chain = ([preferred] if preferred else []) + self.role_chains.get(role, [self.default_model])
+        return list(dict.fromkeys(chain))
+
+    def _is_slow(self, model: str, role: str) -> bool:
+        stats = self._stats.get(model)
+        # Stale measurements expire so a demoted model gets probed again
+        if stats is None or time.monotonic() - stats.updated_at > self.cooldown:
+            return False
+        if ROLE_PROFILES.get(role) == "throughput":
+            if len(stats.tokens_per_second) < self.min_samples:
+                return False
+            return stats.tokens_per_second_p50 < self.min_tokens_per_second
+        if len(stats.ttft) < self.min_samples:
+            return False
+        return stats.ttft_p50 > self.max_ttft
+
+    def _in_cooldown(self, model: str) -> bool:
+        stats = self._stats.get(model)
+        return stats is not None and stats.cooldown_until > time.monotonic()
+
+    def order(self, chain: List[str], role: str, pinned: Optional[str] = None) -> List[str]:
+        """
+        Return ``chain`` reordered so healthy, fast models are tried first.
+
+        Args:
+            chain: The role's models, as returned by ``chain_for``
+            role: Agent name (Writer, Reader or Expert)
+            pinned: Model chosen for this story; it stays first whatever its health
+
+        Returns:
+            Models in the order to try them
+        """
+        head = [pinned] if pinned in chain else []
+        rest = [model for model in chain if model != pinned]
+        # sorted() is stable, so ties keep the configured preference order
+        return head + sorted(rest, key=lambda model: (self._in_cooldown(model), self._is_slow(model, role)))
+
+    def record_ttft(self, model: str, ttft: float) -> None:
+        stats = self._model_stats(model)
+        stats.ttft.append(ttft)
+        stats.updated_at = time.monotonic()
+
+    def record_success(self, model: str, completion_tokens: int, generation_time: float) -> None:
+        stats = self._model_stats(model)
+        stats.calls += 1
+        stats.consecutive_failures = 0
+        # Very short responses say little about sustained throughput
+        if completion_tokens >= 50 and generation_time > 0:
+            stats.tokens_per_second.append(completion_tokens / generation_time)
+            stats.updated_at = time.monotonic()
+
+    def record_failure(self, model: str) -> None:
+        stats = self._model_stats(model)
+        stats.calls += 1
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures >= self.failure_threshold:
+            stats.cooldown_until = time.monotonic() + self.cooldown
+            stats.consecutive_failures = 0
+            logger.warning(f"Demoting {model} for {self.cooldown:.0f}s after repeated failures")
+
+    def stats(self) -> Dict[str, dict]:
+        """Return per-model routing metrics for health reporting."""
+        return {
+            model: {
+                "calls": stats.calls,
+                "failures": stats.failures,
+                "ttft_p50": round(stats.ttft_p50, 3) if stats.ttft_p50 is not None else None,
+                "tokens_per_second_p50": (round(stats.tokens_per_second_p50, 1)
+                                          if stats.tokens_per_second_p50 is not None else None),
+                "cooling_down": self._in_cooldown(model)
+            }
+            for model, stats in self._stats.items()
+        }
+
+
+# Global instance
+model_router = ModelRouter(
+    role_chains={
+        "Writer": _parse_chain(os.getenv("WRITER_MODELS")),
+        "Reader": _parse_chain(os.getenv("READER_MODELS")),
+        "Expert": _parse_chain(os.getenv("EXPERT_MODELS")),
+    },
+    default_model=os.getenv("OPENROUTER_MODEL", DEFAULT_MODEL),
+    max_ttft=float(os.getenv("MODEL_MAX_TTFT", "8")),
+    min_tokens_per_second=float(os.getenv("MODEL_MIN_TOKENS_PER_SEC", "15")),
+    failure_threshold=int(os.getenv("MODEL_FAILURE_THRESHOLD", "3")),
+    cooldown=float(os.getenv("MODEL_COOLDOWN", "120"))
+)
@@ -0,0 +1,87 @@
+"""Provider prompt-cache breakpoints for the stable prefix of agent prompts."""
+
+import os
+from typing import Dict, List, Optional
+
+# Providers that only cache prompt prefixes marked with cache_control (via
+# OpenRouter); OpenAI, DeepSeek and Grok models cache long prefixes implicitly
+EXPLICIT_CACHE_PREFIXES = ("anthropic/", "google/gemini")
+
+# Anthropic honors up to four breakpoints; Gemini only the last one
+MAX_BREAKPOINTS = {"anthropic/": 4, "google/gemini": 1}
+
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE", "true").lower() in ("1", "true", "yes")
+
+
+def uses_explicit_caching(model: str) -> bool:
+    return model.startswith(EXPLICIT_CACHE_PREFIXES)
+
+
+def _max_breakpoints(model: str) -> int:
+    return next((limit for prefix, limit in MAX_BREAKPOINTS.items() if model.startswith(prefix)), 0)
+
+
+def _cached_message(message: Dict[str, str], prefix_length: Optional[int] = None) -> Dict:
+    content = message["content"]
+    if prefix_length and 0 < prefix_length < len(content):
+        # Only the shared prefix is cached; the rest stays a separate, uncached part
+        parts = [
+            {"type": "text", "text": content[:prefix_length], "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": content[prefix_length:]}
+        ]
+    else:
+        parts = [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]
+    return {**message, "content": parts}
+
+
+def cache_request_options(model: str, cache_key: Optional[str]) -> Dict[str, str]:
+    """
+    Extra request fields routing prompts with the same prefix to the same cache.
+
+    OpenAI models accept a ``prompt_cache_key``; other providers key their
+    caches on the prefix itself.
+    """
+    if PROMPT_CACHE_ENABLED and cache_key and model.startswith("openai/"):
+        return {"prompt_cache_key": cache_key}
+    return {}
+
+
+def with_cache_breakpoints(messages: List[Dict[str, str]], model: str,
+                           system_prefix_length: Optional[int] = None) -> List[Dict]:
+    """
+    Mark the stable prefix of a prompt as cacheable for providers that need it.
+
+    Agent prompts are ordered from most to least stable: the system prompt
+    (identical on every turn), then the conversation history (append-only
+    between turns), then the per-turn context and trigger. Breakpoints go on
+    the system prompt and, where the provider allows more than one, on the
+    last history message, so the next turn can reuse both.
+
+    Args:
+        messages: Messages in plain string-content form
+        model: The model the request is for
+        system_prefix_length: Length of the system prompt's prefix shared across
+            stories; when set, the breakpoint goes there instead of at its end
+
+    Returns:
+        The messages, with cache_control content parts where applicable
+    """
+    if not PROMPT_CACHE_ENABLED or not uses_explicit_caching(model) or not messages:
+        return messages
+
+    breakpoints = []
+    system_split = None
+    if messages[0]["role"] == "system":
+        breakpoints.append(0)
+        system_split = system_prefix_length
+    if _max_breakpoints(model) > 1:
+        # Everything before the final user turn is shared with the next request
+        final_user = max((i for i, message in enumerate(messages) if message["role"] == "user"), default=0)
+        if final_user - 1 > 0:
+            breakpoints.append(final_user - 1)
+    breakpoints = breakpoints[-_max_breakpoints(model):]
+
+    return [
+        _cached_message(message, system_split if i == 0 else None) if i in breakpoints else message
+        for i, message in enumerate(messages)
+    ]
@@ -0,0 +1,354 @@
+"""Retry classification, backoff, hedging and resume support for streamed completions."""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextlib import AsyncExitStack
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth another attempt: timeouts, conflicts, rate limits and
+# provider/gateway failures (including Cloudflare's 52x and Anthropic's 529)
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524, 529}
+
+# A stream that goes this long without receiving any bytes is treated as stalled
+STREAM_TIMEOUT = httpx.Timeout(float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "60")), connect=10.0)
+
+# Model id prefixes known to continue a pre-filled assistant turn; others
+# start a fresh answer, so their interrupted streams are restarted instead
+RESUME_MODEL_PREFIXES = tuple(
+    prefix.strip() for prefix in os.getenv("LLM_RESUME_MODELS", "anthropic/").split(",") if prefix.strip()
+)
+
+
+def _status_of(error: Exception) -> Optional[int]:
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code
+    # Errors sent inside an SSE stream carry the upstream code in the body
+    code = getattr(error, "code", None)
+    try:
+        return int(code) if code is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After(-Ms) headers, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed completion should be retried and how long to wait.
+
+    Rate limits, 5xx/gateway errors, timeouts and dropped connections are
+    retried with full-jitter exponential backoff; a Retry-After header, when
+    present, sets the floor. Client errors (bad request, auth, insufficient
+    credits) fail immediately.
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 max_retry_after: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retries = 0
+        self.resumes = 0
+        self.restarts = 0
+        self.exhausted = 0
+        self.by_reason: Dict[str, int] = {}
+
+    @staticmethod
+    def classify(error: Exception) -> Optional[str]:
+        """Return a short retry reason for transient errors, or None if not retryable."""
+        if isinstance(error, openai.APIConnectionError):
+            return "timeout" if isinstance(error, openai.APITimeoutError) else "connection"
+        if isinstance(error, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(error, httpx.TransportError):
+            return "connection"
+        if isinstance(error, openai.APIError):
+            status = _status_of(error)
+            if status == 429:
+                return "rate_limited"
+            if status in RETRYABLE_STATUSES or (status is not None and status >= 500):
+                return "server_error"
+            if status is None and not isinstance(error, openai.APIStatusError):
+                # Mid-stream provider errors often arrive without a usable code
+                return "stream_error"
+        return None
+
+    def retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retry number ``attempt + 1``, or None to give up.
+
+        Args:
+            error: The exception raised by the failed attempt
+            attempt: How many retries have already been made
+        """
+        reason = self.classify(error)
+        if reason is None:
+            return None
+        if attempt >= self.max_retries:
+            self.exhausted += 1
+            return None
+        retry_after = parse_retry_after(error)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            # Waiting that long would stall the story; surface the error instead
+            self.exhausted += 1
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = retry_after + delay / 4
+        self.retries += 1
+        self.by_reason[reason] = self.by_reason.get(reason, 0) + 1
+        return delay
+
+    def stats(self) -> Dict[str, object]:
+        """Return retry counters for health reporting."""
+        return {
+            "retries": self.retries,
+            "resumes": self.resumes,
+            "restarts": self.restarts,
+            "exhausted": self.exhausted,
+            "by_reason": dict(self.by_reason)
+        }
+
+
+class HedgePolicy:
+    """
+    Tracks time to first token per model and decides when to hedge.
+
+    When a request has produced no token after the model's ``percentile`` TTFT
+    (but at least ``min_delay`` seconds), an identical second request is sent
+    and whichever starts streaming first is kept. Hedging is off when
+    ``percentile`` is 0, and waits for ``min_samples`` observations per model.
+    """
+
+    def __init__(self, percentile: float = 0.0, min_samples: int = 20, min_delay: float = 1.0,
+                 window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self.launched = 0
+        self.won = 0
+
+    def record(self, model: str, ttft: float) -> None:
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.window)
+        samples.append(ttft)
+
+    def delay_for(self, model: str) -> Optional[float]:
+        """Seconds to wait for a first token before hedging, or None to not hedge."""
+        if self.percentile <= 0:
+            return None
+        samples = self._samples.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(self.percentile / 100 * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def stats(self) -> Dict[str, object]:
+        """Return hedging counters for health reporting."""
+        return {
+            "enabled": self.percentile > 0,
+            "launched": self.launched,
+            "won": self.won,
+            "models_tracked": len(self._samples)
+        }
+
+
+class OpenedStream:
+    """
+    A completion stream that has produced its first content (or ended).
+
+    Owns the resources held for the request (scheduler slot, client lease,
+    HTTP response) through ``stack``; ``aclose`` releases them.
+    """
+
+    def __init__(self, stack: AsyncExitStack, stream):
+        self.stack = stack
+        self.iterator = stream.__aiter__()
+        self.buffered: List = []
+        self.exhausted = False
+
+    async def read_first_content(self) -> None:
+        """Buffer chunks until one carries content, so a stalled start can be detected."""
+        async for chunk in self.iterator:
+            self.buffered.append(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                return
+        self.exhausted = True
+
+    async def chunks(self):
+        """All chunks of the stream, starting with the buffered ones."""
+        for chunk in self.buffered:
+            yield chunk
+        self.buffered = []
+        if not self.exhausted:
+            async for chunk in self.iterator:
+                yield chunk
+
+    async def aclose(self) -> None:
+        await self.stack.aclose()
+
+
+async def open_hedged(open_stream: Callable[[], Awaitable[OpenedStream]], hedge_delay: Optional[float],
+                      hedge_policy: "HedgePolicy") -> OpenedStream:
+    """
+    Open a stream, racing a second identical request if the first is slow to start.
+
+    Args:
+        open_stream: Coroutine function opening one stream up to its first content
+        hedge_delay: Seconds to wait before hedging, or None to never hedge
+        hedge_policy: Policy whose counters record launched and winning hedges
+
+    Returns:
+        The first stream to start producing content; the loser is cancelled
+    """
+    if hedge_delay is None:
+        return await open_stream()
+
+    primary = asyncio.create_task(open_stream())
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+    except asyncio.CancelledError:
+        primary.cancel()
+        raise
+    if done:
+        return primary.result()
+
+    hedge_policy.launched += 1
+    hedge = asyncio.create_task(open_stream())
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        hedge_policy.won += 1
+                    losers = (done | pending) - {task}
+                    for loser in losers:
+                        loser.cancel()
+                    # Release a loser that managed to open while we were deciding
+                    for loser in losers:
+                        try:
+                            opened = await loser
+                        except BaseException:
+                            continue
+                        await opened.aclose()
+                    return task.result()
+                error = task.exception()
+    except asyncio.CancelledError:
+        for task in pending:
+            task.cancel()
+        raise
+    raise error
+
+
+class ResumeTrimmer:
+    """
+    Drops text a resumed stream repeats from the end of what was already sent.
+
+    A continuation request pre-fills the assistant turn with the partial
+    response; models that support it carry on from there, but sometimes
+    re-emit the last few words first. The start of the resumed output is held back until it is
+    long enough to compare, and any overlap with the sent tail is removed.
+    """
+
+    def __init__(self, sent: str, window: int = 200):
+        self.tail = sent[-window:]
+        self.window = window
+        self.pending = ""
+        self.checked = not self.tail
+
+    def feed(self, text: str) -> str:
+        if self.checked:
+            return text
+        self.pending += text
+        if len(self.pending) < self.window:
+            return ""
+        return self.flush()
+
+    def flush(self) -> str:
+        if self.checked:
+            return ""
+        self.checked = True
+        pending, self.pending = self.pending, ""
+        stripped = pending.lstrip()
+        for size in range(min(len(self.tail), len(stripped)), 0, -1):
+            # Only trim overlaps long enough not to be a coincidence
+            if size >= 12 and stripped.startswith(self.tail[-size:]):
+                return stripped[size:]
+        return pending
+
+
+class StreamRestart:
+    """
+    Marker yielded by a stream that had to start its response over.
+
+    Everything yielded before it belongs to the abandoned attempt and should
+    be discarded; the chunks after it make up the whole response.
+    """
+
+
+STREAM_RESTART = StreamRestart()
+
+
+def supports_prefill(model: str) -> bool:
+    """Whether ``model`` continues a pre-filled assistant message rather than restarting."""
+    return model.startswith(RESUME_MODEL_PREFIXES)
+
+
+def continuation_messages(messages: List[Dict[str, str]], partial: str) -> List[Dict[str, str]]:
+    """Messages asking the model to continue an interrupted response from ``partial``."""
+    return messages + [{"role": "assistant", "content": partial}]
+
+
+# Global instances
+retry_policy = RetryPolicy(
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+    max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "8")),
+    max_retry_after=float(os.getenv("LLM_MAX_RETRY_AFTER", "30"))
+)
+hedge_policy = HedgePolicy(
+    percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0")),
+    min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+    min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+)
@@ -0,0 +1,195 @@
+"""Routing, approval and completion signals in agent responses, detected in one scan."""
+
+import re
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Ways a response names the next speaker, in priority order: the first match
+# of the first pattern whose name resolves to an agent wins
+SPEAKER_PATTERNS = (
+    r'\[@(\w+)\]',  # [@Writer]
+    r'\[Next:\s*(\w+)\]',  # [Next: Reader]
+    r'\[(\w+)\'s turn\]',  # [Writer's turn]
+    r'@(\w+)',  # @Expert
+)
+# The bracketed forms all start with "[" and contain no other "[", so one
+# alternation finds the first match of each; the bare "@name" form overlaps
+# "[@name]" and gets its own search
+_BRACKETED = re.compile("|".join(SPEAKER_PATTERNS[:3]), re.IGNORECASE)
+_MENTION = re.compile(SPEAKER_PATTERNS[3], re.IGNORECASE)
+
+# Case-insensitive phrases, by the signal they raise
+PHRASES: Dict[str, Tuple[str, ...]] = {
+    "completion": ("[story complete]", "[end]", "[finished]"),
+    "approval": ("i approve this story", "i approve the story", "story is approved"),
+    "technical_review_passed": ("technical review passed",),
+    "conflict": ("strongly disagree", "major concern", "fundamental issue", "cannot accept",
+                 "this won't work", "completely wrong direction"),
+    "outline": ("outline",),
+    "outline_approval": ("approved", "i approve"),
+}
+# Story markers are matched case-sensitively
+MARKERS = {"story_begin": "---BEGIN STORY---", "story_end": "---END STORY---"}
+
+# Text kept between incremental scans so phrases and markers split across
+# chunks are still found; longer than any phrase or realistic speaker name
+_OVERLAP = 96
+# Streamed text is scanned in batches of at least this many characters, or as
+# soon as a chunk closes a bracket, so handoff markers are seen immediately
+_SCAN_BATCH = 512
+
+
+class SignalVerdict:
+    """
+    Everything the coordinator routes on, from one response.
+
+    A verdict from a streamed response arrives with every signal checked. One
+    built from a complete text checks each signal on first use instead,
+    against a single lowercased copy, so callers pay only for what they ask.
+    """
+
+    def __init__(self, mentions: Tuple[Optional[str], ...], found: Iterable[str] = (),
+                 text: Optional[str] = None):
+        self.mentions = mentions  # first name matched by each of SPEAKER_PATTERNS
+        self._found = set(found)
+        self._text = text
+        self._lowered: Optional[str] = None
+        self._unchecked = set(PHRASES) | set(MARKERS) if text is not None else set()
+
+    def has(self, signal: str) -> bool:
+        """Whether a PHRASES or MARKERS signal occurs in the response."""
+        if signal in self._unchecked:
+            self._unchecked.discard(signal)
+            if signal in MARKERS:
+                found = MARKERS[signal] in self._text
+            else:
+                if self._lowered is None:
+                    self._lowered = self._text.lower()
+                found = any(phrase in self._lowered for phrase in PHRASES[signal])
+            if found:
+                self._found.add(signal)
+        return signal in self._found
+
+    @property
+    def handoff(self) -> Optional[str]:
+        """The first explicit ``[@Agent]`` handoff, if any."""
+        return self.mentions[0]
+
+    @property
+    def completion(self) -> bool:
+        return self.has("completion")
+
+    @property
+    def conflict(self) -> bool:
+        return self.has("conflict")
+
+    @property
+    def has_story_begin(self) -> bool:
+        return self.has("story_begin")
+
+    @property
+    def has_story_end(self) -> bool:
+        return self.has("story_end")
+
+    @property
+    def mentions_outline(self) -> bool:
+        return self.has("outline")
+
+    @property
+    def outline_approval(self) -> bool:
+        """Loose approval wording ("approved", "I approve") that ends the outline phase."""
+        return self.has("outline_approval")
+
+    def approved_by(self, agent_name: Optional[str] = None) -> bool:
+        """Whether the response approves the story; the Expert must also pass technical review."""
+        if not self.has("approval"):
+            return False
+        if agent_name == "Expert":
+            return self.has("technical_review_passed")
+        return True
+
+    def next_speaker(self, resolve: Callable[[str], Optional[str]]) -> Optional[str]:
+        """The agent the response hands off to, trying SPEAKER_PATTERNS in order."""
+        for name in self.mentions:
+            if name:
+                agent_name = resolve(name)
+                if agent_name:
+                    return agent_name
+        return None
+
+
+def _find_mentions(window: str, mentions: list, final: bool) -> Optional[int]:
+    """
+    Fill in the first speaker mention per pattern found in ``window``.
+
+    Returns the start of a bare ``@name`` mention that runs to the end of a
+    non-final window (the name may continue in the next chunk), if any.
+    """
+    for match in _BRACKETED.finditer(window):
+        index = match.lastindex - 1
+        if mentions[index] is None:
+            mentions[index] = match.group(match.lastindex)
+    if mentions[3] is None:
+        match = _MENTION.search(window)
+        if match and (final or match.end() < len(window)):
+            mentions[3] = match.group(1)
+        elif match:
+            return match.start()
+    return None
+
+
+class SignalDetector:
+    """
+    Collects a response's signals as it streams.
+
+    Streamed text is scanned in batches, each only once apart from a short
+    overlap for markers split across chunks: one lowercased copy for all the
+    phrases and two precompiled searches for the speaker patterns. When the
+    stream ends only the last batch is left, so the verdict is ready at once
+    instead of re-reading the whole response for every check.
+    """
+
+    def __init__(self):
+        self._mentions: list = [None] * len(SPEAKER_PATTERNS)
+        self._found: set = set()
+        self._pending = ""  # the overlap plus text not scanned yet
+        self.fed_chars = 0
+
+    def _scan(self, final: bool) -> None:
+        window = self._pending
+        lowered = window.lower()
+        for signal, phrases in PHRASES.items():
+            if signal not in self._found and any(phrase in lowered for phrase in phrases):
+                self._found.add(signal)
+        for signal, marker in MARKERS.items():
+            if signal not in self._found and marker in window:
+                self._found.add(signal)
+
+        hold = len(window) if final else len(window) - _OVERLAP
+        partial_mention = _find_mentions(window, self._mentions, final)
+        if partial_mention is not None:
+            hold = min(hold, partial_mention)
+        self._pending = window[max(0, hold):]
+
+    def feed(self, chunk: str) -> None:
+        """Add the next streamed chunk of the response."""
+        self._pending += chunk
+        self.fed_chars += len(chunk)
+        if len(self._pending) >= _OVERLAP + _SCAN_BATCH or "]" in chunk:
+            self._scan(final=False)
+
+    def peek(self) -> SignalVerdict:
+        """Signals seen so far, before the response is complete."""
+        return SignalVerdict(tuple(self._mentions), self._found)
+
+    def finish(self) -> SignalVerdict:
+        """Scan whatever is left and return the verdict for the whole response."""
+        if self._pending:
+            self._scan(final=True)
+        return self.peek()
+
+
+def detect_signals(text: str) -> SignalVerdict:
+    """The signals in a complete response; phrases are only checked when asked for."""
+    mentions = [None] * len(SPEAKER_PATTERNS)
+    _find_mentions(text, mentions, final=True)
+    return SignalVerdict(tuple(mentions), text=text)
@@ -0,0 +1,141 @@
+"""Per-turn token usage capture and aggregation."""
+
+import time
+from typing import Dict, List, Optional
+
+from agents.context_builder import estimate_tokens
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens")
+
+
+class TurnUsage:
+    """
+    Token counts, cost and timings for a single model call.
+
+    Counts come from the final usage chunk of the stream. Providers that do not
+    report usage get an estimate from the prompt and response sizes instead,
+    flagged with ``estimated``.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost: Optional[float] = None
+        self.estimated = False
+        self.restarts = 0
+        self.time_to_first_token: Optional[float] = None
+        self.generation_time = 0.0
+        self._started = time.perf_counter()
+        self._first_token_at: Optional[float] = None
+        self._reported = False
+
+    def mark_token(self) -> None:
+        """Record the arrival of streamed content."""
+        if self._first_token_at is None:
+            self._first_token_at = time.perf_counter()
+            self.time_to_first_token = self._first_token_at - self._started
+
+    def record(self, usage) -> None:
+        """Take counts from an OpenAI-style usage object (OpenRouter adds ``cost``)."""
+        self.prompt_tokens = usage.prompt_tokens or 0
+        self.completion_tokens = usage.completion_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        cost = getattr(usage, "cost", None)
+        self.cost = float(cost) if cost is not None else None
+        self._reported = True
+
+    def finish(self, prompt_text: str, response_text: str) -> "TurnUsage":
+        """Close the timing window and estimate counts if none were reported."""
+        end = time.perf_counter()
+        self.generation_time = end - (self._first_token_at or end)
+        if not self._reported:
+            self.prompt_tokens = estimate_tokens(prompt_text)
+            self.completion_tokens = estimate_tokens(response_text) if response_text else 0
+            self.estimated = True
+        return self
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """Share of prompt tokens served from the provider's prompt cache."""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "total_tokens": self.total_tokens,
+            "cache_hit_rate": round(self.cache_hit_rate, 3),
+            "cost": self.cost,
+            "estimated": self.estimated,
+            "restarts": self.restarts,
+            "time_to_first_token": round(self.time_to_first_token, 3) if self.time_to_first_token is not None else None,
+            "generation_time": round(self.generation_time, 3),
+        }
+
+
+def empty_totals() -> dict:
+    return {**{field: 0 for field in USAGE_FIELDS}, "cost": 0.0, "turns": 0, "cache_hit_rate": 0.0}
+
+
+def cache_hit_rate(totals: dict) -> float:
+    """Cached share of prompt tokens in a usage or totals dict."""
+    prompt_tokens = totals.get("prompt_tokens") or 0
+    return (totals.get("cached_tokens") or 0) / prompt_tokens if prompt_tokens else 0.0
+
+
+def add_usage(totals: dict, usage: dict) -> dict:
+    """Add one turn's usage dict into a running totals dict in place."""
+    for field in USAGE_FIELDS:
+        totals[field] += usage.get(field) or 0
+    totals["cost"] = round(totals["cost"] + (usage.get("cost") or 0.0), 6)
+    totals["turns"] += 1
+    totals["cache_hit_rate"] = round(cache_hit_rate(totals), 3)
+    return totals
+
+
+def combine_usage(usages: List[dict]) -> dict:
+    """
+    One usage dict for several model calls made for the same turn.
+
+    Token counts and cost are summed; the model and timings are the first call's.
+    """
+    combined = dict(usages[0])
+    for field in USAGE_FIELDS:
+        combined[field] = sum(usage.get(field) or 0 for usage in usages)
+    costs = [usage["cost"] for usage in usages if usage.get("cost") is not None]
+    combined["cost"] = round(sum(costs), 6) if costs else None
+    combined["estimated"] = any(usage.get("estimated") for usage in usages)
+    combined["cache_hit_rate"] = round(cache_hit_rate(combined), 3)
+    return combined
+
+
+def aggregate_usage(history: List[dict]) -> Dict[str, dict]:
+    """
+    Aggregate per-turn usage from a coordinator's conversation history.
+
+    Args:
+        history: Conversation history entries with ``speaker``, ``phase`` and ``usage``
+
+    Returns:
+        Totals for the whole session plus breakdowns by agent, by phase and by
+        the model that served each turn
+    """
+    summary = {"session": empty_totals(), "by_agent": {}, "by_phase": {}, "by_model": {}}
+    for turn in history:
+        usage = turn.get("usage")
+        if not usage:
+            continue
+        add_usage(summary["session"], usage)
+        add_usage(summary["by_agent"].setdefault(turn.get("speaker", "unknown"), empty_totals()), usage)
+        add_usage(summary["by_phase"].setdefault(turn.get("phase", "unknown"), empty_totals()), usage)
+        add_usage(summary["by_model"].setdefault(usage.get("model") or "unknown", empty_totals()), usage)
+    return summary
@@ -12,10 +12,13 @@ from supabase import create_client, Client
 
 # Load environment variables
 load_dotenv(Path(__file__).parent / '.env')
-from jose import jwt, JWTError
+from jose import JWTError
 from datetime import datetime
 
 from utils.encryption import encryptor
+from utils.db_executor import db_executor
+from utils.key_cache import key_cache
+from utils.jwt_verifier import jwt_verifier
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -40,9 +43,8 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
     token = authorization.replace("Bearer ", "")
     
     try:
-        # Decode the Supabase JWT
-        # Note: In production, verify the JWT signature properly
-        payload = jwt.get_unverified_claims(token)
+        # Verify the Supabase JWT locally against the cached signing keys
+        payload = await jwt_verifier.verify(token)
         user_id = payload.get("sub")
         
         if not user_id:
@@ -52,6 +54,16 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_user_openrouter_key(user_id: str) -> Optional[str]:
+    """Return the user's decrypted OpenRouter key, served from the key cache when possible"""
+    async def load_key() -> Optional[str]:
+        result = await db_executor.execute(supabase.table("user_api_keys").select("encrypted_key").eq("user_id", user_id).eq("provider", "openrouter").eq("is_active", True), "user_api_keys.select")
+        if not result.data:
+            return None
+        return encryptor.decrypt_api_key(result.data[0]["encrypted_key"])
+    
+    return await key_cache.get_or_load(user_id, load_key)
+
 @router.post("/openrouter/callback", response_model=OpenRouterKeyResponse)
 async def openrouter_callback(
     data: OpenRouterCallback,
@@ -89,25 +101,29 @@ async def openrouter_callback(
         key_hint = encryptor.get_key_hint(api_key)
         
         # Check if user already has a key
-        existing = supabase.table("user_api_keys").select("id").eq("user_id", user_id).eq("provider", "openrouter").execute()
+        existing = await db_executor.execute(supabase.table("user_api_keys").select("id").eq("user_id", user_id).eq("provider", "openrouter"), "user_api_keys.select")
         
         if existing.data:
             # Update existing key
-            supabase.table("user_api_keys").update({
+            await db_executor.execute(supabase.table("user_api_keys").update({
                 "encrypted_key": encrypted_key,
                 "key_hint": key_hint,
                 "is_active": True,
                 "last_used_at": datetime.utcnow().isoformat()
-            }).eq("user_id", user_id).eq("provider", "openrouter").execute()
+            }).eq("user_id", user_id).eq("provider", "openrouter"), "user_api_keys.update")
         else:
             # Insert new key
-            supabase.table("user_api_keys").insert({
+            await db_executor.execute(supabase.table("user_api_keys").insert({
                 "user_id": user_id,
                 "provider": "openrouter",
                 "encrypted_key": encrypted_key,
                 "key_hint": key_hint,
                 "is_active": True
-            }).execute()
+            }), "user_api_keys.insert")
+        
+        # Serve the new key to this user's next connection
+        key_cache.invalidate(user_id)
+        key_cache.set(user_id, api_key)
         
         return OpenRouterKeyResponse(
             success=True,
@@ -133,25 +149,29 @@ async def store_openrouter_key(
         key_hint = encryptor.get_key_hint(data.api_key)
         
         # Check if user already has a key
-        existing = supabase.table("user_api_keys").select("id").eq("user_id", user_id).eq("provider", "openrouter").execute()
+        existing = await db_executor.execute(supabase.table("user_api_keys").select("id").eq("user_id", user_id).eq("provider", "openrouter"), "user_api_keys.select")
         
         if existing.data:
             # Update existing key
-            supabase.table("user_api_keys").update({
+            await db_executor.execute(supabase.table("user_api_keys").update({
                 "encrypted_key": encrypted_key,
                 "key_hint": key_hint,
                 "is_active": True,
                 "last_used_at": datetime.utcnow().isoformat()
-            }).eq("user_id", user_id).eq("provider", "openrouter").execute()
+            }).eq("user_id", user_id).eq("provider", "openrouter"), "user_api_keys.update")
         else:
             # Insert new key
-            supabase.table("user_api_keys").insert({
+            await db_executor.execute(supabase.table("user_api_keys").insert({
                 "user_id": user_id,
                 "provider": "openrouter",
                 "encrypted_key": encrypted_key,
                 "key_hint": key_hint,
                 "is_active": True
-            }).execute()
+            }), "user_api_keys.insert")
+        
+        # Serve the new key to this user's next connection
+        key_cache.invalidate(user_id)
+        key_cache.set(user_id, data.api_key)
         
         return OpenRouterKeyResponse(
             success=True,
@@ -166,7 +186,7 @@ async def store_openrouter_key(
 async def check_openrouter_key(user_id: str = Depends(get_current_user)):
     """Check if user has an active OpenRouter key"""
     try:
-        result = supabase.table("user_api_keys").select("id, is_active, key_hint").eq("user_id", user_id).eq("provider", "openrouter").execute()
+        result = await db_executor.execute(supabase.table("user_api_keys").select("id, is_active, key_hint").eq("user_id", user_id).eq("provider", "openrouter"), "user_api_keys.select")
         
         if result.data and result.data[0]["is_active"]:
             return {
@@ -189,15 +209,16 @@ async def unlink_openrouter(
         print(f"Unlinking OpenRouter for user: {user_id}")
         
         # First, check if user has an active key
-        check_result = supabase.table("user_api_keys").select("*").eq("user_id", user_id).eq("provider", "openrouter").eq("is_active", True).execute()
+        check_result = await db_executor.execute(supabase.table("user_api_keys").select("*").eq("user_id", user_id).eq("provider", "openrouter").eq("is_active", True), "user_api_keys.select")
         print(f"Active keys found: {len(check_result.data) if check_result.data else 0}")
         
         # Find and deactivate the user's OpenRouter key
-        result = supabase.table("user_api_keys").update({
+        result = await db_executor.execute(supabase.table("user_api_keys").update({
             "is_active": False
-        }).eq("user_id", user_id).eq("provider", "openrouter").eq("is_active", True).execute()
+        }).eq("user_id", user_id).eq("provider", "openrouter").eq("is_active", True), "user_api_keys.update")
         
         print(f"Update result: {result.data}")
+        key_cache.invalidate(user_id)
         
         if not result.data:
             raise HTTPException(
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of story sessions against a fake OpenRouter and in-memory Supabase.
+
+Runs N concurrent sessions either directly through SCPCoordinatorSession or
+through the /ws/generate WebSocket endpoint, and reports turns/sec, p50/p99
+handoff gaps (measured by the fake server between one stream ending and the
+next request arriving for the same key), event-loop lag and bytes written to
+the database per story.
+
+Run from the api directory:
+    python benchmarks/bench_coordinator.py --sessions 8 --mode both
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+FAKE_PORT = _free_port()
+JWT_SECRET = "bench-jwt-secret"
+
+# Configuration is read at import time, so point everything at the fakes first
+os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{FAKE_PORT}/api/v1"
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench")
+os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET
+if not os.getenv("ENCRYPTION_KEY"):
+    from cryptography.fernet import Fernet
+    os.environ["ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+
+import uvicorn
+
+from benchmarks.fake_openrouter import FakeOpenRouter, create_app, default_transcript
+from benchmarks.memory_supabase import InMemorySupabase
+from agents.resilience import retry_policy
+from scp_coordinator_session import SCPCoordinatorSession, StoryConfig
+from utils.story_session_manager import StorySessionManager
+
+USER_REQUEST = "A containment cell that hums a little lower every night"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoopLagMonitor:
+    """Measures how late a 10ms sleep wakes up, i.e. how long the loop was blocked."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+
+def start_fake_server(fake: FakeOpenRouter) -> uvicorn.Server:
+    """Serve the fake OpenRouter from its own thread and event loop."""
+    server = uvicorn.Server(uvicorn.Config(create_app(fake), host="127.0.0.1", port=FAKE_PORT,
+                                           log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def run_coordinator_sessions(sessions: int, pages: int, db: InMemorySupabase) -> Dict:
+    manager = StorySessionManager(db)
+
+    async def run_one(index: int) -> SCPCoordinatorSession:
+        session_id = await manager.create_session(f"bench-user-{index}", {"page_limit": pages})
+        coordinator = SCPCoordinatorSession(
+            story_config=StoryConfig(page_limit=pages),
+            api_key=f"bench-key-{index}",
+            session_manager=manager,
+            session_id=session_id
+        )
+        await coordinator.run_story_creation(USER_REQUEST)
+        return coordinator
+
+    coordinators = await asyncio.gather(*(run_one(i) for i in range(sessions)))
+    await manager.close()
+    totals = [c.usage_summary()["session"] for c in coordinators]
+    prompt_tokens = sum(t["prompt_tokens"] for t in totals)
+    return {
+        "turns": sum(c.turn_count for c in coordinators),
+        "completed": sum(1 for c in coordinators if c.story_complete),
+        "cache_hit_rate": round(sum(t["cached_tokens"] for t in totals) / prompt_tokens, 3) if prompt_tokens else 0.0,
+    }
+
+
+async def run_websocket_sessions(sessions: int, pages: int, db: InMemorySupabase) -> Dict:
+    import websockets
+    from jose import jwt
+
+    import auth
+    import main
+    from utils.encryption import encryptor
+
+    main.supabase = db
+    auth.supabase = db
+    main.story_session_manager = StorySessionManager(db)
+    for i in range(sessions):
+        db.table("user_api_keys").insert({
+            "user_id": f"bench-user-{i}",
+            "provider": "openrouter",
+            "is_active": True,
+            "encrypted_key": encryptor.encrypt_api_key(f"bench-key-{i}")
+        }).execute()
+    written_before = dict(db.bytes_written)
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    async def run_one(index: int) -> Dict:
+        token = jwt.encode({"sub": f"bench-user-{index}", "aud": "authenticated",
+                            "exp": int(time.time()) + 3600},
+                           JWT_SECRET, algorithm="HS256")
+        frames, completed = 0, False
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws/generate", max_size=None) as ws:
+            await ws.send(json.dumps({"type": "auth", "token": token}))
+            await ws.send(json.dumps({"theme": USER_REQUEST, "pages": pages, "uiTheme": "scp"}))
+            async for raw in ws:
+                frames += 1
+                message = json.loads(raw)
+                if message.get("type") == "completed":
+                    completed = True
+                    break
+                if message.get("type") == "error":
+                    break
+        return {"frames": frames, "completed": completed}
+
+    results = await asyncio.gather(*(run_one(i) for i in range(sessions)))
+    # Let disconnect handling and the write-behind flush settle before shutdown
+    await asyncio.sleep(0.2)
+    server.should_exit = True
+    await server_task
+
+    # Seeding the API keys is setup, not per-story persistence
+    for table, size in written_before.items():
+        db.bytes_written[table] -= size
+    messages = db.tables.get("session_messages", [])
+    return {
+        "turns": len(messages),
+        "completed": sum(1 for r in results if r["completed"]),
+        "frames": sum(r["frames"] for r in results),
+    }
+
+
+async def run_mode(mode: str, args, fake: FakeOpenRouter) -> Dict:
+    fake.reset_stats()
+    db = InMemorySupabase()
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    # Agents stream their output to stdout; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "coordinator":
+            result = await run_coordinator_sessions(args.sessions, args.pages, db)
+        else:
+            result = await run_websocket_sessions(args.sessions, args.pages, db)
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+
+    gaps = fake.stats()["handoff_gaps"]
+    lag = monitor.samples
+    return {
+        "mode": mode,
+        "sessions": args.sessions,
+        "completed": result["completed"],
+        "elapsed_s": round(elapsed, 2),
+        "turns": result["turns"],
+        "turns_per_second": round(result["turns"] / elapsed, 2),
+        "handoff_p50_ms": round(percentile(gaps, 50) * 1000, 1),
+        "handoff_p99_ms": round(percentile(gaps, 99) * 1000, 1),
+        "loop_lag_p50_ms": round(percentile(lag, 50) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(lag, 99) * 1000, 2),
+        "loop_lag_max_ms": round(max(lag, default=0.0) * 1000, 2),
+        "bytes_written_per_story": round(db.total_bytes_written() / args.sessions),
+        "bytes_written_by_table": dict(db.bytes_written),
+        "writes_by_table": dict(db.writes),
+        "injected_errors": fake.stats()["injected_errors"],
+        "dropped_streams": fake.stats()["dropped_streams"],
+        "retries": retry_policy.stats(),
+        **({"frames": result["frames"]} if "frames" in result else {}),
+        **({"cache_hit_rate": result["cache_hit_rate"]} if "cache_hit_rate" in result else {}),
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{report['mode']}: {report['completed']}/{report['sessions']} stories in {report['elapsed_s']}s")
+    print(f"  turns/sec            {report['turns_per_second']:>10} ({report['turns']} turns)")
+    print(f"  handoff p50 / p99    {report['handoff_p50_ms']:>7} ms / {report['handoff_p99_ms']} ms")
+    print(f"  loop lag p50/p99/max {report['loop_lag_p50_ms']:>7} ms / {report['loop_lag_p99_ms']} ms"
+          f" / {report['loop_lag_max_ms']} ms")
+    print(f"  bytes written/story  {report['bytes_written_per_story']:>10}")
+    for table, size in sorted(report["bytes_written_by_table"].items()):
+        print(f"    {table:<20} {size:>10} bytes in {report['writes_by_table'][table]} writes")
+    if report["injected_errors"] or report["dropped_streams"]:
+        print(f"  injected failures    {report['injected_errors']:>10} errors, {report['dropped_streams']} drops"
+              f" -> {report['retries']['retries']} retries, {report['retries']['resumes']} resumes, "
+              f"{report['retries']['restarts']} restarts")
+    if "cache_hit_rate" in report:
+        print(f"  prompt cache hits    {report['cache_hit_rate']:>10.1%} of prompt tokens")
+    if "frames" in report:
+        print(f"  websocket frames     {report['frames']:>10}")
+
+
+async def run(args) -> List[Dict]:
+    transcript = default_transcript(args.pages * 300)
+    if args.transcript:
+        with open(args.transcript, encoding="utf-8") as f:
+            transcript = json.load(f)
+    fake = FakeOpenRouter(transcript, token_rate=args.token_rate, ttft=args.ttft,
+                          error_rate=args.error_rate, drop_rate=args.drop_rate)
+    if args.drop_rate:
+        # Dropped streams are deliberate; keep their tracebacks out of the report
+        logging.getLogger("uvicorn.error").setLevel(logging.CRITICAL)
+    server = start_fake_server(fake)
+
+    modes = ["coordinator", "websocket"] if args.mode == "both" else [args.mode]
+    reports = []
+    try:
+        for mode in modes:
+            report = await run_mode(mode, args, fake)
+            reports.append(report)
+            print_report(report)
+    finally:
+        server.should_exit = True
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=["coordinator", "websocket", "both"], default="both")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent story sessions")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--token-rate", type=float, default=400.0, help="fake tokens per second per stream")
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake time to first token in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake requests failed with 429/503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of fake streams cut halfway")
+    parser.add_argument("--transcript", help="JSON file of recorded Writer/Reader/Expert responses")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    reports = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for SignalDetector against the per-check routing functions it replaced.
+
+Run from the api directory:
+    python benchmarks/bench_signal_detector.py
+"""
+
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.signal_detector import SignalDetector, detect_signals
+from benchmarks.fake_openrouter import scripted_story
+
+AGENTS = ("Writer", "Reader", "Expert")
+
+
+def resolve_agent_name(name: str) -> Optional[str]:
+    for agent_name in AGENTS:
+        if name.lower() in agent_name.lower() or agent_name.lower() in name.lower():
+            return agent_name
+    return None
+
+
+# The coordinator's previous checks, kept for comparison
+
+def legacy_parse_next_speaker(message: str) -> Optional[str]:
+    for pattern in [r'\[@(\w+)\]', r'\[Next:\s*(\w+)\]', r'\[(\w+)\'s turn\]', r'@(\w+)']:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            agent_name = resolve_agent_name(match.group(1))
+            if agent_name:
+                return agent_name
+    return None
+
+
+def legacy_check_story_completion(message: str) -> bool:
+    completion_signals = ["[STORY COMPLETE]", "[END]", "[FINISHED]", "story is complete and satisfying"]
+    return any(signal in message.upper() for signal in completion_signals)
+
+
+def legacy_check_story_approval(message: str, agent_name: str = None) -> bool:
+    approval_phrases = ["I APPROVE this story", "I APPROVE the story", "story is approved",
+                        "I approve this story", "I approve the story"]
+    has_approval = any(phrase.lower() in message.lower() for phrase in approval_phrases)
+    if agent_name == "Expert" and has_approval:
+        return "technical review passed" in message.lower()
+    return has_approval
+
+
+def legacy_check_for_conflict(message: str) -> bool:
+    conflict_indicators = ["strongly disagree", "major concern", "fundamental issue", "cannot accept",
+                           "this won't work", "completely wrong direction"]
+    return any(indicator in message.lower() for indicator in conflict_indicators)
+
+
+def legacy_verdict(message: str) -> tuple:
+    return (
+        legacy_parse_next_speaker(message),
+        legacy_check_story_completion(message),
+        legacy_check_story_approval(message, "Reader"),
+        legacy_check_story_approval(message, "Expert"),
+        legacy_check_for_conflict(message),
+        "outline" in message.lower(),
+        "approved" in message.lower() or "i approve" in message.lower(),
+        "---BEGIN STORY---" in message,
+        "---END STORY---" in message,
+    )
+
+
+def legacy_turn(message: str) -> None:
+    """The checks run_conversation used to make on one Reader response."""
+    legacy_check_story_approval(message, "Reader")
+    "outline" in message.lower()
+    "approved" in message.lower() or "i approve" in message.lower()
+    legacy_parse_next_speaker(message) or legacy_check_story_completion(message)
+    legacy_check_story_approval(message, "Reader")
+    "approved" in message.lower() or "i approve" in message.lower()
+    "---BEGIN STORY---" in message
+    "---END STORY---" in message
+
+
+def detector_turn(message: str) -> None:
+    """The same checks, answered from one verdict."""
+    verdict = detect_signals(message)
+    verdict.approved_by("Reader")
+    verdict.mentions_outline
+    verdict.outline_approval
+    verdict.next_speaker(resolve_agent_name) or verdict.completion
+    verdict.has_story_begin
+    verdict.has_story_end
+
+
+def verdict_tuple(verdict) -> tuple:
+    return (
+        verdict.next_speaker(resolve_agent_name),
+        verdict.completion,
+        verdict.approved_by("Reader"),
+        verdict.approved_by("Expert"),
+        verdict.conflict,
+        verdict.mentions_outline,
+        verdict.outline_approval,
+        verdict.has_story_begin,
+        verdict.has_story_end,
+    )
+
+
+SNIPPETS = ["[@Writer]", "[@reader]", "[@Bob]", "[Next: Expert]", "[Next:Reader]", "[Writer's turn]",
+            "@Expert", "@Bob", "email@x", "[STORY COMPLETE]", "[end]", "[Finished]", "I APPROVE this story",
+            "i approve the story", "story is approved", "technical review passed", "strongly disagree",
+            "this won't work", "outline", "approved", "I approve", "---BEGIN STORY---", "---END STORY---",
+            "[", "]", "@", " ", "\n", "the cell hummed", "Okafor"]
+
+
+def check_equivalence(iterations: int = 3000) -> None:
+    """Verify whole-text and arbitrarily chunked detection match the legacy checks."""
+    rng = random.Random(42)
+    for _ in range(iterations):
+        text = "".join(rng.choice(SNIPPETS) for _ in range(rng.randint(0, 40)))
+        expected = legacy_verdict(text)
+        assert verdict_tuple(detect_signals(text)) == expected, repr(text)
+
+        detector, position = SignalDetector(), 0
+        while position < len(text):
+            step = rng.randint(1, 40)
+            detector.feed(text[position:position + step])
+            position += step
+        assert verdict_tuple(detector.finish()) == expected, repr(text)
+
+
+def main():
+    check_equivalence()
+    print("Verdicts match the previous checks (whole-text and chunked)")
+
+    story = scripted_story(3000)  # ~4k tokens
+    response = (f"The revision holds up.\n\n---BEGIN STORY---\n{story}\n---END STORY---\n\n"
+                f"I APPROVE this story - it works. [@Expert]")
+    chunks = [response[i:i + 12] for i in range(0, len(response), 12)]
+    runs = 500
+
+    legacy = timeit.timeit(lambda: legacy_turn(response), number=runs) / runs
+    current = timeit.timeit(lambda: detector_turn(response), number=runs) / runs
+    print(f"Full response ({len(response)} chars): legacy {legacy * 1000:.3f} ms, "
+          f"detector {current * 1000:.3f} ms, speedup {legacy / current:.1f}x")
+
+    def streamed():
+        detector = SignalDetector()
+        for chunk in chunks:
+            detector.feed(chunk)
+        return detector
+
+    detectors = [streamed() for _ in range(runs)]
+    finish = timeit.timeit(lambda: detectors.pop().finish(), number=runs) / runs
+    stream = timeit.timeit(streamed, number=20) / 20
+    print(f"Streamed ({len(chunks)} chunks): {stream * 1000:.3f} ms spread over the stream, "
+          f"{finish * 1000:.3f} ms after the last chunk vs legacy {legacy * 1000:.3f} ms "
+          f"({legacy / finish:.0f}x less work on the handoff path)")
+
+
+if __name__ == "__main__":
+    main()
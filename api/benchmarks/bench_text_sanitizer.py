@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for StreamingSanitizer against sanitizing each streamed chunk with sanitize_text.
+
+Run from the api directory:
+    python benchmarks/bench_text_sanitizer.py
+"""
+
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.text_sanitizer import CHAR_REPLACEMENTS, StreamingSanitizer, sanitize_text
+
+
+def make_draft(words: int, seed: int = 7) -> str:
+    """Build a ~4k-token prose draft with the typographic noise LLM output usually has."""
+    rng = random.Random(seed)
+    vocabulary = ["the", "containment", "cell", "was", "quiet", "when", "Okafor", "opened", "door",
+                  "and", "a", "of", "light", "she", "could", "not", "see", "anything", "inside"]
+    noise = ["\u201cquiet\u201d", "it\u2019s", "\u2014", "\u2026", "  ", " \n", "\u00a0"]
+    parts = []
+    for i in range(words):
+        if i and i % 90 == 0:
+            parts.append("\n\n")
+        parts.append(rng.choice(noise) if rng.random() < 0.04 else rng.choice(vocabulary))
+    return " ".join(parts)
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    alphabet = list("ab .,\n\t\r") + ["  ", " \n", "\n "] + list(CHAR_REPLACEMENTS) + [
+        "\x01", "\x0b", "\x7f", "\x80", "\x8f", "�", "\x14"]
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def check_equivalence(iterations: int = 2000) -> None:
+    """Verify streamed output matches sanitize_text of the whole text under arbitrary chunking."""
+    rng = random.Random(42)
+    for _ in range(iterations):
+        text = random_text(rng, rng.randint(0, 80))
+        expected = sanitize_text(text)
+
+        streaming = StreamingSanitizer()
+        output, position = [], 0
+        while position < len(text):
+            step = rng.randint(1, 6)
+            output.append(streaming.feed(text[position:position + step]))
+            position += step
+        output.append(streaming.flush())
+        assert "".join(output) == (expected or ""), repr(text)
+
+
+def main():
+    check_equivalence()
+    print("Streamed output matches sanitize_text (random chunking)")
+
+    draft = make_draft(3000)  # ~4k tokens
+    chunks = [draft[i:i + 12] for i in range(0, len(draft), 12)]
+
+    def sanitize_per_chunk():
+        for chunk in chunks:
+            sanitize_text(chunk)
+
+    def streaming_per_chunk():
+        streaming = StreamingSanitizer()
+        for chunk in chunks:
+            streaming.feed(chunk)
+        streaming.flush()
+
+    per_chunk = timeit.timeit(sanitize_per_chunk, number=20) / 20
+    streamed = timeit.timeit(streaming_per_chunk, number=20) / 20
+    print(f"Streamed ({len(chunks)} chunks): sanitize_text per chunk {per_chunk * 1000:.3f} ms, "
+          f"StreamingSanitizer {streamed * 1000:.3f} ms, speedup {per_chunk / streamed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Deterministic OpenAI-compatible stand-in for OpenRouter.
+
+Replays scripted (or recorded) Writer/Reader/Expert responses as streamed chat
+completions with a configurable time-to-first-token and token rate, so the
+coordinator can be benchmarked without paying for real model calls.
+
+Run standalone from the api directory:
+    python benchmarks/fake_openrouter.py --port 8787 --token-rate 200 --ttft 0.3
+then point the backend at it with OPENROUTER_BASE_URL=http://127.0.0.1:8787/api/v1
+
+``--error-rate`` and ``--drop-rate`` inject upstream failures (503/429 responses
+and connections cut mid-stream) to exercise the retry and resume paths.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Each agent's system prompt ends with a universal block appended by
+# SCPCoordinatorSession.initialize_agents; these lines identify the role.
+ROLE_SIGNATURES = {
+    "Writer": "CRITICAL - Story Writing Process",
+    "Reader": "Additional Universal Standards",
+    "Expert": "TECHNICAL QUALITY ASSURANCE",
+}
+
+STORY_SENTENCES = [
+    "Okafor logged the hum at 0300 and again at 0315, each time a half-step lower.",
+    "Nobody on the night shift wanted to say what it sounded like.",
+    "The containment cell was quiet when she opened the observation slot.",
+    "Rivera said the readings were fine, and then he stopped saying anything at all.",
+    "By morning the hallway smelled of wet paper and old radios.",
+]
+
+
+def scripted_story(words: int) -> str:
+    """Build a story of roughly ``words`` words from a fixed sentence rotation."""
+    sentences, count, i = [], 0, 0
+    while count < words:
+        sentence = STORY_SENTENCES[i % len(STORY_SENTENCES)]
+        sentences.append(sentence)
+        count += len(sentence.split())
+        i += 1
+        if i % 6 == 0:
+            sentences.append("\n\n")
+    return "# The Hum in Cell Nine\n\n" + " ".join(sentences).replace(" \n\n ", "\n\n")
+
+
+def default_transcript(story_words: int = 900) -> Dict[str, List[str]]:
+    """A minimal happy-path session: outline, approval, draft, approvals."""
+    story = scripted_story(story_words)
+    return {
+        "Writer": [
+            "Here is my outline:\n1. Core concept: a containment cell that hums lower each night\n"
+            "2. Main character: Technician Okafor\n3. Arc: routine, unease, discovery\n"
+            "4. Key scenes: the night log, the hallway, the silence\n5. Ending: the hum stops\n\n[@Reader]",
+            f"Here is the complete story.\n\n---BEGIN STORY---\n{story}\n---END STORY---\n\n[@Reader]",
+        ],
+        "Reader": [
+            "Tight, focused and it fits the length. I approve this outline. [@Writer]",
+            "The voice is natural and the ending lands. I APPROVE this story - it works. [@Expert]",
+        ],
+        "Expert": [
+            "No typos, word count is on target, no LLM-isms found. "
+            "I APPROVE this story as Expert - technical review passed",
+        ],
+    }
+
+
+class FakeOpenRouter:
+    """Scripted completion state per API key and role, plus handoff timing."""
+
+    def __init__(self, transcript: Dict[str, List[str]], token_rate: float = 200.0,
+                 ttft: float = 0.3, chunk_words: int = 3, error_rate: float = 0.0,
+                 drop_rate: float = 0.0, seed: int = 0):
+        self.transcript = transcript
+        self.token_rate = token_rate
+        self.ttft = ttft
+        self.chunk_words = chunk_words
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self._turns: Dict[tuple, int] = {}
+        self._dropped: Dict[tuple, str] = {}
+        self._last_stream_end: Dict[str, float] = {}
+        self._cached_prefixes: set = set()
+        self.handoff_gaps: List[float] = []
+        self.requests = 0
+        self.completion_tokens = 0
+        self.injected_errors = 0
+        self.dropped_streams = 0
+
+    @staticmethod
+    def detect_role(messages: List[dict]) -> str:
+        system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+        if isinstance(system, list):
+            system = " ".join(part.get("text", "") for part in system)
+        for role, signature in ROLE_SIGNATURES.items():
+            if signature in system:
+                return role
+        return "Writer"
+
+    def next_response(self, api_key: str, role: str) -> str:
+        turn = self._turns.get((api_key, role), 0)
+        self._turns[(api_key, role)] = turn + 1
+        script = self.transcript.get(role) or ["[@Writer]"]
+        # Past the end of the script, keep replaying the last response
+        return script[min(turn, len(script) - 1)]
+
+    def resumed_response(self, api_key: str, role: str, partial: str) -> str:
+        """The rest of the response a continuation request pre-filled with ``partial``."""
+        turn = max(0, self._turns.get((api_key, role), 1) - 1)
+        script = self.transcript.get(role) or ["[@Writer]"]
+        text = script[min(turn, len(script) - 1)]
+        return text[len(partial):] if text.startswith(partial) else text
+
+    def cached_tokens(self, messages: List[dict]) -> int:
+        """Simulate prompt caching: prefixes ending in a cache_control breakpoint hit on reuse."""
+        cached = 0
+        for index, message in enumerate(messages):
+            content = message.get("content")
+            if not isinstance(content, list):
+                continue
+            for part_index, part in enumerate(content):
+                if not part.get("cache_control"):
+                    continue
+                prefix = json.dumps(messages[:index] + [{**message, "content": content[:part_index + 1]}],
+                                    sort_keys=True)
+                digest = hashlib.sha256(prefix.encode()).hexdigest()
+                if digest in self._cached_prefixes:
+                    cached = len(prefix) // 4
+                self._cached_prefixes.add(digest)
+        return cached
+
+    def record_request(self, api_key: str) -> None:
+        self.requests += 1
+        last_end = self._last_stream_end.pop(api_key, None)
+        if last_end is not None:
+            self.handoff_gaps.append(time.perf_counter() - last_end)
+
+    def record_stream_end(self, api_key: str) -> None:
+        self._last_stream_end[api_key] = time.perf_counter()
+
+    def reset_stats(self) -> None:
+        self._turns.clear()
+        self._dropped.clear()
+        self._last_stream_end.clear()
+        self._cached_prefixes.clear()
+        self.handoff_gaps = []
+        self.requests = 0
+        self.completion_tokens = 0
+        self.injected_errors = 0
+        self.dropped_streams = 0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "completion_tokens": self.completion_tokens,
+            "injected_errors": self.injected_errors,
+            "dropped_streams": self.dropped_streams,
+            "handoff_gaps": list(self.handoff_gaps),
+        }
+
+
+def create_app(fake: FakeOpenRouter) -> FastAPI:
+    app = FastAPI(title="Fake OpenRouter")
+
+    def chunk_payload(completion_id: str, model: str, content: Optional[str],
+                      finish_reason: Optional[str] = None, usage: Optional[dict] = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [] if usage else [{
+                "index": 0,
+                "delta": {"content": content} if content is not None else {},
+                "finish_reason": finish_reason,
+            }],
+        }
+        if usage:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload)}\n\n"
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request, authorization: Optional[str] = Header(None)):
+        body = await request.json()
+        api_key = (authorization or "").replace("Bearer ", "")
+        fake.record_request(api_key)
+        messages = body.get("messages", [])
+        model = body.get("model", "fake/model")
+        if fake.error_rate and fake.random.random() < fake.error_rate:
+            fake.injected_errors += 1
+            if fake.random.random() < 0.5:
+                return JSONResponse({"error": {"message": "Rate limited", "code": 429}}, status_code=429,
+                                    headers={"Retry-After": "0.1"})
+            return JSONResponse({"error": {"message": "Provider unavailable", "code": 503}}, status_code=503)
+
+        role = fake.detect_role(messages)
+        last = messages[-1] if messages else {}
+        request_digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()
+        if last.get("role") == "assistant" and last.get("content"):
+            # Assistant prefill: continue an interrupted response
+            text = fake.resumed_response(api_key, role, last["content"])
+        elif fake._dropped.get((api_key, role)) == request_digest:
+            # The same request again after a drop: the turn is being restarted
+            text = fake.resumed_response(api_key, role, "")
+        else:
+            text = fake.next_response(api_key, role)
+        fake._dropped.pop((api_key, role), None)
+        prompt_tokens = sum(len(json.dumps(m)) for m in messages) // 4
+        cached_tokens = min(prompt_tokens, fake.cached_tokens(messages))
+
+        # Split on whitespace boundaries so chunks look like token deltas
+        pieces = re.findall(r'\S+\s*|\s+', text)
+        chunks = ["".join(pieces[i:i + fake.chunk_words]) for i in range(0, len(pieces), fake.chunk_words)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        # Like the real API, the usage-only chunk is opt-in
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+        drop_at = len(chunks) // 2 if fake.drop_rate and fake.random.random() < fake.drop_rate else None
+
+        async def stream():
+            await asyncio.sleep(fake.ttft)
+            delay = fake.chunk_words / fake.token_rate if fake.token_rate > 0 else 0
+            for index, chunk in enumerate(chunks):
+                if index == drop_at:
+                    fake.dropped_streams += 1
+                    fake._dropped[(api_key, role)] = request_digest
+                    raise ConnectionResetError("fake upstream dropped the stream")
+                yield chunk_payload(completion_id, model, chunk)
+                if delay:
+                    await asyncio.sleep(delay)
+            yield chunk_payload(completion_id, model, None, finish_reason="stop")
+            completion_tokens = len(pieces)
+            fake.completion_tokens += completion_tokens
+            if include_usage:
+                yield chunk_payload(completion_id, model, None, usage={
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                })
+            yield "data: [DONE]\n\n"
+            fake.record_stream_end(api_key)
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/api/v1/key")
+    async def key_info():
+        return {"data": {"label": "fake", "usage": 0, "limit": None}}
+
+    @app.get("/_stats")
+    async def stats():
+        return fake.stats()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--token-rate", type=float, default=200.0, help="tokens per second per stream")
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--transcript", help="JSON file mapping Writer/Reader/Expert to response lists")
+    parser.add_argument("--story-words", type=int, default=900)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failed with 429/503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of streams cut halfway")
+    args = parser.parse_args()
+
+    transcript = default_transcript(args.story_words)
+    if args.transcript:
+        with open(args.transcript, encoding="utf-8") as f:
+            transcript = json.load(f)
+
+    import uvicorn
+    fake = FakeOpenRouter(transcript, args.token_rate, args.ttft,
+                          error_rate=args.error_rate, drop_rate=args.drop_rate)
+    uvicorn.run(create_app(fake),
+                host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""In-memory stand-in for the subset of the supabase-py client the backend uses."""
+
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class _Result:
+    def __init__(self, data: List[dict]):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, db: "InMemorySupabase", table: str):
+        self.db = db
+        self.table = table
+        self.operation = "select"
+        self.payload: Any = None
+        self.filters: List[tuple] = []
+        self.order_by: Optional[tuple] = None
+        self.on_conflict: Optional[List[str]] = None
+        self.ignore_duplicates = False
+
+    def select(self, *columns, **kwargs) -> "_Query":
+        self.operation = "select"
+        return self
+
+    def insert(self, payload) -> "_Query":
+        self.operation = "insert"
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = "", ignore_duplicates: bool = False) -> "_Query":
+        self.operation = "upsert"
+        self.payload = payload
+        self.on_conflict = [column.strip() for column in on_conflict.split(",") if column.strip()]
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload: dict) -> "_Query":
+        self.operation = "update"
+        self.payload = payload
+        return self
+
+    def eq(self, column: str, value) -> "_Query":
+        self.filters.append((column, lambda v, expected=value: v == expected))
+        return self
+
+    def lt(self, column: str, value) -> "_Query":
+        self.filters.append((column, lambda v, bound=value: v is not None and v < bound))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self.order_by = (column, desc)
+        return self
+
+    def _matches(self, row: dict) -> bool:
+        return all(check(row.get(column)) for column, check in self.filters)
+
+    def execute(self) -> _Result:
+        return self.db._execute(self)
+
+
+class InMemorySupabase:
+    """
+    Thread-safe tables of dict rows that count every byte written, so benchmarks
+    can report persistence volume per story.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, List[dict]] = {}
+        self.bytes_written: Dict[str, int] = {}
+        self.writes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def _record_write(self, table: str, payload) -> None:
+        size = len(json.dumps(payload, default=str).encode("utf-8"))
+        self.bytes_written[table] = self.bytes_written.get(table, 0) + size
+        self.writes[table] = self.writes.get(table, 0) + 1
+
+    def _execute(self, query: _Query) -> _Result:
+        with self._lock:
+            rows = self.tables.setdefault(query.table, [])
+            if query.operation in ("insert", "upsert"):
+                self._record_write(query.table, query.payload)
+                new_rows = query.payload if isinstance(query.payload, list) else [query.payload]
+                inserted = []
+                for row in new_rows:
+                    row = dict(row)
+                    if query.operation == "upsert" and query.on_conflict:
+                        key = [row.get(column) for column in query.on_conflict]
+                        existing = next((r for r in rows if [r.get(c) for c in query.on_conflict] == key), None)
+                        if existing is not None:
+                            if not query.ignore_duplicates:
+                                existing.update(row)
+                                inserted.append(existing)
+                            continue
+                    row.setdefault("id", self._next_id)
+                    self._next_id += 1
+                    rows.append(row)
+                    inserted.append(row)
+                return _Result(inserted)
+
+            matched = [row for row in rows if query._matches(row)]
+            if query.operation == "update":
+                self._record_write(query.table, query.payload)
+                for row in matched:
+                    row.update(query.payload)
+                return _Result(matched)
+
+            if query.order_by:
+                column, desc = query.order_by
+                matched = sorted(matched, key=lambda row: row.get(column) or 0, reverse=desc)
+            return _Result([dict(row) for row in matched])
+
+    def total_bytes_written(self) -> int:
+        return sum(self.bytes_written.values())
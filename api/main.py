@@ -5,8 +5,8 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
+import functools
 import json
-import sys
 import os
 from pathlib import Path
 from typing import Dict, Optional
@@ -17,11 +17,23 @@ load_dotenv(Path(__file__).parent / '.env')
 
 from scp_coordinator_session import SCPCoordinatorSession, StoryConfig as SessionStoryConfig
 # Import from utils specifically
-from utils.text_sanitizer import sanitize_text
-from utils.encryption import encryptor
-from auth import router as auth_router, get_current_user
+from utils.text_sanitizer import sanitize_text, StreamingSanitizer
+from utils.key_cache import key_cache
+from utils.jwt_verifier import jwt_verifier
+from utils.db_executor import db_executor
+from utils.stream_coalescer import ChunkCoalescer
+from utils.story_jobs import JobLimitError, StoryJob, story_job_runner
+from auth import router as auth_router, get_user_openrouter_key
 from supabase import create_client, Client
 from utils.story_session_manager import StorySessionManager
+from agents.client_registry import client_registry
+from agents.llm_scheduler import llm_scheduler
+from agents.resilience import STREAM_RESTART, retry_policy, hedge_policy
+from agents.model_router import model_router
+from themes.prompt_templates import theme_prompt_cache
+from utils.draft_linter import draft_linter
+from utils.story_patch import story_patcher
+from agents.usage import add_usage
 
 # Store active websocket connections
 active_connections: Dict[str, WebSocket] = {}
@@ -44,8 +56,14 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     print("Shutting down SCP Writer API...")
-    # Stop session cleanup task
-    await story_session_manager.stop_cleanup_task()
+    # Cancel story jobs still running
+    await story_job_runner.shutdown()
+    # Stop session cleanup task and flush queued session writes
+    await story_session_manager.close()
+    # Close pooled OpenRouter connections
+    await client_registry.aclose()
+    # Let in-flight database queries finish
+    db_executor.shutdown()
 
 app = FastAPI(
     title="SCP Writer API",
@@ -69,6 +87,376 @@ app.add_middleware(
 # Include auth router
 app.include_router(auth_router)
 
+async def run_story_job(job: StoryJob, params: dict, user_api_key: str):
+    """
+    Generate a story in the background, emitting client events into the job's
+    event buffer. Runs independently of any WebSocket so a dropped connection
+    does not abort the generation; clients follow it via story_job_runner.attach.
+    """
+    user_id = job.user_id
+    session_id = job.session_id
+    theme = params.get("theme", "")
+    protagonist_name = params.get("protagonist")
+    model = params.get("model")
+    ui_theme = params.get("uiTheme", "scp")
+    # Optional per-role overrides, e.g. {"Reader": "<fast model>", "Writer": "<strong model>"}
+    role_models = params.get("roleModels")
+    if not isinstance(role_models, dict):
+        role_models = None
+    draft_candidates = params.get("draftCandidates")
+    if not isinstance(draft_candidates, int) or isinstance(draft_candidates, bool):
+        draft_candidates = None
+    
+    # Create story configuration
+    story_config = SessionStoryConfig(
+        page_limit=params.get("pages", 3),
+        protagonist_name=protagonist_name,
+        model=model,
+        role_models=role_models,
+        parallel_review=params.get("parallelReview"),
+        draft_candidates=draft_candidates,
+        patch_revisions=params.get("patchRevisions"),
+        theme=ui_theme,
+        theme_options=params.get("themeOptions", {})
+    )
+    
+    # Create coordinator with session support
+    coordinator = SCPCoordinatorSession(
+        story_config=story_config,
+        api_key=user_api_key,
+        session_manager=story_session_manager,
+        session_id=session_id
+    )
+    
+    # Debug logging for loaded theme
+    print(f"🎯 LOADED THEME: {coordinator.theme.name} (ID: {coordinator.theme.id})")
+    print(f"👥 AGENT SYSTEM: Writer, Reader, Expert")
+    
+    # Create custom agent wrapper for streaming
+    class StreamingAgent:
+        def __init__(self, original_agent, emit, coordinator):
+            self.original_agent = original_agent
+            self.emit = emit
+            self.coordinator = coordinator
+            # Copy necessary attributes
+            self.name = original_agent.name
+            self.system_prompt = original_agent.system_prompt
+            self.model = getattr(original_agent, 'model', 'anthropic/claude-3.5-sonnet')
+            
+        async def respond(self, prompt: str, skip_callback: bool = False, on_chunk=None, record: bool = True):
+            # Send thinking state update
+            await self.emit({
+                "type": "agent_update",
+                "agent": self.name,
+                "state": "thinking",
+                "activity": self._get_thinking_activity(),
+                "message": f"{self.name} is processing..."
+            })
+            
+            # Small delay to ensure state is visible
+            await asyncio.sleep(0.5)
+            
+            # Send writing state update
+            await self.emit({
+                "type": "agent_update",
+                "agent": self.name,
+                "state": "writing",
+                "activity": self._get_writing_activity(),
+                "message": f"{self.name} is composing response..."
+            })
+            
+            # Stream response from original agent, coalescing token deltas
+            # into time/size-bounded frames to cut per-chunk sends
+            turn = self.coordinator.turn_of(self.name)
+            sanitizer = StreamingSanitizer()
+            
+            async def send_chunk(text: str):
+                await self.emit({
+                    "type": "agent_stream_chunk",
+                    "agent": self.name,
+                    "chunk": text,
+                    "turn": turn
+                })
+            
+            async def send_frame(text: str):
+                # Sanitize incrementally so whitespace split across frames
+                # is normalized exactly as in the full message
+                clean = sanitizer.feed(text)
+                if clean:
+                    await send_chunk(clean)
+            
+            coalescer = ChunkCoalescer(send_frame)
+            response_text = ""
+            async for chunk in self.original_agent.respond_streaming(prompt, skip_callback=skip_callback,
+                                                                     on_chunk=on_chunk, record=record):
+                if chunk is STREAM_RESTART:
+                    # The model is answering from the top again; the client
+                    # drops what it has streamed of this turn so far
+                    await coalescer.flush()
+                    sanitizer = StreamingSanitizer()
+                    response_text = ""
+                    await self.emit({
+                        "type": "agent_stream_reset",
+                        "agent": self.name,
+                        "turn": turn
+                    })
+                    continue
+                response_text += chunk
+                await coalescer.add(chunk)
+            stream_stats = await coalescer.close()
+            tail = sanitizer.flush()
+            if tail:
+                await send_chunk(tail)
+            print(f"📡 {self.name} stream: {stream_stats['chunks']} chunks in {stream_stats['frames']} frames "
+                  f"({stream_stats['frames_per_second']} fps)")
+            
+            # Send complete message when done; an unrecorded response is sent
+            # by record_response once the coordinator settles its final text
+            if record:
+                await self.emit({
+                    "type": "agent_message",
+                    "agent": self.name,
+                    "message": sanitize_text(response_text),
+                    "turn": turn,
+                    "phase": self.coordinator.current_phase,
+                    "stream_stats": stream_stats
+                })
+            
+            # Report this turn's token usage with the running session total
+            usage = self.original_agent.last_usage
+            if usage:
+                turn_usage = usage.to_dict()
+                await self.emit({
+                    "type": "usage",
+                    "agent": self.name,
+                    "turn": turn,
+                    "phase": self.coordinator.current_phase,
+                    "usage": turn_usage,
+                    "session_total": add_usage(self.coordinator.usage_summary()["session"], turn_usage)
+                })
+            
+            # Send milestone update if applicable
+            milestone = self._get_milestone_for_phase(self.coordinator.current_phase)
+            if milestone:
+                await self.emit({
+                    "type": "agent_update",
+                    "agent": self.name,
+                    "state": "waiting",
+                    "milestone": milestone,
+                    "message": f"Milestone reached: {milestone}"
+                })
+            
+            return response_text
+        
+        async def generate(self, prompt: str):
+            # Best-of-N draft candidates are generated silently; only the
+            # chosen one is sent to the client, by record_response
+            return await self.original_agent.generate(prompt)
+        
+        async def record_response(self, prompt: str, response_text: str, skip_callback: bool = False):
+            await self.original_agent.record_response(prompt, response_text, skip_callback)
+            await self.emit({
+                "type": "agent_message",
+                "agent": self.name,
+                "message": sanitize_text(response_text),
+                "turn": self.coordinator.turn_of(self.name),
+                "phase": self.coordinator.current_phase
+            })
+        
+        async def discard_response(self):
+            # The client drops the streamed text of a response that won't be kept
+            await self.emit({
+                "type": "agent_stream_reset",
+                "agent": self.name,
+                "turn": self.coordinator.turn_of(self.name)
+            })
+        
+        def _get_thinking_activity(self):
+            activities = {
+                "Writer": "Analyzing theme and narrative structure...",
+                "Reader": "Preparing to review story elements...",
+                "Expert": "Checking SCP database and protocols..."
+            }
+            return activities.get(self.name, f"{self.name} is thinking...")
+        
+        def _get_writing_activity(self):
+            activities = {
+                "Writer": "Crafting SCP narrative...",
+                "Reader": "Providing detailed feedback...",
+                "Expert": "Documenting containment procedures..."
+            }
+            return activities.get(self.name, f"{self.name} is writing...")
+        
+        def _get_milestone_for_phase(self, phase):
+            if not phase:
+                return None
+            phase_lower = phase.lower()
+            milestones = {
+                "brainstorming": "theme_selected",
+                "initial_draft": "initial_draft",
+                "feedback": "feedback_received",
+                "revision": "revision_complete",
+                "expert_review": "expert_review",
+                "final_polish": "final_polish"
+            }
+            return milestones.get(phase_lower)
+    
+    # Override run_conversation to wrap agents after initialization
+    original_run_conversation = coordinator.run_conversation
+    
+    async def wrapped_run_conversation(opening_speaker: str, opening_prompt: str):
+        # Wrap agents with streaming capability
+        for agent_name in coordinator.agents:
+            coordinator.agents[agent_name] = StreamingAgent(
+                coordinator.agents[agent_name], 
+                job.emit, 
+                coordinator
+            )
+        # Call original method
+        return await original_run_conversation(opening_speaker, opening_prompt)
+    
+    coordinator.run_conversation = wrapped_run_conversation
+    
+    # Run story generation
+    try:
+        await coordinator.run_story_creation(theme)
+        
+        # Get final story from session
+        story_content = story_session_manager.extract_story_from_draft(session_id)
+        usage_summary = coordinator.usage_summary()
+        
+        if story_content:
+            # Save story to database
+            try:
+                # Extract title from story (usually first line after #)
+                lines = story_content.split('\n')
+                title = "Untitled Story"
+                for line in lines:
+                    if line.strip().startswith('#') and not line.strip().startswith('##'):
+                        title = line.strip('#').strip()
+                        break
+                
+                # Save to database with session reference
+                story_record = await db_executor.execute(supabase.table("stories").insert({
+                    "user_id": user_id,
+                    "title": title,
+                    "theme": ui_theme,
+                    "protagonist_name": protagonist_name,
+                    "content": story_content,
+                    "session_id": session_id,  # Link to session
+                    "agent_logs": {
+                        "conversation_history": coordinator.conversation_history,
+                        "turn_count": coordinator.turn_count,
+                        "phases": coordinator.current_phase,
+                        "usage": usage_summary
+                    },
+                    "model_used": coordinator.story_model() or model or "default",
+                    "tokens_used": usage_summary["session"]["total_tokens"]
+                }), "stories.insert")
+                
+                print(f"Story saved to database with ID: {story_record.data[0]['id']}")
+            except Exception as e:
+                print(f"Error saving story to database: {e}")
+            
+            # Send final milestone
+            await job.emit({
+                "type": "agent_update",
+                "agent": "System",
+                "state": "completed",
+                "milestone": "story_complete",
+                "message": "Story generation complete!"
+            })
+            
+            await job.emit({
+                "type": "completed",
+                "story": sanitize_text(story_content),
+                "session_id": session_id,
+                "usage": usage_summary["session"],
+                "message": "Story generation complete!"
+            })
+        else:
+            await job.emit({
+                "type": "error",
+                "message": "Story generation completed but no story found in session"
+            })
+            
+    except asyncio.CancelledError:
+        # Server shutdown
+        await story_session_manager.fail_session(session_id, "Server shutting down")
+        raise
+    except Exception as e:
+        # Mark session as failed
+        await story_session_manager.fail_session(session_id, str(e))
+        
+        await job.emit({
+            "type": "error",
+            "message": f"Error during story generation: {str(e)}"
+        })
+
+
+def session_snapshot(session_id: str) -> dict:
+    """State a resuming client needs when it missed more events than are buffered."""
+    session = story_session_manager.get_session(session_id)
+    if not session:
+        return {"messages": []}
+    return {
+        "status": session.status,
+        "messages": [
+            {
+                "agent": message["agent_name"],
+                "message": sanitize_text(message["message"]),
+                "turn": message["turn"],
+                "phase": message.get("phase")
+            }
+            for message in session.messages
+        ]
+    }
+
+
+async def forward_job_events(websocket: WebSocket, job: StoryJob, last_seq: int = 0):
+    """Stream a job's events to the client, replaying any after last_seq first."""
+    async for event in story_job_runner.attach(job, last_seq):
+        await websocket.send_json(event)
+
+
+async def resume_story_stream(websocket: WebSocket, user_id: str, session_id: Optional[str], last_seq):
+    """Reattach a reconnecting client to its story job, or return the finished story."""
+    try:
+        last_seq = int(last_seq)
+    except (TypeError, ValueError):
+        last_seq = -1
+    if last_seq < 0:
+        await websocket.send_json({
+            "type": "error",
+            "message": "last_seq must be a non-negative integer"
+        })
+        return
+    
+    job = story_job_runner.get(session_id) if session_id else None
+    if job and job.user_id == user_id:
+        await forward_job_events(websocket, job, last_seq)
+        return
+    
+    # The job is gone (finished long ago or the server restarted); fall back to the session
+    session = None
+    if session_id:
+        session = story_session_manager.get_session(session_id) or await story_session_manager.recover_session(session_id)
+    if session and session.user_id == user_id and session.status == "completed":
+        story_content = story_session_manager.extract_story_from_draft(session_id)
+        if story_content:
+            await websocket.send_json({
+                "type": "completed",
+                "story": sanitize_text(story_content),
+                "session_id": session_id,
+                "message": "Story generation complete!"
+            })
+            return
+    await websocket.send_json({
+        "type": "error",
+        "message": "This story session is no longer running"
+    })
+
+
 @app.get("/")
 async def root():
     return {"message": "SCP Writer API", "status": "operational"}
@@ -98,17 +486,16 @@ async def websocket_generate(websocket: WebSocket):
             
             # Verify token and get user
             try:
-                from jose import jwt
-                payload = jwt.get_unverified_claims(token)
+                payload = await jwt_verifier.verify(token)
                 user_id = payload.get("sub")
                 
                 if not user_id:
                     raise Exception("Invalid token")
                 
-                # Get user's OpenRouter API key
-                result = supabase.table("user_api_keys").select("encrypted_key").eq("user_id", user_id).eq("provider", "openrouter").eq("is_active", True).execute()
+                # Get user's decrypted OpenRouter API key (cached across reconnects)
+                user_api_key = await get_user_openrouter_key(user_id)
                 
-                if not result.data:
+                if not user_api_key:
                     await websocket.send_json({
                         "type": "error",
                         "message": "Please connect your OpenRouter account first"
@@ -116,9 +503,6 @@ async def websocket_generate(websocket: WebSocket):
                     await websocket.close()
                     return
                 
-                # Decrypt the API key
-                user_api_key = encryptor.decrypt_api_key(result.data[0]["encrypted_key"])
-                
                 # Send auth success
                 await websocket.send_json({
                     "type": "auth_success",
@@ -145,6 +529,11 @@ async def websocket_generate(websocket: WebSocket):
             data = await websocket.receive_text()
             params = json.loads(data)
             
+            # Reattach to a generation that is still running (or recently finished)
+            if params.get("type") == "resume":
+                await resume_story_stream(websocket, user_id, params.get("session_id"), params.get("last_seq") or 0)
+                continue
+            
             theme = params.get("theme", "")
             page_limit = params.get("pages", 3)
             protagonist_name = params.get("protagonist")
@@ -152,6 +541,14 @@ async def websocket_generate(websocket: WebSocket):
             ui_theme = params.get("uiTheme", "scp")
             theme_options = params.get("themeOptions", {})
             
+            if not story_job_runner.can_submit(user_id):
+                await websocket.send_json({
+                    "type": "error",
+                    "message": f"You already have {story_job_runner.max_per_user} stories generating. "
+                               f"Wait for one to finish before starting another."
+                })
+                continue
+            
             # Debug logging for theme loading
             print(f"🎭 THEME DEBUG: Received uiTheme='{ui_theme}' from frontend")
             print(f"📊 THEME OPTIONS: {theme_options}")
@@ -163,15 +560,6 @@ async def websocket_generate(websocket: WebSocket):
                 "phase": "initialization"
             })
             
-            # Create story configuration
-            story_config = SessionStoryConfig(
-                page_limit=page_limit,
-                protagonist_name=protagonist_name,
-                model=model,
-                theme=ui_theme,
-                theme_options=theme_options
-            )
-            
             # Create a new session for this story generation
             session_id = await story_session_manager.create_session(
                 user_id=user_id,
@@ -180,233 +568,67 @@ async def websocket_generate(websocket: WebSocket):
                     "page_limit": page_limit,
                     "protagonist_name": protagonist_name,
                     "model": model,
+                    "role_models": params.get("roleModels"),
+                    "parallel_review": params.get("parallelReview"),
+                    "draft_candidates": params.get("draftCandidates"),
+                    "patch_revisions": params.get("patchRevisions"),
                     "theme_options": theme_options,
                     "user_request": theme
                 }
             )
             
-            # Send session ID to frontend
-            await websocket.send_json({
+            # Run the generation as a background job; this connection (and any
+            # later one that resumes the session) only follows its event stream
+            try:
+                job = story_job_runner.submit(
+                    session_id,
+                    user_id,
+                    functools.partial(run_story_job, params=params, user_api_key=user_api_key),
+                    snapshot=functools.partial(session_snapshot, session_id)
+                )
+            except JobLimitError as e:
+                # Another connection of this user started a job meanwhile
+                await story_session_manager.fail_session(session_id, str(e))
+                await websocket.send_json({"type": "error", "message": str(e)})
+                continue
+            
+            # Send session ID to frontend; clients resume with it and the last seq seen
+            await job.emit({
                 "type": "session_created",
                 "session_id": session_id,
                 "message": "Story generation session created"
             })
             
-            # Create coordinator with session support
-            coordinator = SCPCoordinatorSession(
-                story_config=story_config,
-                api_key=user_api_key,
-                session_manager=story_session_manager,
-                session_id=session_id
-            )
-            
-            # Debug logging for loaded theme
-            print(f"🎯 LOADED THEME: {coordinator.theme.name} (ID: {coordinator.theme.id})")
-            print(f"👥 AGENT SYSTEM: Writer, Reader, Expert")
-            
-            # Create custom agent wrapper for streaming
-            class StreamingAgent:
-                def __init__(self, original_agent, websocket, coordinator):
-                    self.original_agent = original_agent
-                    self.websocket = websocket
-                    self.coordinator = coordinator
-                    # Copy necessary attributes
-                    self.name = original_agent.name
-                    self.system_prompt = original_agent.system_prompt
-                    self.model = getattr(original_agent, 'model', 'anthropic/claude-3.5-sonnet')
-                    
-                async def respond(self, prompt: str, skip_callback: bool = False):
-                    # Send thinking state update
-                    await self.websocket.send_json({
-                        "type": "agent_update",
-                        "agent": self.name,
-                        "state": "thinking",
-                        "activity": self._get_thinking_activity(),
-                        "message": f"{self.name} is processing..."
-                    })
-                    
-                    # Small delay to ensure state is visible
-                    await asyncio.sleep(0.5)
-                    
-                    # Send writing state update
-                    await self.websocket.send_json({
-                        "type": "agent_update",
-                        "agent": self.name,
-                        "state": "writing",
-                        "activity": self._get_writing_activity(),
-                        "message": f"{self.name} is composing response..."
-                    })
-                    
-                    # Stream response from original agent
-                    response_text = ""
-                    async for chunk in self.original_agent.respond_streaming(prompt, skip_callback):
-                        response_text += chunk
-                        # Send chunk via WebSocket
-                        await self.websocket.send_json({
-                            "type": "agent_stream_chunk",
-                            "agent": self.name,
-                            "chunk": sanitize_text(chunk),
-                            "turn": self.coordinator.turn_count
-                        })
-                    
-                    # Send complete message when done
-                    await self.websocket.send_json({
-                        "type": "agent_message",
-                        "agent": self.name,
-                        "message": sanitize_text(response_text),
-                        "turn": self.coordinator.turn_count,
-                        "phase": self.coordinator.current_phase
-                    })
-                    
-                    # Send milestone update if applicable
-                    milestone = self._get_milestone_for_phase(self.coordinator.current_phase)
-                    if milestone:
-                        await self.websocket.send_json({
-                            "type": "agent_update",
-                            "agent": self.name,
-                            "state": "waiting",
-                            "milestone": milestone,
-                            "message": f"Milestone reached: {milestone}"
-                        })
-                    
-                    return response_text
-                
-                def _get_thinking_activity(self):
-                    activities = {
-                        "Writer": "Analyzing theme and narrative structure...",
-                        "Reader": "Preparing to review story elements...",
-                        "Expert": "Checking SCP database and protocols..."
-                    }
-                    return activities.get(self.name, f"{self.name} is thinking...")
-                
-                def _get_writing_activity(self):
-                    activities = {
-                        "Writer": "Crafting SCP narrative...",
-                        "Reader": "Providing detailed feedback...",
-                        "Expert": "Documenting containment procedures..."
-                    }
-                    return activities.get(self.name, f"{self.name} is writing...")
-                
-                def _get_milestone_for_phase(self, phase):
-                    if not phase:
-                        return None
-                    phase_lower = phase.lower()
-                    milestones = {
-                        "brainstorming": "theme_selected",
-                        "initial_draft": "initial_draft",
-                        "feedback": "feedback_received",
-                        "revision": "revision_complete",
-                        "expert_review": "expert_review",
-                        "final_polish": "final_polish"
-                    }
-                    return milestones.get(phase_lower)
-            
-            # Override run_conversation to wrap agents after initialization
-            original_run_conversation = coordinator.run_conversation
-            
-            async def wrapped_run_conversation(opening_speaker: str, opening_prompt: str):
-                # Wrap agents with streaming capability
-                for agent_name in coordinator.agents:
-                    coordinator.agents[agent_name] = StreamingAgent(
-                        coordinator.agents[agent_name], 
-                        websocket, 
-                        coordinator
-                    )
-                # Call original method
-                return await original_run_conversation(opening_speaker, opening_prompt)
-            
-            coordinator.run_conversation = wrapped_run_conversation
-            
-            # Run story generation
-            try:
-                await coordinator.run_story_creation(theme)
-                
-                # Get final story from session
-                story_content = story_session_manager.extract_story_from_draft(session_id)
-                
-                if story_content:
-                    # Save story to database
-                    try:
-                        # Extract title from story (usually first line after #)
-                        lines = story_content.split('\n')
-                        title = "Untitled Story"
-                        for line in lines:
-                            if line.strip().startswith('#') and not line.strip().startswith('##'):
-                                title = line.strip('#').strip()
-                                break
-                        
-                        # Save to database with session reference
-                        story_record = supabase.table("stories").insert({
-                            "user_id": user_id,
-                            "title": title,
-                            "theme": ui_theme,
-                            "protagonist_name": protagonist_name,
-                            "content": story_content,
-                            "session_id": session_id,  # Link to session
-                            "agent_logs": {
-                                "conversation_history": coordinator.conversation_history,
-                                "turn_count": coordinator.turn_count,
-                                "phases": coordinator.current_phase
-                            },
-                            "model_used": model or "default",
-                            "tokens_used": None  # TODO: Track token usage
-                        }).execute()
-                        
-                        print(f"Story saved to database with ID: {story_record.data[0]['id']}")
-                    except Exception as e:
-                        print(f"Error saving story to database: {e}")
-                    
-                    # Send final milestone
-                    await websocket.send_json({
-                        "type": "agent_update",
-                        "agent": "System",
-                        "state": "completed",
-                        "milestone": "story_complete",
-                        "message": "Story generation complete!"
-                    })
-                    
-                    await websocket.send_json({
-                        "type": "completed",
-                        "story": sanitize_text(story_content),
-                        "session_id": session_id,
-                        "message": "Story generation complete!"
-                    })
-                else:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": "Story generation completed but no story found in session"
-                    })
-                    
-            except Exception as e:
-                # Mark session as failed
-                if 'session_id' in locals():
-                    await story_session_manager.fail_session(session_id, str(e))
-                
-                await websocket.send_json({
-                    "type": "error",
-                    "message": f"Error during story generation: {str(e)}"
-                })
+            await forward_job_events(websocket, job)
     
     except WebSocketDisconnect:
         del active_connections[str(connection_id)]
+        # Any story job keeps running; the client can resume it by session ID
         print(f"Client {connection_id} disconnected")
-        # Mark any active session as failed on disconnect
-        if 'session_id' in locals():
-            await story_session_manager.fail_session(session_id, "WebSocket disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
         if str(connection_id) in active_connections:
             del active_connections[str(connection_id)]
-        # Mark any active session as failed
-        if 'session_id' in locals():
-            await story_session_manager.fail_session(session_id, f"WebSocket error: {str(e)}")
 
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
         "active_connections": len(active_connections),
-        "active_sessions": len(story_session_manager.active_sessions)
+        "active_sessions": len(story_session_manager.active_sessions),
+        "openrouter_clients": client_registry.stats(),
+        "database": db_executor.stats(),
+        "write_queue": story_session_manager.write_queue.stats(),
+        "api_key_cache": key_cache.stats(),
+        "jwt_verifier": jwt_verifier.stats(),
+        "story_jobs": story_job_runner.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_retries": retry_policy.stats(),
+        "llm_hedging": hedge_policy.stats(),
+        "model_router": model_router.stats(),
+        "theme_prompts": theme_prompt_cache.stats(),
+        "draft_linter": draft_linter.stats(),
+        "story_patches": story_patcher.stats()
     }
 
 @app.get("/api/sessions/{session_id}")
@@ -2,18 +2,22 @@
 """SCP Story Coordinator with Session Support - manages conversation flow between Writer, Reader, and Expert agents."""
 
 import asyncio
+import os
 import re
 import time
 import logging
-from pathlib import Path
 from typing import Optional, Dict, List, Tuple
-from datetime import datetime
 
 from agents.base_agent import BaseAgent
+from agents.llm_scheduler import PRIORITIES, PRIORITY_INTERACTIVE
+from agents.signal_detector import SignalDetector, SignalVerdict, detect_signals
+from agents.usage import TurnUsage, aggregate_usage, combine_usage
 from utils import CheckpointManager
-from utils.text_sanitizer import sanitize_text
+from utils.draft_linter import LLM_ISMS, LintFinding, draft_linter, extract_marked_story, format_findings
+from utils.story_patch import EDIT_FORMAT, PatchError, parse_edits, story_patcher
 from utils.story_session_manager import StorySessionManager
 from themes import get_theme, StoryTheme
+from themes.prompt_templates import theme_prompt_cache
 
 # Configure logging
 logging.basicConfig(
@@ -22,20 +26,68 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Last-resort budget for a whole turn; stalled streams are caught and retried
+# much sooner by the agents' idle timeout (LLM_STREAM_IDLE_TIMEOUT)
+TURN_TIMEOUT = float(os.getenv("LLM_TURN_TIMEOUT", "600"))
+
+def _env_int(name: str, default: int) -> int:
+    """An integer setting from the environment, falling back to ``default`` if it is malformed."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Ignoring {name}={value!r}: not an integer; using {default}")
+        return default
+
+
+# How many times in a row a draft goes straight back to the Writer for issues
+# the local checks found, before it is passed on for review anyway
+MAX_LINT_RETURNS = _env_int("DRAFT_LINT_MAX_RETURNS", 2)
+
+# Upper bound on concurrent first-draft candidates a session may ask for
+MAX_DRAFT_CANDIDATES = _env_int("DRAFT_CANDIDATES_MAX", 4)
+
 
 class StoryConfig:
     """Configuration for story parameters with flexible page limits."""
     
-    def __init__(self, page_limit: int = 3, words_per_page: int = 300, protagonist_name: Optional[str] = None, model: Optional[str] = None, theme: Optional[str] = None, theme_options: Optional[Dict] = None):
+    def __init__(self, page_limit: int = 3, words_per_page: int = 300, protagonist_name: Optional[str] = None, model: Optional[str] = None, theme: Optional[str] = None, theme_options: Optional[Dict] = None,
+                 priority: str = "interactive",
+                 role_models: Optional[Dict[str, str]] = None, lint_drafts: Optional[bool] = None,
+                 parallel_review: Optional[bool] = None, draft_candidates: Optional[int] = None,
+                 patch_revisions: Optional[bool] = None):
         self.page_limit = page_limit
         self.words_per_page = words_per_page
         self.protagonist_name = protagonist_name
         self.model = model
+        # Per-role model choices (e.g. {"Reader": "..."}), overriding ``model`` for that role
+        self.role_models = role_models or {}
         self.theme = theme or "scp"
         self.theme_options = theme_options or {}
         self.total_words = page_limit * words_per_page
         self.checkpoint_1_words = int(self.total_words * 0.33)
         self.checkpoint_2_words = int(self.total_words * 0.66)
+        # "interactive" sessions are scheduled ahead of "batch" work
+        self.priority = priority
+        # Check Writer drafts locally for mechanical issues before review
+        if lint_drafts is None:
+            lint_drafts = os.getenv("DRAFT_LINT", "true").lower() in ("1", "true", "yes")
+        self.lint_drafts = lint_drafts
+        # Review complete drafts with the Reader and Expert at the same time
+        if parallel_review is None:
+            parallel_review = os.getenv("PARALLEL_REVIEW", "false").lower() in ("1", "true", "yes")
+        self.parallel_review = parallel_review
+        # Writer drafts generated concurrently for the first full draft; the best
+        # one by local scoring goes to review
+        if draft_candidates is None:
+            draft_candidates = _env_int("DRAFT_CANDIDATES", 1)
+        self.draft_candidates = min(max(1, draft_candidates), MAX_DRAFT_CANDIDATES)
+        # Let the Writer revise with targeted edits instead of resending the whole story
+        if patch_revisions is None:
+            patch_revisions = os.getenv("PATCH_REVISIONS", "true").lower() in ("1", "true", "yes")
+        self.patch_revisions = patch_revisions
         
     def get_scope_guidance(self) -> str:
         """Get appropriate scope guidance based on page limit."""
@@ -61,6 +113,8 @@ class SCPCoordinatorSession:
         self.conversation_history = []
         self.current_speaker = None
         self.turn_count = 0
+        # Turns of reviewers responding concurrently, which share turn_count
+        self.review_turns: Dict[str, int] = {}
         self.max_turns = 100  # Increased to allow healthy back-and-forth
         self.story_complete = False
         self.user_request = ""
@@ -69,60 +123,54 @@ class SCPCoordinatorSession:
         self.api_key = api_key  # Store user's OpenRouter API key
         self.session_manager = session_manager
         self.session_id = session_id
+        # Local check results for the Writer's latest draft
+        self.lint_findings: List[LintFinding] = []
+        self.lint_returns = 0
+        # Whether the first full draft was already picked from several candidates
+        self.candidates_drafted = False
         
-    def parse_next_speaker(self, message: str) -> Optional[str]:
-        """Extract who should speak next from a message."""
-        # Look for patterns like [@Writer], [@Reader], [@Expert]
-        patterns = [
-            r'\[@(\w+)\]',  # [@Writer]
-            r'\[Next:\s*(\w+)\]',  # [Next: Reader]
-            r'\[(\w+)\'s turn\]',  # [Writer's turn]
-            r'@(\w+)',  # @Expert
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                name = match.group(1)
-                # Normalize the name - match partial names
-                for agent_name in self.agents.keys():
-                    if (name.lower() in agent_name.lower() or 
-                        agent_name.lower() in name.lower()):
-                        return agent_name
+    def model_for(self, role: str) -> Optional[str]:
+        """The model chosen for a role, if any; agents fall back to the role's chain."""
+        return self.story_config.role_models.get(role) or self.story_config.model
+    
+    def parse_next_speaker(self, message: str, verdict: Optional[SignalVerdict] = None) -> Optional[str]:
+        """Extract who should speak next from a message (or its already-detected signals)."""
+        # Look for patterns like [@Writer], [Next: Reader], [Writer's turn], @Expert
+        verdict = verdict or detect_signals(message)
+        agent_name = verdict.next_speaker(self.resolve_agent_name)
+        if agent_name:
+            return agent_name
         
         # Check for completion signals
-        if self.check_story_completion(message):
+        if verdict.completion:
             self.story_complete = True
-            return None
             
         return None
     
+    def resolve_agent_name(self, name: str) -> Optional[str]:
+        """Normalize a mentioned name to an agent name - matches partial names."""
+        for agent_name in self.agents.keys():
+            if (name.lower() in agent_name.lower() or 
+                agent_name.lower() in name.lower()):
+                return agent_name
+        return None
+    
+    def alternate_speaker(self, speaker: str) -> str:
+        """Pick who speaks next when an agent tries to hand off to itself."""
+        if speaker == "Writer":
+            return "Reader"
+        elif speaker == "Reader":
+            return "Writer"
+        else:  # Expert
+            return "Writer"  # Default to Writer after Expert decision
+    
     def check_story_completion(self, message: str) -> bool:
         """Check if the story is complete."""
-        completion_signals = [
-            "[STORY COMPLETE]", 
-            "[END]", 
-            "[FINISHED]",
-            "story is complete and satisfying"
-        ]
-        return any(signal in message.upper() for signal in completion_signals)
+        return detect_signals(message).completion
     
     def check_story_approval(self, message: str, agent_name: str = None) -> bool:
         """Check if the Reader or Expert has approved the story."""
-        approval_phrases = [
-            "I APPROVE this story",
-            "I APPROVE the story",
-            "story is approved",
-            "I approve this story",
-            "I approve the story"
-        ]
-        has_approval = any(phrase.lower() in message.lower() for phrase in approval_phrases)
-        
-        # Check for Expert's specific technical review approval
-        if agent_name == "Expert" and has_approval:
-            return "technical review passed" in message.lower()
-        
-        return has_approval
+        return detect_signals(message).approved_by(agent_name)
     
     async def extract_story_from_discussion(self) -> Optional[str]:
         """Extract the latest story from session storage."""
@@ -131,18 +179,101 @@ class SCPCoordinatorSession:
             
         return self.session_manager.extract_story_from_draft(self.session_id)
     
+    def lint_draft(self, response: str) -> Optional[List[LintFinding]]:
+        """Run the local pre-review checks on the story in a response; None if it has no story."""
+        story = extract_marked_story(response)
+        if story is None or not self.story_config.lint_drafts:
+            return None
+        findings = draft_linter.lint(story, self.story_config.total_words)
+        if findings:
+            logger.info(f"Draft checks found {len(findings)} issue(s) (turn {self.turn_count})")
+        return findings
+    
+    def lint_summary(self) -> str:
+        """One-paragraph result of the local checks on the latest draft, for review prompts."""
+        if not self.story_config.lint_drafts:
+            return ""
+        if not self.lint_findings:
+            return ("Automated checks already passed: no banned LLM-isms, joined words, missing spaces after "
+                    "punctuation, repeated words or length shortfall were found.")
+        return f"Automated checks still report these issues:\n{format_findings(self.lint_findings)}"
+    
+    def is_complete_draft(self, response: str) -> bool:
+        """Whether a response holds a marked story of (nearly) the requested length."""
+        story = extract_marked_story(response)
+        if story is None:
+            return False
+        return len(story.split()) >= self.story_config.total_words * draft_linter.min_length_ratio
+    
+    def expert_review_prompt(self, story_content: str, preamble: str) -> str:
+        """The Expert's mandatory final technical review of a story."""
+        return f"""{preamble}
+
+You must now perform a MANDATORY FINAL TECHNICAL REVIEW before the story can be published.
+
+Here is the complete story to review:
+
+---BEGIN STORY---
+{story_content}
+---END STORY---
+
+Please carefully read the story above and check for:
+- Spelling errors and typos (including joined words)
+- Grammar and punctuation issues
+- Formatting consistency
+- Any technical errors that would detract from professional presentation
+
+{self.lint_summary()}
+
+If you find ANY errors, list them specifically and send back to [@Writer].
+If the story passes all technical checks, approve with: "I APPROVE this story as Expert - technical review passed\""""
+    
+    async def complete_story(self, story_content: Optional[str] = None) -> bool:
+        """Save the approved story (by default the latest draft) and mark the session complete."""
+        if story_content is None:
+            story_content = await self.extract_story_from_discussion()
+        if story_content and self.session_manager and self.session_id:
+            await self.session_manager.complete_session(self.session_id, story_content)
+            logger.info(f"Story completed and saved to session {self.session_id}")
+            print(f"\n[SYSTEM]: Story approved with technical review passed and saved to session.")
+            self.story_complete = True
+            return True
+        logger.error("Could not extract story from session despite approval")
+        return False
+    
+    def revision_instructions(self, next_speaker: str) -> str:
+        """How the Writer should send a revision, ending with the handoff."""
+        if self.story_config.patch_revisions:
+            return (f"send the revision and pass to [@{next_speaker}]: SEARCH/REPLACE edits for targeted fixes, "
+                    f"or the COMPLETE revised story between ---BEGIN STORY--- and ---END STORY--- markers")
+        return (f"provide the COMPLETE revised story between ---BEGIN STORY--- and ---END STORY--- markers "
+                f"and pass to [@{next_speaker}]")
+    
+    async def apply_story_edits(self, response: str) -> Optional[str]:
+        """
+        Apply a Writer's SEARCH/REPLACE edits to the latest saved story.
+        
+        Args:
+            response: The Writer's response
+            
+        Returns:
+            The response rewritten to carry the whole revised story between
+            markers, or None if it holds no edits
+            
+        Raises:
+            PatchError: If the edits do not apply cleanly or there is no story to edit
+        """
+        edits = parse_edits(response)
+        if not edits:
+            return None
+        revised = story_patcher.apply(await self.extract_story_from_discussion(), edits)
+        logger.info(f"Applied {len(edits)} edit(s) to the story (turn {self.turn_count})")
+        return story_patcher.expand(response, revised)
+    
     def check_for_conflict(self, message: str) -> bool:
         """Check if there's a conflict that needs expert resolution."""
-        # Only check for explicit conflicts, not minor disagreements
-        conflict_indicators = [
-            "strongly disagree",
-            "major concern",
-            "fundamental issue",
-            "cannot accept",
-            "this won't work",
-            "completely wrong direction"
-        ]
-        return any(indicator in message.lower() for indicator in conflict_indicators)
+        # Only explicit conflicts count, not minor disagreements
+        return detect_signals(message).conflict
     
     def evaluate_outline_scope(self, outline_text: str) -> Tuple[bool, str]:
         """Evaluate if outline complexity matches the page limit."""
@@ -167,12 +298,12 @@ class SCPCoordinatorSession:
     
     async def check_and_inject_checkpoint(self) -> Optional[str]:
         """Monitor story word count and inject checkpoint prompts."""
-        # Extract current story from session
-        story_content = await self.extract_story_from_discussion()
-        if not story_content:
+        # Word count of the current story is cached per draft version
+        if not self.session_manager or not self.session_id:
+            return None
+        word_count = self.session_manager.get_story_word_count(self.session_id)
+        if not word_count:
             return None
-            
-        word_count = len(story_content.split())
         
         # Check for first checkpoint (1/3 of story)
         if (word_count >= self.story_config.checkpoint_1_words - 50 and 
@@ -212,14 +343,22 @@ Writer: Please pause your writing.
         
         return None
     
-    async def initialize_agents(self, user_request: str):
-        """Initialize the three agents with appropriate prompts."""
-        logger.info("Initializing agents for SCP story creation...")
-        self.user_request = user_request
-        
+    def _render_system_prompts(self, user_request: str) -> Dict[str, str]:
+        """Render each agent's system prompt: the theme prompt plus universal guidelines."""
         # Create Writer agent using theme
         writer_prompt = self.theme.get_writer_prompt(user_request, self.story_config)
         
+        if self.story_config.patch_revisions:
+            revision_rules = f"""- When revising based on feedback, send EITHER the complete story with markers OR, for
+  targeted fixes, only the changed passages as edits against the current story:
+{EDIT_FORMAT}
+- Use one edit block per change; the SEARCH text must be copied exactly from the current story
+- Send the complete story instead when rewriting more than a few passages
+- Never just describe changes - always provide the edits or the full revised text"""
+        else:
+            revision_rules = """- When revising based on feedback, ALWAYS include the complete story with markers
+- Never just describe changes - always provide the full revised text"""
+        
         # Append additional universal guidelines to writer prompt
         writer_prompt += f"""
 
@@ -249,8 +388,7 @@ PHASE 2 - STORY WRITING (After Reader Approval):
    ---END STORY---
 - Include markers on their own lines with no extra spaces
 - The story will NOT be saved without BOTH markers exactly as shown
-- When revising based on feedback, ALWAYS include the complete story with markers
-- Never just describe changes - always provide the full revised text
+{revision_rules}
 
 Scope Guidance:
 Your story should be {self.story_config.get_scope_guidance()}.
@@ -335,7 +473,14 @@ Encourage:
         # Create Writing Expert agent using theme
         expert_prompt = self.theme.get_expert_prompt(user_request, self.story_config)
         
-        # Add universal technical quality standards
+        # Add universal technical quality standards; the LLM-ism list is the
+        # one drafts are checked against locally
+        llm_isms = "\n".join(f'    - "{label}" ({reason})' for label, reason, _ in LLM_ISMS)
+        lint_note = ""
+        if self.story_config.lint_drafts:
+            lint_note = """- Drafts are checked automatically for the listed LLM-isms, joined words, missing spaces, repeated words
+  and length before review; the results come with the story, so focus on what those checks cannot see
+"""
         expert_prompt += f"""
 
 Additional Universal Quality Standards:
@@ -359,19 +504,9 @@ TECHNICAL QUALITY ASSURANCE (MANDATORY):
     - Academic hedging or over-formality
     - Predictable three-part lists everywhere
   * CRITICAL - Detect and eliminate common LLM-isms:
-    - "X wasn't just Y. It was Z." (dramatic revelation pattern)
-    - "But here's the thing:" (false conversational starter)
-    - "Let's be honest/clear" (unnecessary meta-commentary)
-    - "It's worth noting that" (filler phrase)
-    - "One might argue/say" (academic hedging)
-    - "In a world where..." (clichéd opening)
-    - "Little did they know" (predictable foreshadowing)
-    - "And that's when everything changed" (dramatic cliché)
-    - "The truth is," (unnecessary truth-claiming)
-    - "To put it simply," (condescending simplification)
+{llm_isms}
     - Rhetorical questions followed by immediate answers
     - Triple patterns everywhere (three examples, three adjectives, three consequences)
-    - "Not only X, but also Y" (overly formal construction)
     - Starting multiple sentences with "However," "Moreover," "Indeed"
   * Does it pass the "friend-sent-this" test?
   * Is there personality and natural rhythm in the prose?
@@ -391,17 +526,28 @@ TECHNICAL QUALITY ASSURANCE (MANDATORY):
   * Count the actual words (excluding title)
   * If story is under 85% of target length, this is a critical issue
   * Include in feedback: "Story contains only [X] words but requires ~{self.story_config.total_words} words"
-- Only approve with: "I APPROVE this story as Expert - technical review passed"
+{lint_note}- Only approve with: "I APPROVE this story as Expert - technical review passed"
 
 """
         
+        return {"Writer": writer_prompt, "Reader": reader_prompt, "Expert": expert_prompt}
+    
+    async def initialize_agents(self, user_request: str):
+        """Initialize the three agents with appropriate prompts."""
+        logger.info("Initializing agents for SCP story creation...")
+        self.user_request = user_request
+        
+        # Prompts are rendered once per theme configuration and shared across
+        # stories; only the story request, placed last, differs between them
+        cache_key, prompts = theme_prompt_cache.render(self.theme, self.story_config, self._render_system_prompts)
+        
+        priority = PRIORITIES.get(self.story_config.priority, PRIORITY_INTERACTIVE)
         self.agents = {
-            "Writer": BaseAgent("Writer", writer_prompt, model=self.story_config.model, api_key=self.api_key, 
-                               session_manager=self.session_manager, session_id=self.session_id),
-            "Reader": BaseAgent("Reader", reader_prompt, model=self.story_config.model, api_key=self.api_key,
-                               session_manager=self.session_manager, session_id=self.session_id),
-            "Expert": BaseAgent("Expert", expert_prompt, model=self.story_config.model, api_key=self.api_key,
-                               session_manager=self.session_manager, session_id=self.session_id)
+            role: BaseAgent(role, prompts[role].for_request(user_request), model=self.model_for(role),
+                            api_key=self.api_key, session_manager=self.session_manager,
+                            session_id=self.session_id, priority=priority, prompt_cache_key=cache_key,
+                            system_prefix_length=len(prompts[role].stable))
+            for role in ("Writer", "Reader", "Expert")
         }
         
         logger.info("All agents initialized successfully")
@@ -423,18 +569,185 @@ After sharing your outline, pass to [@Reader] for feedback."""
         
         await self.run_conversation("Writer", opening_prompt)
     
+    def _last_usage(self, speaker: str) -> Optional[TurnUsage]:
+        # Streaming wrappers expose the underlying BaseAgent as original_agent
+        agent = self.agents[speaker]
+        return getattr(getattr(agent, "original_agent", agent), "last_usage", None)
+    
+    def _streamed_verdict(self, speaker: str, signals: SignalDetector, response: str) -> SignalVerdict:
+        # Agents that don't stream through on_chunk, and turns whose stream
+        # restarted part-way, are scanned in one pass instead
+        usage = self._last_usage(speaker)
+        if signals.fed_chars >= len(response) and not (usage and usage.restarts):
+            return signals.finish()
+        return detect_signals(response)
+    
+    def _history_entry(self, turn: int, speaker: str, response: str, elapsed: float, handoff_gap: float,
+                       time_to_first_chunk: Optional[float]) -> Dict:
+        usage = self._last_usage(speaker)
+        return {
+            "turn": turn,
+            "speaker": speaker,
+            "phase": self.current_phase,
+            "response": response,
+            "time": elapsed,
+            "handoff_gap": handoff_gap,
+            "time_to_first_chunk": time_to_first_chunk,
+            "usage": usage.to_dict() if usage else None
+        }
+    
+    def turn_of(self, speaker: str) -> int:
+        """The turn ``speaker`` is responding in (parallel reviewers each have their own)."""
+        return self.review_turns.get(speaker, self.turn_count)
+    
+    async def _review_turn(self, speaker: str, prompt: str, turn: int) -> Optional[Tuple[str, SignalVerdict, Dict]]:
+        """One reviewer's response, its signals and its history entry; None if it timed out."""
+        self.review_turns[speaker] = turn
+        start_time = time.time()
+        first_chunk_time = None
+        signals = SignalDetector()
+        
+        def on_chunk(text: str):
+            nonlocal first_chunk_time
+            if first_chunk_time is None:
+                first_chunk_time = time.time()
+            signals.feed(text)
+        
+        try:
+            response = await asyncio.wait_for(
+                self.agents[speaker].respond(prompt, skip_callback=True, on_chunk=on_chunk),
+                timeout=TURN_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"{speaker} timed out!")
+            return None
+        finally:
+            del self.review_turns[speaker]
+        elapsed = time.time() - start_time
+        logger.info(f"{speaker} responded in {elapsed:.1f}s")
+        
+        verdict = self._streamed_verdict(speaker, signals, response)
+        entry = self._history_entry(turn, speaker, response, elapsed, 0.0,
+                                    (first_chunk_time - start_time) if first_chunk_time else None)
+        return response, verdict, entry
+    
+    async def run_parallel_review(self, draft: str) -> Optional[str]:
+        """
+        Review a complete draft with the Reader and Expert concurrently.
+        
+        Both get the draft at once instead of the Expert waiting for the
+        Reader's approval; their verdicts are merged into a single revision
+        request, so each review cycle costs one round of review instead of two.
+        
+        Args:
+            draft: The Writer's response containing the marked story
+            
+        Returns:
+            The consolidated revision prompt for the Writer, or None if the
+            story was approved or a review failed
+        """
+        story_content = extract_marked_story(draft)
+        reader_prompt = f"""Writer said: {draft}
+
+The Expert is doing the technical review of this draft at the same time, so concentrate on the story itself.
+If it is ready, say "I APPROVE this story". Otherwise list the specific changes you need; your feedback and the Expert's go back to the Writer together."""
+        expert_prompt = self.expert_review_prompt(
+            story_content, "The Writer has finished a draft, and the Reader is reviewing it at the same time as you.")
+        
+        first_turn = self.turn_count + 1
+        self.turn_count += 2
+        logger.info(f"\n--- Turns {first_turn}-{first_turn + 1}: Reader and Expert reviewing in parallel ---")
+        print(f"\n[SYSTEM]: Draft complete. Reader and Expert are reviewing it in parallel.")
+        reviews = await asyncio.gather(
+            self._review_turn("Reader", reader_prompt, first_turn),
+            self._review_turn("Expert", expert_prompt, first_turn + 1)
+        )
+        if None in reviews:
+            return None
+        
+        # Record both turns in order, whichever finished first
+        for response, _, entry in reviews:
+            self.conversation_history.append(entry)
+            if self.session_manager and self.session_id:
+                await self.session_manager.save_message(
+                    self.session_id, entry["speaker"], response, entry["turn"], self.current_phase
+                )
+        
+        (reader_response, reader_verdict, _), (expert_response, expert_verdict, _) = reviews
+        reader_approved = reader_verdict.approved_by("Reader")
+        expert_approved = expert_verdict.approved_by("Expert")
+        if reader_approved and expert_approved:
+            logger.info("Reader and Expert have both approved after parallel review!")
+            await self.complete_story(story_content)
+            return None
+        
+        outcome = {True: "approved", False: "requested changes"}
+        logger.info(f"Parallel review: Reader {outcome[reader_approved]}, Expert {outcome[expert_approved]}")
+        print(f"\n[SYSTEM]: Reader {outcome[reader_approved]}, Expert {outcome[expert_approved]}. "
+              f"Sending the Writer one consolidated revision request.")
+        feedback = (f"Reader ({outcome[reader_approved]}):\n{reader_response}\n\n"
+                    f"Expert ({outcome[expert_approved]}):\n{expert_response}")
+        if self.lint_findings:
+            feedback += f"\n\nAutomated checks:\n{format_findings(self.lint_findings)}"
+        return f"""The Reader and Expert reviewed your draft at the same time. Here is their combined feedback:
+
+{feedback}
+
+Address every point above in one revision, then {self.revision_instructions("Reader")}."""
+    
+    async def write_best_draft(self, prompt: str) -> Tuple[str, Dict]:
+        """
+        Generate several Writer drafts concurrently and keep the best one.
+        
+        Drafts are scored locally (marker validity, length against the target
+        and issue density, see ``DraftLinter.score``) and only the winner is
+        added to the conversation, so reviewers see a single draft.
+        
+        Args:
+            prompt: The Writer's prompt for the draft
+            
+        Returns:
+            The chosen response, and the candidates' scores and combined usage
+        """
+        writer = self.agents["Writer"]
+        count = self.story_config.draft_candidates
+        print(f"\n[SYSTEM]: Writer is drafting {count} versions of the story in parallel.")
+        results = await asyncio.gather(*(writer.generate(prompt) for _ in range(count)), return_exceptions=True)
+        candidates = [result for result in results if not isinstance(result, BaseException)]
+        if not candidates:
+            raise results[0]
+        if len(candidates) < count:
+            logger.warning(f"{count - len(candidates)} of {count} draft candidates failed")
+        
+        scores = [draft_linter.score(response, self.story_config.total_words) for response, _ in candidates]
+        best = max(range(len(candidates)), key=scores.__getitem__)
+        response = candidates[best][0]
+        logger.info(f"Picked draft candidate {best + 1} of {len(candidates)} "
+                    f"(scores {', '.join(f'{score:.2f}' for score in scores)})")
+        await writer.record_response(prompt, response, skip_callback=True)
+        
+        # The winner's usage first, so the turn reports its model and timings
+        usages = [usage.to_dict() for _, usage in [candidates[best]] + candidates[:best] + candidates[best + 1:]
+                  if usage]
+        return response, {"scores": scores, "usage": combine_usage(usages) if usages else None}
+    
     async def run_conversation(self, opening_speaker: str, opening_prompt: str):
         """Run the multi-agent conversation."""
         logger.info(f"Starting story creation with {opening_speaker}")
         
         self.current_speaker = opening_speaker
         current_prompt = opening_prompt
+        last_response_end = None
+        revision_requested = False
+        patch_returned = False
         
         while self.turn_count < self.max_turns and not self.story_complete:
             self.turn_count += 1
             
-            # Check for checkpoint injection
-            checkpoint_prompt = await self.check_and_inject_checkpoint()
+            # Check for checkpoint injection (a draft sent back to the Writer by
+            # the local checks or a parallel review is revised first)
+            checkpoint_prompt = None if revision_requested else await self.check_and_inject_checkpoint()
+            revision_requested = False
             if checkpoint_prompt and self.current_speaker == "Writer":
                 # Override prompt with checkpoint
                 current_prompt = checkpoint_prompt
@@ -451,30 +764,83 @@ After sharing your outline, pass to [@Reader] for feedback."""
             # Get response
             logger.info(f"\n--- Turn {self.turn_count}: {self.current_speaker} speaking ---")
             start_time = time.time()
+            handoff_gap = start_time - last_response_end if last_response_end else 0.0
+            first_chunk_time = None
+            
+            # Routing signals are collected while the response streams
+            signals = SignalDetector()
+            
+            def on_chunk(text: str):
+                nonlocal first_chunk_time
+                if first_chunk_time is None:
+                    first_chunk_time = time.time()
+                signals.feed(text)
+            
+            # The first full draft after outline approval can be picked from
+            # several generated concurrently
+            candidates = None
+            draft_candidates = (self.current_speaker == "Writer" and self.current_phase == "writing"
+                                and self.story_config.draft_candidates > 1 and not self.candidates_drafted)
+            # A Writer response may hold edits rather than the story, so it is
+            # only recorded once its final text is known
+            patch_turn = (self.current_speaker == "Writer" and self.story_config.patch_revisions
+                          and not draft_candidates)
             
             try:
-                response = await asyncio.wait_for(
-                    agent.respond(current_prompt, skip_callback=True),
-                    timeout=120.0  # Increased timeout for story writing
-                )
-                elapsed = time.time() - start_time
+                if draft_candidates:
+                    self.candidates_drafted = True
+                    response, candidates = await asyncio.wait_for(
+                        self.write_best_draft(current_prompt), timeout=TURN_TIMEOUT
+                    )
+                else:
+                    response = await asyncio.wait_for(
+                        agent.respond(current_prompt, skip_callback=True, on_chunk=on_chunk, record=not patch_turn),
+                        timeout=TURN_TIMEOUT
+                    )
+                last_response_end = time.time()
+                elapsed = last_response_end - start_time
                 logger.info(f"{self.current_speaker} responded in {elapsed:.1f}s")
                 
             except asyncio.TimeoutError:
                 logger.error(f"{self.current_speaker} timed out!")
                 break
             
+            verdict = self._streamed_verdict(self.current_speaker, signals, response)
+            
+            # Targeted edits are applied to the latest story and from here on
+            # stand in for a full rewrite, in the Writer's history and the
+            # discussion as well as for the client. Edits that don't apply are
+            # dropped and sent back once; after that they stay as a plain message
+            patch_error = None
+            if patch_turn:
+                if not (verdict.has_story_begin and verdict.has_story_end):
+                    try:
+                        revised_response = await self.apply_story_edits(response)
+                    except PatchError as e:
+                        logger.warning(f"Writer's edits could not be applied: {e} (turn {self.turn_count})")
+                        patch_error = e
+                    else:
+                        if revised_response is not None:
+                            response = revised_response
+                            verdict = detect_signals(response)
+                if patch_error and not patch_returned:
+                    await agent.discard_response()
+                else:
+                    await agent.record_response(current_prompt, response, skip_callback=True)
+            retry_patch = patch_error is not None and not patch_returned
+            
             # Log the response
-            self.conversation_history.append({
-                "turn": self.turn_count,
-                "speaker": self.current_speaker,
-                "phase": self.current_phase,
-                "response": response,
-                "time": elapsed
-            })
+            entry = self._history_entry(
+                self.turn_count, self.current_speaker, response, elapsed, handoff_gap,
+                (first_chunk_time - start_time) if first_chunk_time else None
+            )
+            if candidates:
+                entry["usage"] = candidates["usage"]
+                entry["draft_scores"] = candidates["scores"]
+            self.conversation_history.append(entry)
             
             # Save to session if available
-            if self.session_manager and self.session_id:
+            if self.session_manager and self.session_id and not retry_patch:
                 # Save agent message
                 await self.session_manager.save_message(
                     self.session_id,
@@ -485,8 +851,8 @@ After sharing your outline, pass to [@Reader] for feedback."""
                 )
                 
                 # Check if response contains a story draft
-                has_begin = "---BEGIN STORY---" in response
-                has_end = "---END STORY---" in response
+                has_begin = verdict.has_story_begin
+                has_end = verdict.has_story_end
                 
                 if has_begin and has_end:
                     # Save as draft
@@ -508,11 +874,36 @@ After sharing your outline, pass to [@Reader] for feedback."""
                     # Writer in writing phase but no markers
                     logger.warning(f"Draft NOT saved: Writer in writing phase but no story markers found (turn {self.turn_count})")
             
+            if retry_patch:
+                patch_returned = True
+                revision_requested = True
+                print(f"\n[SYSTEM]: The Writer's edits could not be applied ({patch_error}). "
+                      f"Asking for the complete story instead.")
+                # The discarded turn is not in the Writer's history, so the
+                # feedback it was acting on goes back with the retry
+                current_prompt = f"""Your edits could not be applied to the current story: {patch_error}.
+
+This is the request you were revising for:
+
+{current_prompt}
+
+Do not send SEARCH/REPLACE edits this time. Send the COMPLETE revised story between ---BEGIN STORY--- and ---END STORY--- markers, with every change that request asks for, and pass to [@{self.parse_next_speaker(response, verdict) or "Reader"}]."""
+                continue
+            
+            patch_returned = False
+            
+            # Check new drafts locally, so mechanical issues go straight back to
+            # the Writer instead of costing a Reader/Expert round-trip
+            has_draft = verdict.has_story_begin and verdict.has_story_end
+            findings = self.lint_draft(response) if self.current_speaker == "Writer" and has_draft else None
+            if findings is not None:
+                self.lint_findings = findings
+            
             # Response already printed by agent if streaming
             # No need for extra newline since we print complete messages now
             
             # Check for story approval
-            if self.check_story_approval(response, self.current_speaker):
+            if verdict.approved_by(self.current_speaker):
                 if self.current_speaker == "Reader":
                     logger.info("Reader has approved! Moving to Expert for final technical review.")
                     print(f"\n[SYSTEM]: Reader approved. Moving to Expert for mandatory technical review.")
@@ -521,19 +912,12 @@ After sharing your outline, pass to [@Reader] for feedback."""
                 elif self.current_speaker == "Expert":
                     logger.info("Expert has approved after technical review!")
                     # Extract the story from session and mark complete
-                    story_content = await self.extract_story_from_discussion()
-                    if story_content and self.session_manager and self.session_id:
-                        await self.session_manager.complete_session(self.session_id, story_content)
-                        logger.info(f"Story completed and saved to session {self.session_id}")
-                        print(f"\n[SYSTEM]: Story approved with technical review passed and saved to session.")
-                        self.story_complete = True
-                    else:
-                        logger.error("Could not extract story from session despite approval")
+                    await self.complete_story()
             
             # Handle outline phase - evaluate scope and limit iterations
             if self.current_phase == "outline":
                 # Track outline iterations
-                if self.current_speaker == "Writer" and "outline" in response.lower():
+                if self.current_speaker == "Writer" and verdict.mentions_outline:
                     self.outline_iterations += 1
                     
                     # Evaluate outline scope after Writer provides it
@@ -546,13 +930,13 @@ After sharing your outline, pass to [@Reader] for feedback."""
                             print("Please simplify the outline to fit the target length.\n")
                 
                 # Check if Reader approved the outline
-                if self.current_speaker == "Reader" and ("approved" in response.lower() or "i approve" in response.lower()):
+                if self.current_speaker == "Reader" and verdict.outline_approval:
                     self.current_phase = "writing"
                     logger.info(f"Phase transition: outline → writing (Reader approved)")
                     print("\n[SYSTEM]: Reader approved outline. Moving to story writing phase.\n")
             
             # Parse next speaker
-            next_speaker = self.parse_next_speaker(response)
+            next_speaker = self.parse_next_speaker(response, verdict)
             
             if not next_speaker:
                 if self.story_complete:
@@ -561,16 +945,40 @@ After sharing your outline, pass to [@Reader] for feedback."""
                     logger.info("No next speaker indicated - ending conversation")
                 break
             
+            # Drafts with issues the local checks can see go back to the Writer first
+            if findings and next_speaker != "Writer" and self.lint_returns < MAX_LINT_RETURNS:
+                self.lint_returns += 1
+                revision_requested = True
+                print(f"\n[SYSTEM]: Automated checks found {len(self.lint_findings)} issue(s) in the draft. "
+                      f"Returning it to the Writer before review.")
+                current_prompt = f"""Automated checks found these issues in your draft before it went to review:
+
+{format_findings(self.lint_findings)}
+
+Fix every issue listed, then {self.revision_instructions(next_speaker)}."""
+                continue
+            
+            # The draft goes on to review; its next revision may be returned again
+            if findings is not None:
+                self.lint_returns = 0
+            
+            # Complete drafts can go to the Reader and Expert at once, with their
+            # verdicts merged into one revision request
+            if self.story_config.parallel_review and self.current_speaker == "Writer" and has_draft \
+                    and self.is_complete_draft(response):
+                revision_prompt = await self.run_parallel_review(response)
+                if revision_prompt is None:
+                    break
+                last_response_end = time.time()
+                revision_requested = True
+                current_prompt = revision_prompt
+                continue
+            
             # Prevent same speaker twice
             if next_speaker == self.current_speaker:
                 logger.warning(f"{self.current_speaker} tried to speak again - preventing loop")
                 # Pick appropriate alternative
-                if self.current_speaker == "Writer":
-                    next_speaker = "Reader"
-                elif self.current_speaker == "Reader":
-                    next_speaker = "Writer"
-                else:  # Expert
-                    next_speaker = "Writer"  # Default to Writer after Expert decision
+                next_speaker = self.alternate_speaker(self.current_speaker)
             
             # Prepare for next turn
             previous_speaker = self.current_speaker
@@ -579,7 +987,7 @@ After sharing your outline, pass to [@Reader] for feedback."""
             # Create context for next speaker
             if next_speaker == "Expert":
                 # Check if this is final review after Reader approval
-                if previous_speaker == "Reader" and self.check_story_approval(response, "Reader"):
+                if previous_speaker == "Reader" and verdict.approved_by("Reader"):
                     # Extract the actual story content from the session
                     story_content = await self.extract_story_from_discussion()
                     
@@ -591,26 +999,10 @@ Please check the conversation history and extract the latest story marked betwee
 
 {previous_speaker} said: {response}"""
                     else:
-                        current_prompt = f"""The Writer and Reader have both approved the story. 
-
-You must now perform a MANDATORY FINAL TECHNICAL REVIEW before the story can be published.
-
-Here is the complete story to review:
-
----BEGIN STORY---
-{story_content}
----END STORY---
-
-Please carefully read the story above and check for:
-- Spelling errors and typos (including joined words)
-- Grammar and punctuation issues
-- Formatting consistency
-- Any technical errors that would detract from professional presentation
-
-If you find ANY errors, list them specifically and send back to [@Writer].
-If the story passes all technical checks, approve with: "I APPROVE this story as Expert - technical review passed"
-
-{previous_speaker} said: {response}"""
+                        current_prompt = (
+                            self.expert_review_prompt(story_content, "The Writer and Reader have both approved the story.")
+                            + f"\n\n{previous_speaker} said: {response}"
+                        )
                 else:
                     # Expert needs conflict context
                     current_prompt = f"""There appears to be a disagreement that needs resolution.
@@ -622,7 +1014,7 @@ Please review the discussion and make a balanced decision to move the project fo
                 # Regular handoff
                 # Check if this is Writer's turn after Reader approval
                 if (next_speaker == "Writer" and self.current_phase == "writing" and 
-                    previous_speaker == "Reader" and ("approved" in response.lower() or "i approve" in response.lower())):
+                    previous_speaker == "Reader" and verdict.outline_approval):
                     current_prompt = f"""The Reader has approved your outline! 
 
 Now write the complete story following these requirements:
@@ -638,10 +1030,26 @@ Now write the complete story following these requirements:
 {previous_speaker} said: {response}"""
                 else:
                     current_prompt = f"{previous_speaker} said: {response}\n\nPlease respond."
+                
+                if next_speaker == "Writer" and self.lint_findings:
+                    # Hand the Writer the local findings directly rather than
+                    # waiting for a reviewer to rediscover them
+                    current_prompt += f"\n\nAutomated checks on your latest draft also found:\n{format_findings(self.lint_findings)}"
         
         logger.info(f"\nStory creation ended after {self.turn_count} turns")
         self.print_summary()
     
+    def usage_summary(self) -> Dict[str, dict]:
+        """Token usage and cost totals for the session, by agent, phase and model."""
+        return aggregate_usage(self.conversation_history)
+    
+    def story_model(self) -> Optional[str]:
+        """The model that served the Writer's latest turn, after any fallback."""
+        for turn in reversed(self.conversation_history):
+            if turn["speaker"] == "Writer" and turn.get("usage"):
+                return turn["usage"].get("model")
+        return None
+    
     def print_summary(self):
         """Print conversation summary."""
         print("\n" + "="*60)
@@ -653,6 +1061,20 @@ Now write the complete story following these requirements:
         print(f"Total time: {total_time:.1f}s ({total_time/60:.1f} minutes)")
         print(f"Average time per turn: {total_time/len(self.conversation_history):.1f}s")
         
+        # Handoff gaps between one response finishing and the next request starting
+        gaps = [turn["handoff_gap"] for turn in self.conversation_history if turn.get("handoff_gap")]
+        if gaps:
+            print(f"Average handoff gap: {sum(gaps)/len(gaps)*1000:.0f}ms")
+        
+        # Token usage
+        usage = self.usage_summary()
+        totals = usage["session"]
+        if totals["turns"]:
+            print(f"Tokens: {totals['total_tokens']} ({totals['prompt_tokens']} prompt, "
+                  f"{totals['cached_tokens']} cached ({totals['cache_hit_rate']:.0%} hit), "
+                  f"{totals['completion_tokens']} completion)"
+                  f", cost ${totals['cost']:.4f}")
+        
         # Phase breakdown
         phase_stats = {}
         for turn in self.conversation_history:
@@ -664,7 +1086,8 @@ Now write the complete story following these requirements:
         
         print("\nPhase breakdown:")
         for phase, stats in phase_stats.items():
-            print(f"  {phase}: {stats['count']} turns, {stats['time']:.1f}s total")
+            phase_tokens = usage["by_phase"].get(phase, {}).get("total_tokens", 0)
+            print(f"  {phase}: {stats['count']} turns, {stats['time']:.1f}s total, {phase_tokens} tokens")
         
         # Speaker statistics
         speaker_stats = {}
@@ -678,7 +1101,8 @@ Now write the complete story following these requirements:
         print("\nSpeaker statistics:")
         for speaker, stats in speaker_stats.items():
             avg_time = stats["total_time"] / stats["count"]
-            print(f"  {speaker}: {stats['count']} turns, avg {avg_time:.1f}s/turn")
+            speaker_tokens = usage["by_agent"].get(speaker, {}).get("total_tokens", 0)
+            print(f"  {speaker}: {stats['count']} turns, avg {avg_time:.1f}s/turn, {speaker_tokens} tokens")
         
         # Check final story status
         if self.session_id:
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import backend modules the way the app does (from utils..., from agents...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
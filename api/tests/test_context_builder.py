@@ -0,0 +1,35 @@
+from agents import context_builder
+from agents.context_builder import ContextBuilder
+
+
+def discussion(*entries) -> str:
+    return "".join(f"\n## [{speaker}] - [2026-10-17 10:0{i}]\n{body}\n---\n"
+                   for i, (speaker, body) in enumerate(entries))
+
+
+def test_entries_already_in_history_are_skipped():
+    # The discussion stores sanitized text; the history keeps the raw response
+    history = [{"role": "user", "content": "Write it."},
+               {"role": "assistant", "content": "It’s   dark in the lamp room… [@Reader]"}]
+    text = discussion(("Writer", "It's dark in the lamp room... [@Reader]"),
+                      ("Reader", "The ending lands well. [@Writer]"))
+    _, context = ContextBuilder(max_prompt_tokens=4000).build("system", history, text, "Revise.")
+    assert "lamp room" not in context
+    assert "The ending lands well." in context
+
+
+def test_entries_are_normalized_once(monkeypatch):
+    calls = []
+    normalize = context_builder._normalize
+    monkeypatch.setattr(context_builder, "_normalize", lambda text: calls.append(text) or normalize(text))
+    history = [{"role": "assistant", "content": f"Earlier response {i}."} for i in range(10)]
+    text = discussion(*[("Reader", f"Note {i}. [@Writer]") for i in range(5)])
+    builder = ContextBuilder(max_prompt_tokens=4000)
+
+    builder.build("system", history, text, "Revise.")
+    # Each entry once, plus each history message and the trigger
+    assert len(calls) == 5 + 10 + 1
+
+    calls.clear()
+    builder.build("system", history, text, "Revise.")
+    assert len(calls) == 10 + 1
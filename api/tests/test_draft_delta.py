@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+
+from benchmarks.memory_supabase import InMemorySupabase
+from utils.story_session_manager import (
+    DraftChainError,
+    StorySessionManager,
+    _common_prefix_length,
+    decode_draft,
+    encode_draft,
+    reconstruct_draft,
+    reconstruct_drafts,
+    recoverable_drafts,
+)
+
+STORY = "\n".join(f"Line {i}: the keeper climbed the stairs and lit lamp number {i}." for i in range(40))
+
+
+def draft(notes: str, story: str, handoff: str = "[@Reader]") -> str:
+    return f"{notes}\n\n---BEGIN STORY---\n{story}\n---END STORY---\n\n{handoff}"
+
+
+def encode_all(contents):
+    """Encode versions the way save_draft does and return the stored rows."""
+    rows, previous, delta_chars = [], "", 0
+    for version, content in enumerate(contents, 1):
+        keep = _common_prefix_length(previous, content) if previous else 0
+        row_content, delta = encode_draft(previous, content, keep, delta_chars)
+        delta_chars = 0 if delta["type"] == "snapshot" else delta_chars + len(row_content)
+        delta["base_version"] = version - 1
+        rows.append({"version": version, "content": row_content, "agent_feedback": {"_delta": delta}})
+        previous = content
+    return rows
+
+
+def delta_types(rows):
+    return [row["agent_feedback"]["_delta"]["type"] for row in rows]
+
+
+def test_first_draft_is_a_snapshot():
+    rows = encode_all([draft("Notes.", STORY)])
+    assert delta_types(rows) == ["snapshot"]
+    assert reconstruct_draft(rows) == draft("Notes.", STORY)
+
+
+def test_appended_text_is_a_prefix_delta():
+    first = draft("Notes.", STORY)
+    second = first + "\n\nOne more thought."
+    rows = encode_all([first, second])
+    assert delta_types(rows) == ["snapshot", "delta"]
+    assert rows[1]["content"] == "\n\nOne more thought."
+    assert reconstruct_drafts(rows) == [first, second]
+
+
+def test_revised_story_in_a_new_response_is_a_story_delta():
+    first = draft("First pass.", STORY)
+    revised = STORY.replace("lamp number 20.", "lamp number 20, then paused.")
+    second = draft("Tightened the middle as the Reader asked.", revised, "[@Expert]")
+    rows = encode_all([first, second])
+    assert delta_types(rows) == ["snapshot", "story_delta"]
+    assert len(rows[1]["content"]) < len(second) / 4
+    assert reconstruct_drafts(rows) == [first, second]
+
+
+def test_rewritten_story_is_a_snapshot():
+    first = draft("First pass.", STORY)
+    second = draft("Started over.", STORY[::-1])
+    rows = encode_all([first, second])
+    assert delta_types(rows) == ["snapshot", "snapshot"]
+    assert reconstruct_drafts(rows) == [first, second]
+
+
+def test_deltas_roll_over_into_periodic_snapshots():
+    contents, story = [], STORY
+    for i in range(30):
+        story = story.replace(f"lamp number {i}.", f"lamp number {i}, slowly, carefully, by hand.")
+        contents.append(draft(f"Revision {i}.", story))
+    rows = encode_all(contents)
+    types = delta_types(rows)
+    assert types[0] == "snapshot"
+    assert "story_delta" in types
+    # Deltas since the last snapshot never exceed half the draft, so later snapshots appear
+    assert types.count("snapshot") > 1
+    assert reconstruct_drafts(rows) == contents
+
+
+def test_decode_legacy_rows_without_delta():
+    rows = [{"version": 1, "content": "Old full draft."},
+            {"version": 2, "content": "Newer full draft.", "agent_feedback": {"reviewer": "Expert"}}]
+    assert reconstruct_drafts(rows) == ["Old full draft.", "Newer full draft."]
+    assert decode_draft("ignored", rows[0]) == "Old full draft."
+
+
+def test_missing_middle_row_is_detected():
+    first = draft("Notes.", STORY)
+    contents = [first, first + "\nMore.", first + "\nMore.\nAnd more."]
+    rows = encode_all(contents)
+    assert delta_types(rows) == ["snapshot", "delta", "delta"]
+    with pytest.raises(DraftChainError, match="v3 is a delta on v2"):
+        reconstruct_drafts([rows[0], rows[2]])
+
+
+def test_recoverable_drafts_resume_at_the_next_snapshot():
+    contents, story = [], STORY
+    for i in range(30):
+        story = story.replace(f"lamp number {i}.", f"lamp number {i}, slowly, carefully, by hand.")
+        contents.append(draft(f"Revision {i}.", story))
+    rows = encode_all(contents)
+    types = delta_types(rows)
+    resume = types.index("snapshot", 2)
+    dropped = rows[:1] + rows[2:]
+    recovered = recoverable_drafts(dropped)
+    assert [row["version"] for row, _ in recovered] == [1] + [row["version"] for row in rows[resume:]]
+    assert [content for _, content in recovered] == contents[:1] + contents[resume:]
+
+
+def test_story_delta_without_a_previous_story():
+    rows = encode_all([draft("First pass.", STORY), draft("Second pass.", STORY + "\nThe end.")])
+    assert delta_types(rows)[1] == "story_delta"
+    with pytest.raises(DraftChainError, match="does not have"):
+        decode_draft("Notes without any story.", rows[1])
+
+
+def test_reconstruct_without_rows():
+    assert reconstruct_drafts([]) == []
+    assert reconstruct_draft([]) == ""
+
+
+def test_session_manager_round_trip():
+    async def run():
+        db = InMemorySupabase()
+        manager = StorySessionManager(db)
+        session_id = await manager.create_session("user", {"page_limit": 3})
+        story, contents = STORY, []
+        for i in range(8):
+            story = story.replace(f"lamp number {i}.", f"lamp number {i} twice.")
+            contents.append(draft(f"Revision {i}.", story))
+            await manager.save_draft(session_id, contents[-1])
+        await manager.write_queue.flush()
+        await manager.close()
+        rows = sorted(db.tables["session_drafts"], key=lambda row: row["version"])
+        in_memory = [entry["content"] for entry in manager.get_session(session_id).drafts]
+        return rows, in_memory, contents
+
+    rows, in_memory, contents = asyncio.run(run())
+    assert in_memory == contents
+    assert reconstruct_drafts(rows) == contents
+    assert sum(len(row["content"]) for row in rows) < sum(len(content) for content in contents) / 2
+
+
+def test_recover_session_skips_a_missing_row():
+    async def run():
+        db = InMemorySupabase()
+        manager = StorySessionManager(db)
+        session_id = await manager.create_session("user", {"page_limit": 3})
+        first = draft("Notes.", STORY)
+        contents = [first, first + "\nMore.", first + "\nMore.\nAnd more."]
+        for content in contents:
+            await manager.save_draft(session_id, content)
+        await manager.write_queue.flush()
+        db.tables["session_drafts"] = [row for row in db.tables["session_drafts"] if row["version"] != 2]
+        manager.active_sessions.clear()
+        session = await manager.recover_session(session_id)
+        await manager.close()
+        return session, contents
+
+    session, contents = asyncio.run(run())
+    assert session is not None
+    assert [entry["version"] for entry in session.drafts] == [1]
+    assert session.current_draft == contents[0]
+    assert session.current_version == 3
@@ -0,0 +1,136 @@
+import pytest
+
+from utils.draft_linter import DraftLinter, LintFinding, extract_marked_story, format_findings
+
+
+@pytest.fixture
+def linter():
+    return DraftLinter()
+
+
+def words(count):
+    return " ".join(f"w{i}" for i in range(count))
+
+
+def kinds(findings):
+    return [finding.kind for finding in findings]
+
+
+def test_clean_draft(linter):
+    assert linter.lint("The keeper climbed the stairs.\nShe lit the lamp and waited.") == []
+
+
+@pytest.mark.parametrize("text", [
+    "The storm wasn't just loud. It was alive.",
+    "But here's the thing: nobody came.",
+    "Let's be honest about the ships.",
+    "It's worth noting that the lamp failed.",
+    "In a world where lamps fail, keepers matter.",
+    "Little did Mara know what waited below.",
+    "Not only the lamp but also the bell had stopped.",
+    "Furthermore, the tide was late.",
+])
+def test_llm_isms(linter, text):
+    findings = linter.lint(text)
+    assert kinds(findings) == ["llm_ism"]
+    assert "LLM-ism" in findings[0].message
+
+
+def test_llm_isms_need_a_word_boundary(linter):
+    assert linter.lint("The seafurthermore, was a made-up word.") == []
+
+
+def test_joined_words(linter):
+    findings = linter.lint("She walked andthen stopped.")
+    assert kinds(findings) == ["joined_words"]
+    assert '"andthen"' in findings[0].message
+
+
+@pytest.mark.parametrize("word", ["into", "onto", "within", "washer"])
+def test_joined_word_exceptions(linter, word):
+    assert linter.lint(f"She looked {word} the dark.") == []
+
+
+def test_missing_space_after_punctuation(linter):
+    assert kinds(linter.lint("She waited,then ran.")) == ["spacing"]
+    assert kinds(linter.lint("She waited.Then she ran.")) == ["spacing"]
+
+
+@pytest.mark.parametrize("text", ["He paused, e.g. at the door.", "She saw Dr.Chen.", "Ships from the U.S. came."])
+def test_spacing_skips_abbreviations(linter, text):
+    assert linter.lint(text) == []
+
+
+def test_repeated_word(linter):
+    findings = linter.lint("The the lamp was dark.")
+    assert kinds(findings) == ["repeated_word"]
+
+
+@pytest.mark.parametrize("text", ["She had had enough.", "He said that that was fine.", "Knock knock."])
+def test_repeated_word_exceptions(linter, text):
+    assert linter.lint(text) == []
+
+
+def test_findings_report_lines_in_reading_order(linter):
+    story = "First line is fine.\nHe went went home.\nThird line.\nFurthermore, it rained."
+    findings = linter.lint(story)
+    assert [(finding.kind, finding.line) for finding in findings] == [("repeated_word", 2), ("llm_ism", 4)]
+    assert str(findings[0]).startswith("Line 2: ")
+
+
+def test_length_shortfall(linter):
+    findings = linter.lint(words(80), target_words=100)
+    assert kinds(findings) == ["length"]
+    assert str(findings[0]) == "Story contains only 80 words but requires ~100 words"
+
+
+def test_length_within_ratio(linter):
+    assert linter.lint(words(85), target_words=100) == []
+
+
+def test_lint_updates_stats(linter):
+    linter.lint("Clean text.")
+    linter.lint("The the end. Furthermore, more.")
+    stats = linter.stats()
+    assert stats["drafts_checked"] == 2
+    assert stats["drafts_flagged"] == 1
+    assert stats["findings"] == {"repeated_word": 1, "llm_ism": 1}
+
+
+def test_score_leaves_stats_untouched(linter):
+    linter.score("---BEGIN STORY---\nThe the end.\n---END STORY---", target_words=3)
+    assert linter.stats()["drafts_checked"] == 0
+    assert linter.stats()["findings"] == {}
+
+
+@pytest.mark.parametrize("response", [
+    "No markers at all.",
+    "---BEGIN STORY---\nUnfinished",
+    "---END STORY---\nBackwards\n---BEGIN STORY---",
+    "---BEGIN STORY---\nOne\n---END STORY---\n---BEGIN STORY---\nTwo\n---END STORY---",
+    "---BEGIN STORY---\n\n---END STORY---",
+])
+def test_score_rejects_malformed_markers(linter, response):
+    assert linter.score(response, target_words=10) == 0.0
+
+
+def test_score_prefers_clean_drafts_of_the_right_length(linter):
+    clean = "---BEGIN STORY---\n" + "The keeper lit the lamp. " * 4 + "\n---END STORY---"
+    flawed = "---BEGIN STORY---\n" + "The the keeper lit the lamp. " * 4 + "\n---END STORY---"
+    short = "---BEGIN STORY---\nThe keeper lit the lamp.\n---END STORY---"
+    assert linter.score(clean, target_words=20) == 1.0
+    assert 0 < linter.score(flawed, target_words=20) < linter.score(clean, target_words=20)
+    assert 0 < linter.score(short, target_words=20) < linter.score(clean, target_words=20)
+
+
+def test_extract_marked_story_takes_the_last_story():
+    text = "---BEGIN STORY---\nOld\n---END STORY---\nnotes\n---BEGIN STORY---\n New \n---END STORY---"
+    assert extract_marked_story(text) == "New"
+    assert extract_marked_story("No story here.") is None
+
+
+def test_format_findings_caps_the_list():
+    findings = [LintFinding("spacing", f"problem {i}", i) for i in range(1, 5)]
+    assert format_findings(findings, limit=2) == (
+        "- Line 1: problem 1\n- Line 2: problem 2\n- ...and 2 more of the same kinds")
+    assert format_findings(findings[:1]) == "- Line 1: problem 1"
@@ -0,0 +1,35 @@
+from agents.model_router import ModelRouter
+
+
+def router() -> ModelRouter:
+    return ModelRouter(role_chains={"Reader": ["fast/model", "backup/model"]}, default_model="default/model",
+                       min_samples=1, failure_threshold=1)
+
+
+def test_chain_puts_the_chosen_model_first():
+    assert router().chain_for("Reader", "chosen/model") == ["chosen/model", "fast/model", "backup/model"]
+    assert router().chain_for("Writer") == ["default/model"]
+    assert router().chain_for("Reader", "backup/model") == ["backup/model", "fast/model"]
+
+
+def test_unhealthy_models_are_demoted():
+    models = router()
+    models.record_failure("fast/model")
+    assert models.order(["fast/model", "backup/model"], "Reader") == ["backup/model", "fast/model"]
+
+
+def test_slow_models_are_demoted():
+    models = router()
+    models.record_ttft("fast/model", 30.0)
+    assert models.order(["fast/model", "backup/model"], "Reader") == ["backup/model", "fast/model"]
+
+
+def test_chosen_model_stays_first_while_unhealthy():
+    models = router()
+    chain = models.chain_for("Reader", "chosen/model")
+    models.record_failure("chosen/model")
+    models.record_ttft("chosen/model", 30.0)
+    models.record_failure("fast/model")
+    assert models.order(chain, "Reader", "chosen/model") == ["chosen/model", "backup/model", "fast/model"]
+    # Without a choice the same chain is ordered by health alone
+    assert models.order(chain, "Reader") == ["backup/model", "fast/model", "chosen/model"]
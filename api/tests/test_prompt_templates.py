@@ -0,0 +1,48 @@
+from scp_coordinator_session import StoryConfig
+from themes.prompt_templates import REQUEST_SENTINEL, ThemePromptCache, prompt_key
+
+
+class Theme:
+    id = "test"
+    revision = "1"
+
+
+def render_with_options(story_config):
+    def render(user_request):
+        level = story_config.theme_options.get("horrorLevel")
+        return {"Writer": f"Horror Level ({level}%)\nStory request: {user_request}"}
+    return render
+
+
+def test_render_uses_and_keeps_exact_option_values():
+    cache = ThemePromptCache()
+    config = StoryConfig(theme_options={"horrorLevel": 41})
+    key, prompts = cache.render(Theme(), config, render_with_options(config))
+    assert config.theme_options == {"horrorLevel": 41}
+    assert prompts["Writer"].for_request("A lighthouse") == "Horror Level (41%)\n\nStory request: A lighthouse"
+    assert REQUEST_SENTINEL not in prompts["Writer"].stable
+
+
+def test_nearby_option_values_do_not_share_a_prompt():
+    cache = ThemePromptCache()
+    first, second = StoryConfig(theme_options={"horrorLevel": 41}), StoryConfig(theme_options={"horrorLevel": 45})
+    _, first_prompts = cache.render(Theme(), first, render_with_options(first))
+    _, second_prompts = cache.render(Theme(), second, render_with_options(second))
+    assert first_prompts["Writer"].stable != second_prompts["Writer"].stable
+    assert cache.stats() == {"cached_configs": 2, "hits": 0, "misses": 2}
+
+
+def test_identical_configurations_hit_the_cache():
+    cache = ThemePromptCache()
+    config = StoryConfig(theme_options={"horrorLevel": 41, "tone": 50})
+    reordered = StoryConfig(theme_options={"tone": 50, "horrorLevel": 41})
+    first_key, _ = cache.render(Theme(), config, render_with_options(config))
+    second_key, _ = cache.render(Theme(), reordered, render_with_options(reordered))
+    assert first_key == second_key
+    assert cache.stats()["hits"] == 1
+
+
+def test_key_covers_prompt_affecting_flags():
+    keys = {prompt_key(Theme(), StoryConfig(lint_drafts=lint, patch_revisions=patch))
+            for lint in (True, False) for patch in (True, False)}
+    assert len(keys) == 4
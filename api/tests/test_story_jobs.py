@@ -0,0 +1,49 @@
+import asyncio
+
+from utils.story_jobs import StoryJobRunner
+
+
+async def finish(run):
+    runner = StoryJobRunner(max_concurrent=1)
+    job = runner.submit("s1", "u1", run)
+    await job.task
+    return job
+
+
+def test_a_run_that_emits_completed_is_completed():
+    async def run(job):
+        await job.emit({"type": "completed", "story": "..."})
+
+    job = asyncio.run(finish(run))
+
+    assert job.status == "completed"
+
+
+def test_a_run_that_emits_an_error_is_failed():
+    async def run(job):
+        await job.emit({"type": "error", "message": "Story generation failed"})
+
+    job = asyncio.run(finish(run))
+
+    assert job.status == "failed"
+    assert [event["type"] for event in job.events.events_after(0)] == ["error"]
+
+
+def test_a_run_without_a_result_is_failed():
+    async def run(job):
+        await job.emit({"type": "status", "message": "Working..."})
+
+    job = asyncio.run(finish(run))
+
+    assert job.status == "failed"
+    assert job.events.events_after(0)[-1]["message"] == "Story generation ended without a result"
+
+
+def test_a_run_that_raises_is_failed():
+    async def run(job):
+        raise RuntimeError("boom")
+
+    job = asyncio.run(finish(run))
+
+    assert job.status == "failed"
+    assert job.events.outcome == "error"
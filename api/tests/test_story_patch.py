@@ -0,0 +1,112 @@
+import pytest
+
+from utils.story_patch import PatchError, StoryEdit, StoryPatcher, parse_edits
+
+STORY = "The lamp hummed.\nMara counted the ships.\nThe tide came in.\n"
+
+
+def edit_block(search: str, replace: str) -> str:
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE"
+
+
+def test_parse_edits_in_order():
+    response = "Notes first.\n" + edit_block("The lamp hummed.", "The lamp buzzed.") + "\n" + \
+        edit_block("The tide came in.", "The tide turned.") + "\n[@Reader]"
+    assert parse_edits(response) == [
+        StoryEdit("The lamp hummed.", "The lamp buzzed."),
+        StoryEdit("The tide came in.", "The tide turned."),
+    ]
+
+
+def test_parse_edits_empty_replace():
+    response = "<<<<<<< SEARCH\nThe tide came in.\n=======\n>>>>>>> REPLACE"
+    assert parse_edits(response) == [StoryEdit("The tide came in.", "")]
+
+
+def test_parse_edits_without_blocks():
+    assert parse_edits("---BEGIN STORY---\nA story.\n---END STORY---") == []
+
+
+def test_apply_exact_match():
+    patcher = StoryPatcher()
+    revised = patcher.apply(STORY, [StoryEdit("counted the ships", "counted the gulls")])
+    assert revised == STORY.replace("ships", "gulls")
+    assert patcher.stats()["revisions_applied"] == 1
+    assert patcher.stats()["edits_applied"] == 1
+
+
+def test_apply_edits_see_earlier_edits():
+    patcher = StoryPatcher()
+    revised = patcher.apply(STORY, [
+        StoryEdit("The lamp hummed.", "The lamp hummed twice."),
+        StoryEdit("hummed twice", "hummed three times"),
+    ])
+    assert revised.startswith("The lamp hummed three times.")
+
+
+def test_apply_no_match():
+    patcher = StoryPatcher()
+    with pytest.raises(PatchError, match="Edit 1: its SEARCH text does not appear"):
+        patcher.apply(STORY, [StoryEdit("The lighthouse fell.", "It stood.")])
+    assert patcher.stats()["revisions_failed"] == 1
+
+
+def test_apply_multiple_matches():
+    with pytest.raises(PatchError, match="matches 2 places"):
+        StoryPatcher().apply(STORY, [StoryEdit("The ", "A ")])
+
+
+def test_apply_whitespace_fallback():
+    # The model re-wrapped the line and collapsed the newline to a space
+    revised = StoryPatcher().apply(STORY, [StoryEdit("hummed. Mara  counted", "hummed.\nMara recounted")])
+    assert revised == "The lamp hummed.\nMara recounted the ships.\nThe tide came in.\n"
+
+
+def test_apply_whitespace_fallback_ambiguous():
+    story = "She\nran, then She  ran again."
+    with pytest.raises(PatchError, match="matches 2 places"):
+        StoryPatcher().apply(story, [StoryEdit("She ran", "He ran")])
+
+
+def test_apply_empty_replace_deletes_passage():
+    revised = StoryPatcher().apply(STORY, [StoryEdit("Mara counted the ships.\n", "")])
+    assert revised == "The lamp hummed.\nThe tide came in.\n"
+
+
+def test_apply_rejects_empty_story():
+    with pytest.raises(PatchError, match="empty story"):
+        StoryPatcher().apply("Only line.", [StoryEdit("Only line.", "")])
+
+
+def test_apply_without_story():
+    with pytest.raises(PatchError, match="no saved story"):
+        StoryPatcher().apply(None, [StoryEdit("a", "b")])
+
+
+def test_apply_rejects_stray_markers():
+    with pytest.raises(PatchError, match="markers"):
+        StoryPatcher().apply(STORY, [StoryEdit("The tide came in.", "---END STORY---")])
+
+
+def test_failed_revision_is_all_or_nothing():
+    patcher = StoryPatcher()
+    with pytest.raises(PatchError, match="Edit 2"):
+        patcher.apply(STORY, [StoryEdit("The lamp hummed.", "Dark."), StoryEdit("missing", "x")])
+    assert patcher.stats()["revisions_applied"] == 0
+    assert patcher.stats()["edits_applied"] == 0
+
+
+def test_expand_replaces_first_block_and_drops_the_rest():
+    response = "Tightened two lines.\n\n" + edit_block("a", "b") + "\n\n" + edit_block("c", "d") + \
+        "\n\nOver to you. [@Reader]"
+    expanded = StoryPatcher().expand(response, "The revised story.")
+    assert expanded == ("Tightened two lines.\n\n---BEGIN STORY---\nThe revised story.\n---END STORY---"
+                        "\n\n\n\nOver to you. [@Reader]")
+    assert "<<<<<<< SEARCH" not in expanded
+
+
+def test_expand_counts_chars_saved():
+    patcher = StoryPatcher()
+    story = "word " * 100
+    patcher.expand(edit_block("word", "verb"), story)
+    assert patcher.stats()["chars_saved"] == len(story) - len(edit_block("word", "verb"))
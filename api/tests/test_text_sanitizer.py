@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from utils.text_sanitizer import CHAR_REPLACEMENTS, StreamingSanitizer, _sanitize, sanitize_text
+
+# Everything either sanitizer treats specially, plus plain text around it
+ALPHABET = list("ab .,\n\t\r") + ["  ", " \n", "\n "] + list(CHAR_REPLACEMENTS) + [
+    "\x01", "\x0b", "\x7f", "\x80", "\x8f", "\ufffd", "\u00e9", "\u00a0"]
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def stream(text: str, rng: random.Random) -> str:
+    streaming = StreamingSanitizer()
+    output, position = [], 0
+    while position < len(text):
+        step = rng.randint(1, 6)
+        output.append(streaming.feed(text[position:position + step]))
+        position += step
+    output.append(streaming.flush())
+    return "".join(output)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("It\u2019s \u201cquiet\u201d\u2026", 'It\'s "quiet"...'),
+    ("a\x01b\x7fc", "abc"),
+    ("bad \ufffd byte", "bad ? byte"),
+    ("run\x80\x81\x8f here", "run???? here"),
+    ("too   many  spaces", "too many spaces"),
+    ("line  \n  next", "line\nnext"),
+    ("zero\u200bwidth\ufeff", "zerowidth"),
+    ("", ""),
+])
+def test_sanitize_text(text, expected):
+    assert sanitize_text(text) == expected
+    assert _sanitize(text) == expected
+
+
+def test_single_pass_engine_matches_sanitize_text():
+    rng = random.Random(7)
+    for _ in range(3000):
+        text = random_text(rng, rng.randint(0, 80))
+        assert _sanitize(text) == sanitize_text(text), repr(text)
+
+
+def test_streaming_matches_sanitize_text_under_random_chunking():
+    rng = random.Random(42)
+    for _ in range(3000):
+        text = random_text(rng, rng.randint(0, 80))
+        assert stream(text, rng) == sanitize_text(text), repr(text)
+
+
+def test_streaming_holds_back_text_that_can_merge():
+    streaming = StreamingSanitizer()
+    assert streaming.feed("end of line ") == "end of line"
+    assert streaming.feed(" \nnext") == "\nnext"
+    assert streaming.feed("\x80") == ""
+    assert streaming.feed("\x81") == ""
+    assert streaming.flush() == "????"
@@ -0,0 +1,96 @@
+import asyncio
+
+from benchmarks.memory_supabase import InMemorySupabase
+from utils.write_behind import WRITE_THROUGH, WriteBehindQueue
+
+
+class MissingConstraintError(Exception):
+    code = "42P10"
+
+
+class NoConstraintSupabase(InMemorySupabase):
+    """A database created before the write-behind unique constraints existed."""
+
+    def __init__(self):
+        super().__init__()
+        self.upserts = 0
+
+    def _execute(self, query):
+        if query.operation == "upsert":
+            self.upserts += 1
+            raise MissingConstraintError(
+                "there is no unique or exclusion constraint matching the ON CONFLICT specification")
+        return super()._execute(query)
+
+
+def message(turn: int) -> dict:
+    return {"session_id": "s1", "turn": turn, "agent_name": "Writer", "message": f"turn {turn}"}
+
+
+def test_batches_are_upserted_on_their_natural_key():
+    async def run():
+        db = InMemorySupabase()
+        queue = WriteBehindQueue(db)
+        # A batch that is sent again is not written twice
+        for _ in range(2):
+            await queue.insert("session_messages", message(1))
+            await queue.flush()
+        await queue.close()
+        return db, queue
+
+    db, queue = asyncio.run(run())
+    assert len(db.tables["session_messages"]) == 1
+    assert queue.stats()["plain_insert_tables"] == []
+
+
+def test_missing_unique_constraint_falls_back_to_insert():
+    async def run():
+        db = NoConstraintSupabase()
+        queue = WriteBehindQueue(db)
+        await queue.insert("session_messages", message(1))
+        failed = await queue.flush()
+        await queue.insert("session_messages", message(2))
+        await queue.flush()
+        await queue.close()
+        return db, queue, failed
+
+    db, queue, failed = asyncio.run(run())
+    assert failed == set()
+    assert [row["turn"] for row in db.tables["session_messages"]] == [1, 2]
+    # Only the first batch tried the upsert
+    assert db.upserts == 1
+    stats = queue.stats()
+    assert stats["rows_written"] == 2
+    assert stats["rows_dead_lettered"] == 0
+    assert stats["plain_insert_tables"] == ["session_messages"]
+
+
+def test_write_through_falls_back_to_insert():
+    async def run():
+        db = NoConstraintSupabase()
+        queue = WriteBehindQueue(db, mode=WRITE_THROUGH)
+        await queue.insert("session_drafts", {"session_id": "s1", "version": 1, "content": "Draft."})
+        return db
+
+    db = asyncio.run(run())
+    assert len(db.tables["session_drafts"]) == 1
+
+
+def test_other_failures_are_retried_not_inserted():
+    class DownSupabase(InMemorySupabase):
+        def _execute(self, query):
+            raise ConnectionError("connection refused")
+
+    async def run():
+        queue = WriteBehindQueue(DownSupabase(), max_attempts=2)
+        await queue.insert("session_messages", message(1))
+        first = await queue.flush()
+        pending = queue.pending
+        await queue.flush()
+        return queue, first, pending
+
+    queue, first, pending = asyncio.run(run())
+    assert first == {"s1"}
+    assert pending == 1
+    assert queue.stats()["rows_dead_lettered"] == 1
+    assert queue.stats()["plain_insert_tables"] == []
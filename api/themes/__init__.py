@@ -6,26 +6,18 @@ Each theme includes:
 - UI visual design elements
 - Terminology mappings
 - Story format specifications
+
+Themes are loaded on first use. Built-in themes are Python classes; more can be
+added without code as YAML definitions in themes/plugins/ (or any directory in
+THEME_PLUGIN_DIRS), see themes/yaml_theme.py for the format.
 """
 
 from .base_theme import StoryTheme, AgentPersona
-from .scp_theme import SCPTheme
-from .fantasy_theme import FantasyTheme
-from .cyberpunk_theme import CyberpunkTheme
-from .romance_theme import RomanceTheme
-from .noir_theme import NoirTheme
-from .scifi_theme import SciFiTheme
+from .registry import theme_registry
 
-# Theme registry
-THEMES = {
-    "scp": SCPTheme(),
-    "fantasy": FantasyTheme(),
-    "cyberpunk": CyberpunkTheme(),
-    "romance": RomanceTheme(),
-    "noir": NoirTheme(),
-    "scifi": SciFiTheme(),
-}
+# Theme registry (a lazy mapping of theme ID to theme)
+THEMES = theme_registry
 
 def get_theme(theme_id: str) -> StoryTheme:
     """Get a theme by its ID."""
-    return THEMES.get(theme_id, THEMES["scp"])
\ No newline at end of file
+    return theme_registry.get_theme(theme_id)
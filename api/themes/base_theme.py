@@ -1,6 +1,6 @@
 """Base theme class for story themes."""
 
-from typing import Dict, Optional
+from typing import Dict
 from dataclasses import dataclass
 
 
@@ -37,6 +37,8 @@ class StoryTheme:
         self.name: str = ""
         self.description: str = ""
         self.story_format: str = ""
+        # Changes whenever the theme's definition does (used by theme plugins)
+        self.revision: str = ""
         
         # Agent configurations
         self.writer: AgentPersona = None
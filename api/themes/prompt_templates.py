@@ -0,0 +1,113 @@
+"""Memoized rendering of theme system prompts, keyed by theme and story configuration."""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+# Rendered in place of the story request so one rendering serves every request
+REQUEST_SENTINEL = "\x00STORY_REQUEST\x00"
+
+
+def prompt_key(theme, story_config) -> str:
+    """
+    Stable hash of everything a theme's rendered prompts depend on.
+
+    Theme options are keyed by their exact values: prompts print them, and
+    YAML themes compare them against arbitrary thresholds, so no two slider
+    positions are guaranteed to render the same prompt.
+    """
+    payload = {
+        "theme": theme.id,
+        "revision": getattr(theme, "revision", ""),
+        "options": dict(story_config.theme_options or {}),
+        "page_limit": story_config.page_limit,
+        "words_per_page": story_config.words_per_page,
+        "protagonist": story_config.protagonist_name or "",
+        "patch_revisions": getattr(story_config, "patch_revisions", False),
+        "lint_drafts": getattr(story_config, "lint_drafts", False),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+class RenderedPrompt:
+    """A role's system prompt split into its shared prefix and the per-story request."""
+
+    def __init__(self, stable: str, request_template: str):
+        self.stable = stable
+        self.request_template = request_template
+
+    def for_request(self, user_request: str) -> str:
+        """The full system prompt: the shared prefix, then the story request."""
+        return f"{self.stable}\n\n{self.request_template.replace(REQUEST_SENTINEL, user_request)}"
+
+
+def _split_request(prompt: str) -> RenderedPrompt:
+    # Move the line naming the story request to the end, so everything before
+    # it is identical for all stories sharing a theme configuration
+    lines = prompt.split("\n")
+    request_lines = [line.strip() for line in lines if REQUEST_SENTINEL in line]
+    stable = "\n".join(line for line in lines if REQUEST_SENTINEL not in line)
+    # A prompt that never mentions the request still needs to receive it
+    return RenderedPrompt(stable, "\n".join(request_lines) or f"Story request: {REQUEST_SENTINEL}")
+
+
+class ThemePromptCache:
+    """
+    LRU cache of rendered Writer/Reader/Expert system prompts.
+
+    Prompts are rendered once per key (theme ID, theme options, page
+    limit, protagonist, revision mode and draft checks) with a sentinel in
+    place of the story request, which is then moved to the end of the
+    prompt. The key doubles as the upstream prompt-cache key: stories with
+    the same key send byte-identical prompt prefixes.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, RenderedPrompt]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, theme, story_config,
+               render: Callable[[str], Dict[str, str]]) -> Tuple[str, Dict[str, RenderedPrompt]]:
+        """
+        Return the cache key and the rendered prompts for a configuration.
+
+        Args:
+            theme: The story theme (its ID and revision are part of the key)
+            story_config: The story's StoryConfig; it is not modified
+            render: Builds the role -> prompt dict for a given story request;
+                only called on a cache miss, with ``REQUEST_SENTINEL``
+
+        Returns:
+            The cache key and the prompts by role
+        """
+        key = prompt_key(theme, story_config)
+        prompts = self._entries.get(key)
+        if prompts is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return key, prompts
+
+        self.misses += 1
+        prompts = {role: _split_request(prompt) for role, prompt in render(REQUEST_SENTINEL).items()}
+        self._entries[key] = prompts
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return key, prompts
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache statistics for health reporting."""
+        return {
+            "cached_configs": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Global instance
+theme_prompt_cache = ThemePromptCache(
+    max_entries=int(os.getenv("THEME_PROMPT_CACHE_SIZE", "256"))
+)
@@ -0,0 +1,146 @@
+"""Lazy registry of built-in and YAML plugin story themes."""
+
+import importlib
+import logging
+import os
+import re
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from .base_theme import StoryTheme
+from .yaml_theme import YAMLTheme, ThemeDefinitionError
+
+logger = logging.getLogger(__name__)
+
+# Built-in theme classes, imported on first use
+BUILTIN_THEMES: Dict[str, Tuple[str, str]] = {
+    "scp": (".scp_theme", "SCPTheme"),
+    "fantasy": (".fantasy_theme", "FantasyTheme"),
+    "cyberpunk": (".cyberpunk_theme", "CyberpunkTheme"),
+    "romance": (".romance_theme", "RomanceTheme"),
+    "noir": (".noir_theme", "NoirTheme"),
+    "scifi": (".scifi_theme", "SciFiTheme"),
+}
+
+# Theme IDs come from clients and name plugin files, so keep them to safe characters
+THEME_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+DEFAULT_THEME = "scp"
+DEFAULT_PLUGIN_DIR = Path(__file__).resolve().parent / "plugins"
+
+# The C loader parses several times faster when libyaml is available
+_YAMLLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class ThemeRegistry(Mapping):
+    """
+    Loads themes on first request instead of at import.
+
+    Built-in themes are imported lazily by module path. Plugin themes are
+    ``*.yaml``/``*.yml`` files in the plugin directories, one theme per file,
+    whose ``id`` must match the file name. Parsed definitions are cached
+    together with the file's modification time and re-read only when it
+    changes. A plugin may not replace a built-in theme.
+    """
+
+    def __init__(self, plugin_dirs: Optional[List[Path]] = None, default_theme: str = DEFAULT_THEME):
+        self.plugin_dirs = [Path(d) for d in (plugin_dirs or [])]
+        self.default_theme = default_theme
+        self._themes: Dict[str, StoryTheme] = {}
+        self._plugin_mtimes: Dict[str, float] = {}
+
+    def _plugin_path(self, theme_id: str) -> Optional[Path]:
+        if not THEME_ID_PATTERN.match(theme_id):
+            return None
+        for directory in self.plugin_dirs:
+            for suffix in (".yaml", ".yml"):
+                path = directory / f"{theme_id}{suffix}"
+                if path.is_file():
+                    return path
+        return None
+
+    def _load_builtin(self, theme_id: str) -> StoryTheme:
+        module_name, class_name = BUILTIN_THEMES[theme_id]
+        return getattr(importlib.import_module(module_name, __package__), class_name)()
+
+    def _load_plugin(self, theme_id: str, path: Path) -> Optional[StoryTheme]:
+        mtime = path.stat().st_mtime
+        cached = self._themes.get(theme_id)
+        if self._plugin_mtimes.get(theme_id) == mtime:
+            return cached
+        try:
+            with open(path, encoding="utf-8") as f:
+                definition = yaml.load(f, Loader=_YAMLLoader)
+            if not isinstance(definition, dict):
+                raise ThemeDefinitionError(f"{path}: expected a mapping at the top level")
+            if definition.get("id") != theme_id:
+                raise ThemeDefinitionError(f"{path}: id '{definition.get('id')}' does not match the file name")
+            theme = YAMLTheme(definition, source=str(path))
+        except (OSError, yaml.YAMLError, ThemeDefinitionError) as e:
+            logger.error(f"Failed to load theme plugin {path}: {e}")
+            # Keep serving the last good definition if there is one, and don't
+            # re-parse the broken file until it changes again
+            self._plugin_mtimes[theme_id] = mtime
+            return cached
+        self._plugin_mtimes[theme_id] = mtime
+        logger.info(f"Loaded theme plugin '{theme_id}' from {path}")
+        return theme
+
+    def load(self, theme_id: str) -> Optional[StoryTheme]:
+        """Return a theme by ID, loading it on first use, or None if unknown."""
+        if theme_id in BUILTIN_THEMES:
+            theme = self._themes.get(theme_id)
+            if theme is None:
+                theme = self._themes[theme_id] = self._load_builtin(theme_id)
+            return theme
+        path = self._plugin_path(theme_id) if theme_id else None
+        if path is None:
+            return None
+        theme = self._load_plugin(theme_id, path)
+        if theme is not None:
+            self._themes[theme_id] = theme
+        return theme
+
+    def get_theme(self, theme_id: Optional[str]) -> StoryTheme:
+        """Return a theme by ID, falling back to the default theme."""
+        return self.load(theme_id or "") or self.load(self.default_theme)
+
+    def available(self) -> List[str]:
+        """IDs of all known themes, without loading any of them."""
+        ids = list(BUILTIN_THEMES)
+        for directory in self.plugin_dirs:
+            if not directory.is_dir():
+                continue
+            for path in sorted(directory.iterdir()):
+                if (path.suffix in (".yaml", ".yml") and THEME_ID_PATTERN.match(path.stem)
+                        and path.stem not in ids):
+                    ids.append(path.stem)
+        return ids
+
+    # Mapping interface, so the registry can stand in for the old THEMES dict
+    def __getitem__(self, theme_id: str) -> StoryTheme:
+        theme = self.load(theme_id)
+        if theme is None:
+            raise KeyError(theme_id)
+        return theme
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.available())
+
+    def __len__(self) -> int:
+        return len(self.available())
+
+    def __contains__(self, theme_id) -> bool:
+        return theme_id in BUILTIN_THEMES or (isinstance(theme_id, str) and self._plugin_path(theme_id) is not None)
+
+
+def _plugin_dirs() -> List[Path]:
+    extra = [Path(d) for d in os.getenv("THEME_PLUGIN_DIRS", "").split(os.pathsep) if d]
+    return [DEFAULT_PLUGIN_DIR] + extra
+
+
+# Global instance
+theme_registry = ThemeRegistry(plugin_dirs=_plugin_dirs())
@@ -0,0 +1,126 @@
+"""Story themes defined declaratively in YAML."""
+
+import hashlib
+import json
+import string
+from typing import Any, Dict, List, Optional
+
+from .base_theme import StoryTheme, AgentPersona, UITheme
+
+PROMPT_ROLES = ("writer", "reader", "expert")
+
+# Fields every prompt template may use besides the theme's own options
+CONFIG_FIELDS = ("user_request", "page_limit", "total_words", "scope_guidance", "protagonist_name",
+                 "protagonist_line")
+
+
+class ThemeDefinitionError(ValueError):
+    """Raised when a YAML theme definition is missing fields or has bad templates."""
+
+
+def _require(mapping: Dict, key: str, where: str) -> Any:
+    if key not in mapping:
+        raise ThemeDefinitionError(f"{where}: missing '{key}'")
+    return mapping[key]
+
+
+class YAMLTheme(StoryTheme):
+    """
+    A theme built from a parsed YAML definition.
+
+    Prompts are ``str.format`` templates (literal braces are doubled). Besides
+    ``{user_request}``, ``{page_limit}``, ``{total_words}``, ``{scope_guidance}``,
+    ``{protagonist_name}`` and ``{protagonist_line}``, a template can use each
+    declared option's value as ``{name}`` and its matched guidance text as
+    ``{name_guidance}``. Options pick guidance from ``levels``: the first level
+    whose ``max`` the value does not exceed, or the last level without a ``max``.
+    """
+
+    def __init__(self, definition: Dict[str, Any], source: str = "<yaml>"):
+        super().__init__()
+        self.source = source
+        self.revision = hashlib.sha256(json.dumps(definition, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        self.id = _require(definition, "id", source)
+        self.name = definition.get("name", self.id)
+        self.description = definition.get("description", "")
+        self.story_format = definition.get("story_format", "")
+
+        personas = _require(definition, "personas", source)
+        self.writer = self._persona(_require(personas, "writer", source), f"{source}: personas.writer")
+        self.reader = self._persona(_require(personas, "reader", source), f"{source}: personas.reader")
+        self.expert = self._persona(_require(personas, "expert", source), f"{source}: personas.expert")
+
+        ui = definition.get("ui_theme")
+        if ui:
+            try:
+                self.ui_theme = UITheme(**{"id": self.id, **ui})
+            except TypeError as e:
+                raise ThemeDefinitionError(f"{source}: ui_theme: {e}") from e
+
+        self.terminology = definition.get("terminology", {})
+        self.options: Dict[str, Dict[str, Any]] = definition.get("options", {})
+        prompts = _require(definition, "prompts", source)
+        self.prompts = {role: _require(prompts, role, f"{source}: prompts") for role in PROMPT_ROLES}
+        self._validate_templates()
+
+    @staticmethod
+    def _persona(data: Dict[str, Any], where: str) -> AgentPersona:
+        try:
+            return AgentPersona(
+                name=data["name"],
+                role_description=data["role_description"],
+                communication_style=data.get("communication_style", ""),
+                focus_areas=list(data.get("focus_areas", [])),
+                terminology=dict(data.get("terminology", {}))
+            )
+        except KeyError as e:
+            raise ThemeDefinitionError(f"{where}: missing {e}") from e
+
+    def _validate_templates(self) -> None:
+        # Fail at load time, not in the middle of a story
+        allowed = set(CONFIG_FIELDS)
+        for name in self.options:
+            allowed.update((name, f"{name}_guidance"))
+        for role, template in self.prompts.items():
+            try:
+                fields = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+            except ValueError as e:
+                raise ThemeDefinitionError(f"{self.source}: prompts.{role}: {e}") from e
+            unknown = fields - allowed
+            if unknown:
+                raise ThemeDefinitionError(f"{self.source}: prompts.{role} uses unknown fields {sorted(unknown)}")
+
+    @staticmethod
+    def _guidance(option: Dict[str, Any], value: Any) -> str:
+        levels: List[Dict[str, Any]] = option.get("levels", [])
+        for level in levels:
+            limit: Optional[float] = level.get("max")
+            if limit is None or value <= limit:
+                return level.get("text", "")
+        return levels[-1].get("text", "") if levels else ""
+
+    def _render(self, role: str, user_request: str, story_config) -> str:
+        theme_options = getattr(story_config, "theme_options", {}) or {}
+        protagonist = story_config.protagonist_name or ""
+        fields = {
+            "user_request": user_request,
+            "page_limit": story_config.page_limit,
+            "total_words": story_config.total_words,
+            "scope_guidance": story_config.get_scope_guidance(),
+            "protagonist_name": protagonist,
+            "protagonist_line": f"Protagonist name: {protagonist}" if protagonist else "",
+        }
+        for name, option in self.options.items():
+            value = theme_options.get(name, option.get("default", 50))
+            fields[name] = value
+            fields[f"{name}_guidance"] = self._guidance(option, value)
+        return self.prompts[role].format(**fields)
+
+    def get_writer_prompt(self, user_request: str, story_config) -> str:
+        return self._render("writer", user_request, story_config)
+
+    def get_reader_prompt(self, user_request: str, story_config) -> str:
+        return self._render("reader", user_request, story_config)
+
+    def get_expert_prompt(self, user_request: str, story_config) -> str:
+        return self._render("expert", user_request, story_config)
@@ -1,7 +1,9 @@
 # Utils module
 from .checkpoint_manager import CheckpointManager
 from .story_session_manager import StorySessionManager, StorySession
-from .text_sanitizer import sanitize_text
+from .text_sanitizer import sanitize_text, StreamingSanitizer
 from .encryption import encryptor
+from .db_executor import db_executor, DatabaseExecutor
 
-__all__ = ['CheckpointManager', 'StorySessionManager', 'StorySession', 'sanitize_text', 'encryptor']
\ No newline at end of file
+__all__ = ['CheckpointManager', 'StorySessionManager', 'StorySession', 'sanitize_text', 'StreamingSanitizer', 'encryptor',
+           'db_executor', 'DatabaseExecutor']
\ No newline at end of file
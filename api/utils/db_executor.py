@@ -0,0 +1,94 @@
+"""Runs blocking Supabase queries off the event loop with timeouts and metrics."""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseExecutor:
+    """
+    Bounded thread pool for the synchronous supabase-py client.
+
+    Every ``.execute()`` call blocks on network I/O, so calling it directly from
+    an ``async def`` stalls every WebSocket stream in the process. Queries are
+    handed to this executor instead and awaited with a per-call timeout.
+    """
+
+    def __init__(self, max_workers: int = 8, default_timeout: float = 10.0):
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="supabase")
+        self._metrics: Dict[str, Dict[str, float]] = {}
+        self._in_flight = 0
+
+    async def execute(self, query: Union[Callable[[], Any], Any], operation: str = "query",
+                      timeout: Optional[float] = None) -> Any:
+        """
+        Run a query builder (anything with ``.execute()``) or a callable in the pool.
+
+        Args:
+            query: Supabase query builder or zero-argument callable
+            operation: Metric name, e.g. "session_drafts.insert"
+            timeout: Seconds to wait before raising asyncio.TimeoutError
+
+        Returns:
+            The result of ``query.execute()`` or ``query()``
+        """
+        func = query.execute if hasattr(query, "execute") else query
+        metrics = self._metrics.setdefault(operation, {
+            "count": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0
+        })
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self._in_flight += 1
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor, func),
+                timeout=timeout or self.default_timeout
+            )
+        except asyncio.TimeoutError:
+            metrics["timeouts"] += 1
+            logger.error(f"Database operation {operation} timed out")
+            raise
+        except Exception:
+            metrics["errors"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            metrics["count"] += 1
+            metrics["total_ms"] += elapsed_ms
+            metrics["max_ms"] = max(metrics["max_ms"], elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-operation latency and error metrics for health reporting."""
+        operations = {}
+        for operation, metrics in self._metrics.items():
+            operations[operation] = {
+                "count": int(metrics["count"]),
+                "errors": int(metrics["errors"]),
+                "timeouts": int(metrics["timeouts"]),
+                "avg_ms": round(metrics["total_ms"] / metrics["count"], 1) if metrics["count"] else 0.0,
+                "max_ms": round(metrics["max_ms"], 1)
+            }
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "operations": operations
+        }
+
+    def shutdown(self) -> None:
+        """Stop accepting work and wait for running queries to finish."""
+        self._executor.shutdown(wait=True)
+
+
+# Global instance
+db_executor = DatabaseExecutor(
+    max_workers=int(os.getenv("DB_EXECUTOR_WORKERS", "8")),
+    default_timeout=float(os.getenv("DB_QUERY_TIMEOUT", "10"))
+)
@@ -0,0 +1,200 @@
+"""Deterministic pre-review checks for story drafts."""
+
+import re
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Banned LLM-isms as (label, why it reads as machine-written, pattern); every
+# pattern is matched from a word boundary. The labels are also what the Expert
+# prompt lists, so the prompt and the local check cannot drift apart.
+LLM_ISMS: List[Tuple[str, str, str]] = [
+    ("X wasn't just Y. It was Z.", "dramatic revelation pattern",
+     r"(?:was|were|is|are)n['’]t just\b[^.!?\n]{1,80}(?:[.!?;,]|\s*[—–-]{1,2})\s*"
+     r"(?:it|they|he|she|this|that)\s+(?:was|were|is|are)\b"),
+    ("But here's the thing:", "false conversational starter", r"here['’]s the thing\b"),
+    ("Let's be honest/clear", "unnecessary meta-commentary", r"let['’]s be (?:honest|clear)\b"),
+    ("It's worth noting that", "filler phrase", r"it['’]s worth noting\b"),
+    ("One might argue/say", "academic hedging", r"one might (?:argue|say)\b"),
+    ("In a world where...", "clichéd opening", r"in a world where\b"),
+    ("Little did they know", "predictable foreshadowing",
+     r"little did (?:they|he|she|i|we|anyone|anybody|\w+) know\b"),
+    ("And that's when everything changed", "dramatic cliché", r"and that['’]s when everything changed\b"),
+    ("The truth is,", "unnecessary truth-claiming", r"the truth is,"),
+    ("To put it simply,", "condescending simplification", r"to put it simply\b"),
+    ("Not only X, but also Y", "overly formal construction", r"not only\b[^.!?\n]{1,80}\bbut also\b"),
+    ("Furthermore,", "stock transition", r"furthermore,"),
+    ("It is important to note", "stock transition", r"it is important to note\b"),
+    ("In conclusion", "stock transition", r"in conclusion\b"),
+]
+
+# Common words that models run together ("andthen", "ofthe")
+_JOIN_FIRST = ("and", "the", "of", "to", "in", "on", "at", "but", "or", "for", "with", "from", "that", "was",
+               "is", "it", "he", "she", "they", "we")
+_JOIN_SECOND = ("the", "a", "and", "then", "of", "to", "in", "was", "is", "it", "he", "she", "they", "that",
+                "had", "his", "her")
+# Pairs that are real words or names
+_JOIN_EXCEPTIONS = frozenset({"into", "onto", "within", "fora", "ora", "ina", "isa", "ita", "shea", "thea",
+                              "washer", "hehe", "weis", "athe"})
+
+# Repeats that are usually deliberate ("had had", "that that")
+_DOUBLED_EXCEPTIONS = frozenset({"had", "that", "no", "so", "very", "yes", "oh", "ha", "go", "bye", "knock"})
+
+_NEWLINE = re.compile("\n")
+_STORY_PATTERN = re.compile(r'---BEGIN STORY---\s*(.*?)\s*---END STORY---', re.DOTALL)
+
+
+def _build_pattern() -> re.Pattern:
+    # One alternation, so a draft is scanned once however many checks there are.
+    # Every check starts at a word boundary, which is tested once up front.
+    alternatives = [f"(?P<ism{i}>{pattern})" for i, (_, _, pattern) in enumerate(LLM_ISMS)]
+    # Factored as first x second rather than listing every pair: the regex engine
+    # tries alternatives one by one, and a flat list of ~300 words is ten times slower
+    alternatives.append(r"(?P<joined>(?:" + "|".join(_JOIN_FIRST) + r")(?:" + "|".join(_JOIN_SECOND) + r")\b)")
+    # A word, then , ; : ! ? or a sentence-ending period, then a letter with no space.
+    # Lowercase-led words only, which skips "e.g.", "U.S." and "Dr.Chen"-style IDs.
+    alternatives.append(r"(?P<spacing>(?-i:[a-z]{2,}(?:[,;:!?][A-Za-z]+|\.[A-Z][a-z]+)))")
+    alternatives.append(r"(?P<doubled>(?P<doubled_word>[a-z]+)\s+(?P=doubled_word)\b)")
+    return re.compile(r"\b(?:" + "|".join(alternatives) + ")", re.IGNORECASE)
+
+
+@dataclass
+class LintFinding:
+    """One issue found in a draft."""
+    kind: str  # "llm_ism", "joined_words", "spacing", "repeated_word" or "length"
+    message: str
+    line: Optional[int] = None
+
+    def __str__(self) -> str:
+        return f"Line {self.line}: {self.message}" if self.line else self.message
+
+
+def extract_marked_story(text: str) -> Optional[str]:
+    """The last story between ---BEGIN STORY--- and ---END STORY--- markers, if any."""
+    stories = _STORY_PATTERN.findall(text)
+    return stories[-1] if stories else None
+
+
+def format_findings(findings: List[LintFinding], limit: int = 15) -> str:
+    """Bullet list of findings for a prompt, capped at ``limit`` entries."""
+    lines = [f"- {finding}" for finding in findings[:limit]]
+    if len(findings) > limit:
+        lines.append(f"- ...and {len(findings) - limit} more of the same kinds")
+    return "\n".join(lines)
+
+
+class DraftLinter:
+    """
+    Finds mechanical problems in a draft without a model call.
+
+    Covers the checks the Expert's technical review would otherwise spend a
+    whole Expert -> Writer -> Reader -> Expert loop on: banned LLM-isms,
+    run-together words, missing spaces after punctuation, repeated words and
+    length shortfalls. Judgement calls (voice, clarity, rhetorical questions)
+    are left to the agents.
+    """
+
+    def __init__(self, min_length_ratio: float = 0.85):
+        self.min_length_ratio = min_length_ratio
+        self._pattern = _build_pattern()
+        self.drafts_checked = 0
+        self.drafts_flagged = 0
+        self.findings_by_kind: Dict[str, int] = {}
+        self.total_time = 0.0
+
+    def _finding(self, match: re.Match, line: int) -> Optional[LintFinding]:
+        kind = match.lastgroup
+        text = match.group()
+        if kind.startswith("ism"):
+            label, reason, _ = LLM_ISMS[int(kind[3:])]
+            return LintFinding("llm_ism", f'LLM-ism "{text}" - the "{label}" pattern ({reason}); rewrite it naturally',
+                               line)
+        if kind == "joined":
+            if text.lower() in _JOIN_EXCEPTIONS:
+                return None
+            return LintFinding("joined_words", f'joined words "{text}"', line)
+        if kind == "spacing":
+            return LintFinding("spacing", f'missing space after punctuation in "{text}"', line)
+        if match.group("doubled_word").lower() not in _DOUBLED_EXCEPTIONS:
+            return LintFinding("repeated_word", f'repeated word "{text}"', line)
+        return None
+
+    def _check(self, story: str, target_words: Optional[int] = None) -> List[LintFinding]:
+        line_starts = [0] + [newline.end() for newline in _NEWLINE.finditer(story)]
+        findings = []
+        for match in self._pattern.finditer(story):
+            finding = self._finding(match, bisect_right(line_starts, match.start()))
+            if finding:
+                findings.append(finding)
+
+        if target_words:
+            word_count = len(story.split())
+            if word_count < target_words * self.min_length_ratio:
+                findings.append(LintFinding(
+                    "length", f"Story contains only {word_count} words but requires ~{target_words} words"))
+        return findings
+
+    def lint(self, story: str, target_words: Optional[int] = None) -> List[LintFinding]:
+        """
+        Check a story and return its findings in reading order.
+
+        Args:
+            story: Story text without the markers
+            target_words: Requested length; shortfalls below ``min_length_ratio`` are reported
+
+        Returns:
+            The findings, empty if the draft is clean
+        """
+        start = time.perf_counter()
+        findings = self._check(story, target_words)
+        self.drafts_checked += 1
+        if findings:
+            self.drafts_flagged += 1
+        for finding in findings:
+            self.findings_by_kind[finding.kind] = self.findings_by_kind.get(finding.kind, 0) + 1
+        self.total_time += time.perf_counter() - start
+        return findings
+
+    def score(self, response: str, target_words: int) -> float:
+        """
+        Rank a candidate draft for best-of-N selection; higher is better.
+        
+        A response without exactly one well-formed pair of story markers scores
+        0. Otherwise the score is the length fit (words over target, inverted
+        when over target) divided by one plus the issues found per 100 words,
+        so it lies in (0, 1].
+        
+        Args:
+            response: The Writer's full response, markers included
+            target_words: Requested story length
+            
+        Returns:
+            The draft's score
+        """
+        begin, end = response.find("---BEGIN STORY---"), response.find("---END STORY---")
+        if (response.count("---BEGIN STORY---") != 1 or response.count("---END STORY---") != 1
+                or not 0 <= begin < end):
+            return 0.0
+        story = extract_marked_story(response)
+        word_count = len(story.split())
+        if not word_count:
+            return 0.0
+        ratio = word_count / target_words
+        length_fit = min(ratio, 1 / ratio)
+        # Candidates are not drafts under review; keep them out of the statistics
+        issues = len(self._check(story))
+        return length_fit / (1 + issues * 100 / word_count)
+    
+    def stats(self) -> Dict[str, object]:
+        """Return linter statistics for health reporting."""
+        return {
+            "drafts_checked": self.drafts_checked,
+            "drafts_flagged": self.drafts_flagged,
+            "findings": dict(self.findings_by_kind),
+            "avg_ms": round(self.total_time / self.drafts_checked * 1000, 3) if self.drafts_checked else 0.0
+        }
+
+
+# Global instance
+draft_linter = DraftLinter()
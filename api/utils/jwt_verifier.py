@@ -0,0 +1,175 @@
+"""Local verification of Supabase access tokens with cached signing keys."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from jose import jwt, JWTError
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError
+
+logger = logging.getLogger(__name__)
+
+
+class SupabaseJWTVerifier:
+    """
+    Verifies Supabase JWTs without a network call per request.
+
+    HS256 tokens are checked against the project's JWT secret(s); asymmetric
+    tokens (ES256/RS256) against the project's JWKS, which is fetched once,
+    cached for ``jwks_ttl`` seconds and refreshed early when a token names an
+    unknown ``kid`` (i.e. the signing key was rotated). Verified tokens are
+    remembered by hash until they expire, so repeat requests with the same
+    token cost a single dict lookup.
+    """
+
+    def __init__(self, secrets: Optional[List[str]] = None, jwks_url: Optional[str] = None,
+                 audience: Optional[str] = "authenticated", cache_size: int = 10000,
+                 jwks_ttl: float = 600.0, min_refresh_interval: float = 30.0):
+        # Several secrets may be configured while rotating the legacy JWT secret
+        self.secrets = [secret for secret in (secrets or []) if secret]
+        self.jwks_url = jwks_url
+        self.audience = audience or None
+        self.cache_size = cache_size
+        self.jwks_ttl = jwks_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._verified: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._jwks: Dict[str, dict] = {}
+        # Monotonic time of the last fetch attempt; None until the first one
+        self._jwks_fetched_at: Optional[float] = None
+        self._jwks_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.jwks_refreshes = 0
+
+    @staticmethod
+    def _token_hash(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def verify(self, token: str) -> dict:
+        """
+        Verify a token's signature, expiry and audience and return its claims.
+
+        Args:
+            token: The raw bearer token
+
+        Returns:
+            The verified claims
+
+        Raises:
+            JWTError: If the token is malformed, expired or not validly signed
+        """
+        token_hash = self._token_hash(token)
+        cached = self._verified.get(token_hash)
+        if cached is not None:
+            claims, expires_at = cached
+            if time.time() < expires_at:
+                self._verified.move_to_end(token_hash)
+                self.hits += 1
+                return claims
+            del self._verified[token_hash]
+
+        self.misses += 1
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+        if algorithm == "HS256":
+            claims = self._decode_with_secrets(token)
+        elif algorithm in ("ES256", "RS256"):
+            key = await self._get_signing_key(header.get("kid"))
+            claims = self._decode(token, key, algorithm)
+        else:
+            raise JWTError(f"Unsupported token algorithm: {algorithm}")
+
+        expires_at = claims.get("exp")
+        if not expires_at:
+            raise JWTError("Token has no expiry")
+        self._remember(token_hash, claims, float(expires_at))
+        return claims
+
+    def _decode(self, token: str, key, algorithm: str) -> dict:
+        return jwt.decode(
+            token, key, algorithms=[algorithm], audience=self.audience,
+            options={"verify_aud": self.audience is not None}
+        )
+
+    def _decode_with_secrets(self, token: str) -> dict:
+        if not self.secrets:
+            raise JWTError("SUPABASE_JWT_SECRET is not configured")
+        error: Optional[JWTError] = None
+        for secret in self.secrets:
+            try:
+                return self._decode(token, secret, "HS256")
+            except (ExpiredSignatureError, JWTClaimsError):
+                # The signature matched this secret; the claims are the problem
+                raise
+            except JWTError as e:
+                error = e
+        raise error
+
+    async def _get_signing_key(self, kid: Optional[str]) -> dict:
+        if not self.jwks_url:
+            raise JWTError("No JWKS URL configured for asymmetric tokens")
+        if (kid not in self._jwks or self._jwks_fetched_at is None
+                or time.monotonic() - self._jwks_fetched_at > self.jwks_ttl):
+            await self._refresh_jwks()
+        key = self._jwks.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown signing key: {kid}")
+        return key
+
+    async def _refresh_jwks(self) -> None:
+        async with self._jwks_lock:
+            # Another request may have refreshed while we waited, and unknown
+            # kids must not be able to trigger a fetch on every request
+            if (self._jwks_fetched_at is not None
+                    and time.monotonic() - self._jwks_fetched_at < self.min_refresh_interval):
+                return
+            try:
+                async with httpx.AsyncClient(timeout=5.0) as client:
+                    response = await client.get(self.jwks_url)
+                    response.raise_for_status()
+                    keys = response.json().get("keys", [])
+            except Exception as e:
+                # Keep serving the previous keys if the refresh fails
+                logger.error(f"Failed to fetch JWKS: {e}")
+                self._jwks_fetched_at = time.monotonic()
+                return
+            self._jwks = {key.get("kid"): key for key in keys}
+            self._jwks_fetched_at = time.monotonic()
+            self.jwks_refreshes += 1
+            logger.info(f"Loaded {len(self._jwks)} JWT signing keys")
+
+    def _remember(self, token_hash: str, claims: dict, expires_at: float) -> None:
+        self._verified[token_hash] = (claims, expires_at)
+        self._verified.move_to_end(token_hash)
+        while len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Return verification cache statistics for health reporting."""
+        return {
+            "cached_tokens": len(self._verified),
+            "signing_keys": len(self._jwks),
+            "hits": self.hits,
+            "misses": self.misses,
+            "jwks_refreshes": self.jwks_refreshes
+        }
+
+
+def _default_jwks_url() -> Optional[str]:
+    supabase_url = os.getenv("SUPABASE_URL")
+    return f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json" if supabase_url else None
+
+
+# Global instance
+jwt_verifier = SupabaseJWTVerifier(
+    secrets=os.getenv("SUPABASE_JWT_SECRET", "").split(","),
+    jwks_url=os.getenv("SUPABASE_JWKS_URL") or _default_jwks_url(),
+    audience=os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated"),
+    cache_size=int(os.getenv("JWT_CACHE_SIZE", "10000")),
+    jwks_ttl=float(os.getenv("JWKS_CACHE_TTL", "600"))
+)
@@ -0,0 +1,124 @@
+"""In-memory TTL cache of decrypted per-user OpenRouter API keys."""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+class DecryptedKeyCache:
+    """
+    Caches decrypted API keys by user ID so reconnects skip the database lookup
+    and the Fernet decrypt.
+
+    Keys only ever live in process memory and expire after ``ttl`` seconds. The
+    auth handlers invalidate or replace a user's entry whenever the stored key
+    changes; in a multi-process deployment the TTL bounds how long another
+    process can keep serving a replaced key. Concurrent lookups for the same
+    user (e.g. several tabs connecting at once) share a single load.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[str]:
+        """Return the cached key for a user, or None if absent or expired."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        api_key, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return api_key
+
+    def set(self, user_id: str, api_key: str) -> None:
+        """Cache a user's decrypted key, evicting the least recently used if full."""
+        if self.ttl <= 0:
+            return
+        self._entries[user_id] = (api_key, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user's cached key after it is replaced or unlinked."""
+        self._entries.pop(user_id, None)
+        # A load already in flight may return the old key; don't let it be cached
+        loading = self._loading.pop(user_id, None)
+        if loading is not None and not loading.done():
+            loading.cancel()
+
+    async def get_or_load(self, user_id: str, loader: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """
+        Return the cached key, or load it with ``loader`` and cache the result.
+
+        Args:
+            user_id: The user whose key is needed
+            loader: Coroutine function that fetches and decrypts the key, or returns None
+
+        Returns:
+            The decrypted key, or None if the user has no active key
+        """
+        api_key = self.get(user_id)
+        if api_key is not None:
+            self.hits += 1
+            return api_key
+
+        pending = self._loading.get(user_id)
+        if pending is not None:
+            self.hits += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The shared load was invalidated or abandoned; load afresh
+                return await self.get_or_load(user_id, loader)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = future
+        try:
+            api_key = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+                # Waiters re-raise it; mark it retrieved for the no-waiter case
+                future.exception()
+            raise
+        finally:
+            if self._loading.get(user_id) is future:
+                del self._loading[user_id]
+
+        # Only cache if nobody invalidated the user while we were loading
+        if not future.cancelled():
+            future.set_result(api_key)
+            if api_key is not None:
+                self.set(user_id, api_key)
+        return api_key
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache statistics for health reporting."""
+        return {
+            "cached_keys": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Global instance
+key_cache = DecryptedKeyCache(
+    ttl=float(os.getenv("API_KEY_CACHE_TTL", "300")),
+    max_entries=int(os.getenv("API_KEY_CACHE_SIZE", "1000"))
+)
@@ -0,0 +1,249 @@
+"""Background story generation jobs with reattachable, sequenced event streams."""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_EVENTS = ("completed", "error")
+
+
+class JobLimitError(RuntimeError):
+    """Raised when a user already has as many unfinished jobs as allowed."""
+
+
+class SessionEventBuffer:
+    """
+    Ring buffer of the most recent events for one session.
+
+    Every event gets a monotonically increasing ``seq``. Subscribers replay
+    what they missed after their last-seen sequence and then follow new
+    events live; if they fell further behind than the buffer holds, they are
+    told to resync instead.
+    """
+
+    def __init__(self, capacity: int = 2000):
+        self._events: deque = deque(maxlen=capacity)
+        self._new_event = asyncio.Event()
+        self.last_seq = 0
+        self.closed = False
+        # Type of the terminal event, once one has been appended
+        self.outcome: Optional[str] = None
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest event still buffered."""
+        return self._events[0]["seq"] if self._events else self.last_seq + 1
+
+    def append(self, event: dict) -> dict:
+        self.last_seq += 1
+        event = {**event, "seq": self.last_seq}
+        self._events.append(event)
+        if event.get("type") in TERMINAL_EVENTS:
+            self.closed = True
+            self.outcome = self.outcome or event["type"]
+        # Wake every waiting subscriber, then arm a fresh event for the next append
+        self._new_event.set()
+        self._new_event = asyncio.Event()
+        return event
+
+    def close(self) -> None:
+        self.closed = True
+        self._new_event.set()
+
+    def events_after(self, last_seq: int) -> List[dict]:
+        """Buffered events with a sequence number greater than ``last_seq``."""
+        start = max(0, last_seq + 1 - self.first_seq)
+        return list(islice(self._events, start, None))
+
+    async def wait(self) -> None:
+        """Wait for the next append (or close)."""
+        await self._new_event.wait()
+
+
+class StoryJob:
+    """A story generation running in the background, detached from any socket."""
+
+    def __init__(self, session_id: str, user_id: str, buffer_size: int,
+                 snapshot: Optional[Callable[[], dict]] = None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.events = SessionEventBuffer(buffer_size)
+        self.snapshot = snapshot
+        self.status = "queued"
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def emit(self, event: dict) -> None:
+        """Record an event for current and future subscribers."""
+        self.events.append(event)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+
+class StoryJobRunner:
+    """
+    Runs story generations as background tasks under a bounded concurrency pool.
+
+    The WebSocket handler submits a job and then merely follows its event
+    stream, so a dropped connection no longer aborts a generation that has
+    already spent tokens: the client reconnects, sends the session ID and the
+    last sequence number it saw, and picks up where it left off. Finished
+    jobs stay attachable for ``retention`` seconds. Each user may have at
+    most ``max_per_user`` unfinished jobs, so one account cannot fill the
+    pool (or its own key's budget) by opening generation after generation.
+    """
+
+    def __init__(self, max_concurrent: int = 8, buffer_size: int = 2000, retention: float = 300.0,
+                 max_per_user: int = 2):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.buffer_size = buffer_size
+        self.retention = retention
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._jobs: Dict[str, StoryJob] = {}
+        self._running = 0
+        self.rejected = 0
+
+    def active_jobs(self, user_id: str) -> int:
+        """Number of the user's jobs that are queued or running."""
+        return sum(1 for job in self._jobs.values() if job.user_id == user_id and not job.done)
+
+    def can_submit(self, user_id: str) -> bool:
+        """Whether the user is below their limit of unfinished jobs."""
+        return self.active_jobs(user_id) < self.max_per_user
+
+    def submit(self, session_id: str, user_id: str,
+               run: Callable[[StoryJob], Awaitable[Any]],
+               snapshot: Optional[Callable[[], dict]] = None) -> StoryJob:
+        """
+        Start a job in the background.
+
+        Args:
+            session_id: Session the job generates; also the reattach handle
+            user_id: Owner of the job; only they may attach
+            run: Coroutine function doing the generation, emitting via ``job.emit``.
+                It must emit a terminal "completed" or "error" event; the job
+                ends "failed" unless it emitted "completed"
+            snapshot: Optional callable returning the state a client needs to
+                rebuild its view when it missed more events than are buffered
+
+        Returns:
+            The submitted job
+
+        Raises:
+            JobLimitError: If the user already has ``max_per_user`` unfinished jobs
+        """
+        self._expire_finished()
+        if not self.can_submit(user_id):
+            self.rejected += 1
+            raise JobLimitError(f"User {user_id} already has {self.max_per_user} stories generating")
+        job = StoryJob(session_id, user_id, self.buffer_size, snapshot)
+        self._jobs[session_id] = job
+        job.task = asyncio.create_task(self._run(job, run))
+        return job
+
+    async def _run(self, job: StoryJob, run: Callable[[StoryJob], Awaitable[Any]]) -> None:
+        if self._slots.locked():
+            await job.emit({
+                "type": "status",
+                "message": "Waiting for a free generation slot...",
+                "phase": "queued"
+            })
+        try:
+            async with self._slots:
+                job.status = "running"
+                self._running += 1
+                try:
+                    await run(job)
+                finally:
+                    self._running -= 1
+            if not job.events.closed:
+                await job.emit({"type": "error", "message": "Story generation ended without a result"})
+            # A run that reported an error (and returned) still failed
+            job.status = "completed" if job.events.outcome == "completed" else "failed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Story job {job.session_id} failed: {e}")
+            job.status = "failed"
+            await job.emit({"type": "error", "message": f"Error during story generation: {str(e)}"})
+        finally:
+            job.events.close()
+            job.finished_at = time.monotonic()
+
+    def get(self, session_id: str) -> Optional[StoryJob]:
+        self._expire_finished()
+        return self._jobs.get(session_id)
+
+    async def attach(self, job: StoryJob, last_seq: int = 0) -> AsyncIterator[dict]:
+        """
+        Replay events after ``last_seq`` and follow the job until it finishes.
+
+        If events after ``last_seq`` were already evicted from the ring buffer,
+        a "resync" event carrying the job's snapshot is yielded first.
+        """
+        buffer = job.events
+        if last_seq + 1 < buffer.first_seq:
+            yield {
+                "type": "resync",
+                "session_id": job.session_id,
+                "seq": buffer.first_seq - 1,
+                **(job.snapshot() if job.snapshot else {})
+            }
+            last_seq = buffer.first_seq - 1
+
+        while True:
+            pending = buffer.events_after(last_seq)
+            if pending:
+                for event in pending:
+                    last_seq = event["seq"]
+                    yield event
+                continue
+            if buffer.closed:
+                return
+            await buffer.wait()
+
+    def _expire_finished(self) -> None:
+        now = time.monotonic()
+        for session_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > self.retention:
+                del self._jobs[session_id]
+
+    def stats(self) -> Dict[str, int]:
+        """Return job counts for health reporting."""
+        return {
+            "running": self._running,
+            "queued": sum(1 for job in self._jobs.values() if job.status == "queued"),
+            "retained": sum(1 for job in self._jobs.values() if job.done),
+            "max_concurrent": self.max_concurrent,
+            "max_per_user": self.max_per_user,
+            "rejected": self.rejected
+        }
+
+    async def shutdown(self) -> None:
+        """Cancel unfinished jobs. Called from the FastAPI lifespan on shutdown."""
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info(f"Cancelled {len(tasks)} unfinished story jobs")
+
+
+# Global instance
+story_job_runner = StoryJobRunner(
+    max_concurrent=int(os.getenv("STORY_JOB_CONCURRENCY", "8")),
+    buffer_size=int(os.getenv("STORY_JOB_BUFFER_EVENTS", "2000")),
+    retention=float(os.getenv("STORY_JOB_RETENTION", "300")),
+    max_per_user=int(os.getenv("STORY_JOB_MAX_PER_USER", "2"))
+)
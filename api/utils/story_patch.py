@@ -0,0 +1,134 @@
+"""Targeted story revisions: SEARCH/REPLACE edits applied to the latest draft."""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# One edit per block; the replacement may be empty to delete a passage
+_EDIT_BLOCK = re.compile(
+    r"^<<<<<<< SEARCH[ \t]*\n(?P<search>.*?)\n=======[ \t]*\n(?:(?P<replace>.*?)\n)?>>>>>>> REPLACE[ \t]*$",
+    re.DOTALL | re.MULTILINE
+)
+
+EDIT_FORMAT = """<<<<<<< SEARCH
+[exact text from the current story, enough to be unique]
+=======
+[replacement text]
+>>>>>>> REPLACE"""
+
+
+class PatchError(ValueError):
+    """Raised when edits cannot be applied to the story cleanly."""
+
+
+@dataclass
+class StoryEdit:
+    """Replace the one passage matching ``search`` with ``replace``."""
+    search: str
+    replace: str
+
+
+def parse_edits(response: str) -> List[StoryEdit]:
+    """The SEARCH/REPLACE edits in a response, in order."""
+    return [StoryEdit(match.group("search"), match.group("replace") or "") for match in _EDIT_BLOCK.finditer(response)]
+
+
+def _locate(story: str, search: str) -> Tuple[int, int]:
+    # Exact text first; models often re-wrap lines or collapse spaces, so
+    # fall back to matching the same words with any whitespace between them
+    count = story.count(search)
+    if count == 1:
+        start = story.find(search)
+        return start, start + len(search)
+    if count == 0 and search.split():
+        pattern = re.compile(r"\s+".join(re.escape(word) for word in search.split()))
+        matches = [match.span() for match in pattern.finditer(story)]
+        if len(matches) == 1:
+            return matches[0]
+        count = len(matches)
+    if count == 0:
+        raise PatchError("its SEARCH text does not appear in the current story")
+    raise PatchError(f"its SEARCH text matches {count} places in the current story; include more context")
+
+
+class StoryPatcher:
+    """
+    Applies a Writer's targeted edits to the latest story.
+
+    Each edit's SEARCH text must identify exactly one passage of the story as
+    it stands after the edits before it. A revision either applies in full or
+    not at all, so a bad edit never leaves a half-revised draft behind.
+    """
+
+    def __init__(self):
+        self.revisions_applied = 0
+        self.revisions_failed = 0
+        self.edits_applied = 0
+        self.chars_saved = 0
+
+    def apply(self, story: Optional[str], edits: List[StoryEdit]) -> str:
+        """
+        Apply edits to a story.
+
+        Args:
+            story: The latest story, without markers (None if there is none yet)
+            edits: Edits parsed from the Writer's response
+
+        Returns:
+            The revised story
+
+        Raises:
+            PatchError: If there is no story, an edit does not match exactly one
+                passage, or the revision would leave an empty story or stray markers
+        """
+        revised = story
+        try:
+            if not story:
+                raise PatchError("There is no saved story to apply the edits to")
+            for number, edit in enumerate(edits, 1):
+                try:
+                    start, end = _locate(revised, edit.search)
+                except PatchError as e:
+                    raise PatchError(f"Edit {number}: {e}") from None
+                revised = revised[:start] + edit.replace + revised[end:]
+            if not revised.strip():
+                raise PatchError("The edits would leave an empty story")
+            if "---BEGIN STORY---" in revised or "---END STORY---" in revised or "<<<<<<< SEARCH" in revised:
+                raise PatchError("The edits would leave story or edit markers inside the story")
+        except PatchError:
+            self.revisions_failed += 1
+            raise
+        self.revisions_applied += 1
+        self.edits_applied += len(edits)
+        return revised
+
+    def expand(self, response: str, story: str) -> str:
+        """
+        The response as if it had been a full rewrite.
+
+        The first edit block is replaced by the whole revised story between
+        markers and the others are dropped; the Writer's notes and handoff
+        stay where they were.
+        """
+        self.chars_saved += max(0, len(story) - len(response))
+        parts, position = [], 0
+        for index, block in enumerate(_EDIT_BLOCK.finditer(response)):
+            parts.append(response[position:block.start()])
+            if index == 0:
+                parts.append(f"---BEGIN STORY---\n{story}\n---END STORY---")
+            position = block.end()
+        parts.append(response[position:])
+        return "".join(parts)
+
+    def stats(self) -> Dict[str, int]:
+        """Return patching statistics for health reporting."""
+        return {
+            "revisions_applied": self.revisions_applied,
+            "revisions_failed": self.revisions_failed,
+            "edits_applied": self.edits_applied,
+            "chars_saved": self.chars_saved
+        }
+
+
+# Global instance
+story_patcher = StoryPatcher()
@@ -1,16 +1,239 @@
 """Session Manager for handling story generation sessions with Supabase backend."""
 import asyncio
-import json
 import logging
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List
 from datetime import datetime, timedelta, timezone
 from uuid import uuid4
-import re
+import os
 
 from supabase import Client
 
+from utils.db_executor import db_executor
+from utils.write_behind import WriteBehindQueue
+
 logger = logging.getLogger(__name__)
 
+STORY_BEGIN_MARKER = "---BEGIN STORY---"
+STORY_END_MARKER = "---END STORY---"
+
+
+# Draft rows are delta-encoded. A full snapshot is written once the deltas since
+# the last snapshot exceed half of the draft, so snapshot sizes grow geometrically
+# and total bytes written stay linear in session length.
+DRAFT_SNAPSHOT_RATIO = 0.5
+# Fall back to a snapshot when less than this fraction of the previous draft
+# (or of its story) is reused
+DRAFT_MIN_REUSE_RATIO = 0.5
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """Length of the common prefix of two strings (binary search over C-level slice compares)."""
+    if b.startswith(a):
+        return len(a)
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    """Length of the common suffix of two strings, at most ``limit``."""
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _story_span(content: str) -> Optional[tuple]:
+    """Start and end of the text between the last BEGIN/END STORY marker pair."""
+    end = content.rfind(STORY_END_MARKER)
+    if end < 0:
+        return None
+    begin = content.rfind(STORY_BEGIN_MARKER, 0, end)
+    if begin < 0:
+        return None
+    return begin + len(STORY_BEGIN_MARKER), end
+
+
+def _encode_story_delta(previous: str, content: str) -> Optional[tuple]:
+    # A revised story usually arrives in a fresh response (new notes, new
+    # handoff) that shares little with the previous draft as a whole; the
+    # story itself mostly keeps its opening and ending
+    previous_span, span = _story_span(previous), _story_span(content)
+    if not previous_span or not span:
+        return None
+    previous_story = previous[previous_span[0]:previous_span[1]]
+    story = content[span[0]:span[1]]
+    keep = _common_prefix_length(previous_story, story)
+    keep_end = _common_suffix_length(previous_story, story, min(len(previous_story), len(story)) - keep)
+    if keep + keep_end < len(previous_story) * DRAFT_MIN_REUSE_RATIO:
+        return None
+    changed = story[keep:len(story) - keep_end]
+    row_content = content[:span[0]] + changed + content[span[1]:]
+    return row_content, {"type": "story_delta", "start": span[0], "changed": len(changed),
+                         "keep": keep, "keep_end": keep_end}
+
+
+def encode_draft(previous: str, content: str, keep: int, delta_chars_since_snapshot: int) -> tuple:
+    """
+    Encode a draft relative to the previous version.
+    
+    Args:
+        previous: The previous draft
+        content: The new draft
+        keep: Length of the common prefix of previous and content
+        delta_chars_since_snapshot: Delta characters written since the last snapshot
+    
+    Returns:
+        Tuple of (row content, delta descriptor). A "delta" row keeps the first
+        ``keep`` characters of the previous version and appends the row content.
+        A "story_delta" row holds the draft in full except for its story, which
+        keeps the first ``keep`` and last ``keep_end`` characters of the previous
+        version's story around the ``changed`` characters stored at ``start``.
+        A "snapshot" row holds the full text.
+    """
+    candidates = []
+    if keep and keep >= len(previous) * DRAFT_MIN_REUSE_RATIO:
+        candidates.append((content[keep:], {"type": "delta", "keep": keep}))
+    story_delta = _encode_story_delta(previous, content)
+    if story_delta:
+        candidates.append(story_delta)
+    if candidates:
+        row_content, delta = min(candidates, key=lambda candidate: len(candidate[0]))
+        if delta_chars_since_snapshot + len(row_content) <= len(content) * DRAFT_SNAPSHOT_RATIO:
+            return row_content, delta
+    return content, {"type": "snapshot"}
+
+
+class DraftChainError(ValueError):
+    """Raised when a draft row cannot be rebuilt from the rows before it."""
+
+
+def decode_draft(previous: str, row: dict) -> str:
+    """Rebuild one draft version from the previous version and its row."""
+    delta = (row.get("agent_feedback") or {}).get("_delta") or {}
+    if delta.get("type") == "delta":
+        return previous[:delta["keep"]] + row["content"]
+    if delta.get("type") == "story_delta":
+        span = _story_span(previous)
+        if not span:
+            raise DraftChainError(f"Draft v{row.get('version')} revises a story the previous version does not have")
+        previous_story = previous[span[0]:span[1]]
+        start, changed = delta["start"], delta["changed"]
+        story = (previous_story[:delta["keep"]] + row["content"][start:start + changed]
+                 + previous_story[len(previous_story) - delta["keep_end"]:])
+        return row["content"][:start] + story + row["content"][start + changed:]
+    # Snapshots and rows written before delta encoding hold the full text
+    return row["content"]
+
+
+def _decode_chain(rows: List[dict], skip_broken: bool) -> List[tuple]:
+    decoded, previous, previous_version = [], None, None
+    for row in rows:
+        delta = (row.get("agent_feedback") or {}).get("_delta") or {}
+        try:
+            if delta.get("type") in ("delta", "story_delta"):
+                # A delta only applies to the exact version it was encoded
+                # against; a missing row in between would silently corrupt it
+                base_version = delta.get("base_version", previous_version)
+                if previous is None or base_version != previous_version:
+                    raise DraftChainError(
+                        f"Draft v{row.get('version')} is a delta on v{base_version}, "
+                        f"but the previous version available is v{previous_version}"
+                    )
+            content = decode_draft(previous or "", row)
+        except DraftChainError:
+            if not skip_broken:
+                raise
+            logger.warning(f"Skipping draft v{row.get('version')}: its base version is missing")
+            previous, previous_version = None, None
+            continue
+        decoded.append((row, content))
+        previous, previous_version = content, row.get("version")
+    return decoded
+
+
+def reconstruct_drafts(rows: List[dict]) -> List[str]:
+    """
+    Every draft version's full text from version-ordered session_drafts rows.
+    
+    Raises:
+        DraftChainError: If a delta row's base version is missing or unusable
+    """
+    return [content for _, content in _decode_chain(rows, skip_broken=False)]
+
+
+def recoverable_drafts(rows: List[dict]) -> List[tuple]:
+    """
+    The (row, full text) pairs that can be rebuilt from version-ordered rows.
+    
+    A delta whose base version is missing is skipped, along with the deltas
+    after it, until the next snapshot restarts the chain.
+    """
+    return _decode_chain(rows, skip_broken=True)
+
+
+def reconstruct_draft(rows: List[dict]) -> str:
+    """Rebuild the latest draft from version-ordered session_drafts rows."""
+    contents = reconstruct_drafts(rows)
+    return contents[-1] if contents else ""
+
+
+class StoryMarkerIndex:
+    r"""
+    Incrementally tracks story marker pairs in a growing draft.
+    
+    Matches re.findall(r'---BEGIN STORY---\s*(.*?)\s*---END STORY---', draft,
+    re.DOTALL): pairs are non-overlapping, each BEGIN pairs with the first END
+    after it, and only the most recent complete pair is kept. When a draft only
+    grows, update() scans just the appended text (plus a marker-length overlap
+    for markers split across saves).
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self) -> None:
+        self.indexed_length = 0
+        self.scan_from = 0
+        self.open_begin: Optional[int] = None
+        self.latest_span: Optional[tuple] = None
+        self.story_count = 0
+    
+    def update(self, content: str, keep: int) -> None:
+        """Index a new draft that shares its first ``keep`` characters with the last one."""
+        if keep < self.indexed_length:
+            self.reset()
+        resume = self.indexed_length
+        
+        while True:
+            if self.open_begin is None:
+                begin = content.find(
+                    STORY_BEGIN_MARKER, max(self.scan_from, resume - len(STORY_BEGIN_MARKER) + 1)
+                )
+                if begin < 0:
+                    break
+                self.open_begin = begin
+            
+            story_start = self.open_begin + len(STORY_BEGIN_MARKER)
+            end = content.find(STORY_END_MARKER, max(story_start, resume - len(STORY_END_MARKER) + 1))
+            if end < 0:
+                break
+            self.latest_span = (story_start, end)
+            self.story_count += 1
+            self.scan_from = end + len(STORY_END_MARKER)
+            self.open_begin = None
+        
+        self.indexed_length = len(content)
+
 
 class StorySession:
     """Represents an active story generation session."""
@@ -24,9 +247,40 @@ class StorySession:
         self.messages: List[dict] = []
         self.current_draft = ""
         self.current_version = 0
+        self.delta_chars_since_snapshot = 0
+        self.story_index = StoryMarkerIndex()
+        self._story_cache_version: Optional[int] = None
+        self._latest_story: Optional[str] = None
+        self._latest_story_words = 0
         self.created_at = datetime.now(timezone.utc)
         self.updated_at = datetime.now(timezone.utc)
         
+    def set_draft(self, content: str, version: int, keep: int = 0) -> None:
+        """Replace the current draft, re-indexing story markers incrementally."""
+        self.current_draft = content
+        self.current_version = version
+        self.story_index.update(content, keep)
+    
+    def _refresh_story_cache(self) -> None:
+        if self._story_cache_version == self.current_version:
+            return
+        span = self.story_index.latest_span
+        self._latest_story = self.current_draft[span[0]:span[1]].strip() if span else None
+        self._latest_story_words = len(self._latest_story.split()) if self._latest_story else 0
+        self._story_cache_version = self.current_version
+    
+    @property
+    def latest_story(self) -> Optional[str]:
+        """The most recent complete story in the draft, cached per version."""
+        self._refresh_story_cache()
+        return self._latest_story
+    
+    @property
+    def latest_story_word_count(self) -> int:
+        """Word count of latest_story, cached per version."""
+        self._refresh_story_cache()
+        return self._latest_story_words
+    
     def to_dict(self) -> dict:
         """Convert session to dictionary for storage."""
         return {
@@ -46,6 +300,14 @@ class StorySessionManager:
         self.supabase = supabase_client
         self.active_sessions: Dict[str, StorySession] = {}
         self._cleanup_task = None
+        # Message/draft inserts are batched off the turn's critical path
+        self.write_queue = WriteBehindQueue(
+            supabase_client,
+            mode=os.getenv("PERSISTENCE_MODE", "write_behind"),
+            flush_interval=float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "0.5")),
+            max_pending=int(os.getenv("PERSISTENCE_MAX_PENDING", "500")),
+            max_attempts=int(os.getenv("PERSISTENCE_MAX_ATTEMPTS", "5"))
+        )
         
     async def create_session(self, user_id: str, config: dict) -> str:
         """Create a new story generation session."""
@@ -53,13 +315,13 @@ class StorySessionManager:
         
         # Create session in database
         try:
-            result = self.supabase.table("story_sessions").insert({
+            result = await db_executor.execute(self.supabase.table("story_sessions").insert({
                 "id": session_id,
                 "user_id": user_id,
                 "config": config,
                 "status": "active",
                 "expires_at": (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat()
-            }).execute()
+            }), "story_sessions.insert")
             
             # Create in-memory session
             session = StorySession(session_id, user_id, config)
@@ -82,31 +344,38 @@ class StorySessionManager:
         if not session:
             raise ValueError(f"Session {session_id} not found")
         
-        # Increment version
-        session.current_version += 1
-        session.current_draft = content
+        # Encode against the previous version so each row only holds what changed
+        keep = _common_prefix_length(session.current_draft, content) if session.current_draft else 0
+        row_content, delta = encode_draft(
+            session.current_draft, content, keep, session.delta_chars_since_snapshot
+        )
+        delta["base_version"] = session.current_version
+        
+        # Increment version and index any new story markers
+        session.set_draft(content, session.current_version + 1, keep)
         session.updated_at = datetime.now(timezone.utc)
+        session.delta_chars_since_snapshot = (
+            0 if delta["type"] == "snapshot" else session.delta_chars_since_snapshot + len(row_content)
+        )
         
         # Save to database
         try:
             draft_data = {
                 "session_id": session_id,
                 "version": session.current_version,
-                "content": content,
-                "agent_feedback": metadata or {}
+                "content": row_content,
+                "agent_feedback": {**(metadata or {}), "_delta": delta}
             }
             
-            result = self.supabase.table("session_drafts").insert(draft_data).execute()
+            await self.write_queue.insert("session_drafts", draft_data)
             
-            # Update in-memory
-            session.drafts.append(draft_data)
+            # Update in-memory; only the stored row is delta-encoded
+            session.drafts.append({**draft_data, "content": content})
             
             # Update session updated_at
-            self.supabase.table("story_sessions").update({
-                "updated_at": session.updated_at.isoformat()
-            }).eq("id", session_id).execute()
+            await self.write_queue.touch_session(session_id, session.updated_at.isoformat())
             
-            logger.info(f"Saved draft v{session.current_version} for session {session_id}")
+            logger.info(f"Saved draft v{session.current_version} ({delta['type']}, {len(row_content)} chars) for session {session_id}")
             return session.current_version
             
         except Exception as e:
@@ -121,20 +390,22 @@ class StorySessionManager:
         return session.current_draft
     
     def extract_story_from_draft(self, session_id: str) -> Optional[str]:
-        """Extract story content from draft between markers."""
-        draft = self.get_latest_draft(session_id)
-        if not draft:
+        """Extract the most recent story content from the draft between markers."""
+        session = self.get_session(session_id)
+        if not session or not session.current_draft:
             return None
-            
-        # Find story between markers
-        pattern = r'---BEGIN STORY---\s*(.*?)\s*---END STORY---'
-        matches = re.findall(pattern, draft, re.DOTALL)
-        
-        if matches:
-            # Return the last (most recent) story
-            return matches[-1].strip()
-        
-        return None
+        if session.latest_story is None and session.drafts and \
+                session.drafts[-1].get("agent_feedback", {}).get("is_final"):
+            # complete_session stores the approved story itself, without markers
+            return session.current_draft.strip()
+        return session.latest_story
+    
+    def get_story_word_count(self, session_id: str) -> int:
+        """Word count of the most recent story in the draft."""
+        session = self.get_session(session_id)
+        if not session:
+            return 0
+        return session.latest_story_word_count
     
     async def save_message(self, session_id: str, agent_name: str, message: str, 
                           turn: int, phase: Optional[str] = None) -> None:
@@ -152,7 +423,7 @@ class StorySessionManager:
                 "phase": phase
             }
             
-            result = self.supabase.table("session_messages").insert(message_data).execute()
+            await self.write_queue.insert("session_messages", message_data)
             
             # Update in-memory
             session.messages.append(message_data)
@@ -171,18 +442,21 @@ class StorySessionManager:
             raise ValueError(f"Session {session_id} not found")
         
         try:
+            # Save final draft and make sure every queued row is written
+            await self.save_draft(session_id, final_story, {"is_final": True})
+            if session_id in await self.write_queue.flush():
+                # They stay queued and are retried (or dead-lettered) by later flushes
+                logger.warning(f"Some drafts or messages of session {session_id} are not written yet")
+            
             # Update session status
             session.status = "completed"
             completed_at = datetime.now(timezone.utc)
             
-            self.supabase.table("story_sessions").update({
+            await db_executor.execute(self.supabase.table("story_sessions").update({
                 "status": "completed",
                 "completed_at": completed_at.isoformat(),
                 "updated_at": completed_at.isoformat()
-            }).eq("id", session_id).execute()
-            
-            # Save final draft
-            await self.save_draft(session_id, final_story, {"is_final": True})
+            }).eq("id", session_id), "story_sessions.update")
             
             logger.info(f"Completed session {session_id}")
             
@@ -202,11 +476,14 @@ class StorySessionManager:
         try:
             session.status = "failed"
             
-            self.supabase.table("story_sessions").update({
+            # Persist whatever the session produced before it failed
+            await self.write_queue.flush()
+            
+            await db_executor.execute(self.supabase.table("story_sessions").update({
                 "status": "failed",
                 "updated_at": datetime.now(timezone.utc).isoformat(),
                 "config": {**session.config, "error": error}
-            }).eq("id", session_id).execute()
+            }).eq("id", session_id), "story_sessions.update")
             
             logger.info(f"Failed session {session_id}: {error}")
             
@@ -220,7 +497,7 @@ class StorySessionManager:
         """Recover a session from database."""
         try:
             # Get session from database
-            result = self.supabase.table("story_sessions").select("*").eq("id", session_id).execute()
+            result = await db_executor.execute(self.supabase.table("story_sessions").select("*").eq("id", session_id), "story_sessions.select")
             
             if not result.data:
                 return None
@@ -242,20 +519,22 @@ class StorySessionManager:
             session.status = session_data["status"]
             
             # Load drafts
-            drafts_result = self.supabase.table("session_drafts").select("*").eq(
+            drafts_result = await db_executor.execute(self.supabase.table("session_drafts").select("*").eq(
                 "session_id", session_id
-            ).order("version", desc=False).execute()
+            ).order("version", desc=False), "session_drafts.select")
             
             if drafts_result.data:
-                session.drafts = drafts_result.data
-                last_draft = drafts_result.data[-1]
-                session.current_draft = last_draft["content"]
-                session.current_version = last_draft["version"]
+                drafts = recoverable_drafts(drafts_result.data)
+                session.drafts = [{**row, "content": content} for row, content in drafts]
+                # Number new versions after every stored row, even one that could not be rebuilt
+                session.set_draft(drafts[-1][1] if drafts else "", drafts_result.data[-1]["version"])
+                # Start the next save from a fresh snapshot
+                session.delta_chars_since_snapshot = len(session.current_draft) + 1
             
             # Load messages
-            messages_result = self.supabase.table("session_messages").select("*").eq(
+            messages_result = await db_executor.execute(self.supabase.table("session_messages").select("*").eq(
                 "session_id", session_id
-            ).order("turn", desc=False).execute()
+            ).order("turn", desc=False), "session_messages.select")
             
             if messages_result.data:
                 session.messages = messages_result.data
@@ -274,10 +553,10 @@ class StorySessionManager:
         """Clean up expired sessions from database."""
         try:
             # Update expired sessions
-            result = self.supabase.table("story_sessions").update({
+            result = await db_executor.execute(self.supabase.table("story_sessions").update({
                 "status": "expired",
                 "updated_at": datetime.now(timezone.utc).isoformat()
-            }).eq("status", "active").lt("expires_at", datetime.now(timezone.utc).isoformat()).execute()
+            }).eq("status", "active").lt("expires_at", datetime.now(timezone.utc).isoformat()), "story_sessions.update")
             
             expired_count = len(result.data) if result.data else 0
             
@@ -327,4 +606,9 @@ class StorySessionManager:
             try:
                 await self._cleanup_task
             except asyncio.CancelledError:
-                pass
\ No newline at end of file
+                pass
+    
+    async def close(self) -> None:
+        """Stop background tasks and flush pending writes. Called on shutdown."""
+        await self.stop_cleanup_task()
+        await self.write_queue.close()
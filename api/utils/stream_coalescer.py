@@ -0,0 +1,94 @@
+"""Coalesces streamed text chunks into fewer, larger WebSocket frames."""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Defaults can be tuned per deployment; a window of 0 sends every chunk as-is
+DEFAULT_WINDOW_MS = float(os.getenv("STREAM_COALESCE_MS", "40"))
+DEFAULT_MAX_BYTES = int(os.getenv("STREAM_COALESCE_BYTES", "1024"))
+
+
+class ChunkCoalescer:
+    """
+    Buffers upstream token deltas and sends them as one frame when either the
+    time window has elapsed since the first buffered chunk or the buffer reaches
+    ``max_bytes``. Frames are sent strictly in order through ``send``.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[None]],
+                 window_ms: float = DEFAULT_WINDOW_MS, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.send = send
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self._buffer: List[str] = []
+        self._buffered_bytes = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._send_lock = asyncio.Lock()
+        self._error: Optional[BaseException] = None
+        self._started = time.perf_counter()
+        self.chunks_in = 0
+        self.frames_out = 0
+
+    async def add(self, chunk: str) -> None:
+        """Buffer a chunk, flushing immediately if the byte threshold is reached."""
+        self._raise_pending_error()
+        if not chunk:
+            return
+        self.chunks_in += 1
+        self._buffer.append(chunk)
+        self._buffered_bytes += len(chunk.encode("utf-8"))
+
+        if self.window <= 0 or self._buffered_bytes >= self.max_bytes:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_window())
+
+    async def flush(self) -> None:
+        """Send everything buffered so far as a single frame."""
+        if self._timer is not None:
+            # Only reachable while the timer is still sleeping, never mid-send
+            self._timer.cancel()
+            self._timer = None
+        async with self._send_lock:
+            if not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._buffered_bytes = 0
+            self.frames_out += 1
+            await self.send(text)
+
+    async def close(self) -> Dict[str, Any]:
+        """Flush the remainder and return the stream statistics."""
+        await self.flush()
+        self._raise_pending_error()
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        """Chunks received, frames sent and the effective frames per second."""
+        elapsed = time.perf_counter() - self._started
+        return {
+            "chunks": self.chunks_in,
+            "frames": self.frames_out,
+            "duration_s": round(elapsed, 3),
+            "frames_per_second": round(self.frames_out / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+    async def _flush_after_window(self) -> None:
+        try:
+            await asyncio.sleep(self.window)
+        except asyncio.CancelledError:
+            return
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # Surface send failures (e.g. a closed socket) to the streaming caller
+            self._error = e
+
+    def _raise_pending_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
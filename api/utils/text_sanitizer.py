@@ -1,7 +1,7 @@
 """Text sanitization utilities to prevent weird characters in output."""
 
 import re
-from typing import Dict
+from typing import Dict, Optional
 
 
 # Character replacement map for common problematic Unicode characters
@@ -23,6 +23,67 @@ CHAR_REPLACEMENTS: Dict[str, str] = {
     '\ufeff': '',  # zero-width no-break space (BOM)
 }
 
+# Single translate table covering the replacements above, removal of control
+# characters (U+0000-U+001F except tab/newline/carriage return, plus U+007F) and
+# the U+FFFD replacement character. Explicit replacements win over removal.
+_CONTROL_CHARS = [c for c in range(0x20) if c not in (0x09, 0x0A, 0x0D)] + [0x7F]
+TRANSLATE_TABLE: Dict[int, Optional[str]] = {
+    **{code: None for code in _CONTROL_CHARS},
+    0xFFFD: '?',
+    **{ord(old_char): new_char for old_char, new_char in CHAR_REPLACEMENTS.items()},
+}
+# ASCII text can only contain the control characters, and str.translate has a
+# fast path for ASCII input
+_ASCII_TRANSLATE_TABLE = {code: value for code, value in TRANSLATE_TABLE.items() if code < 0x80}
+
+_CHAR_MAP: Dict[str, str] = {chr(code): value or '' for code, value in TRANSLATE_TABLE.items()}
+_DELETED_CHARS = ''.join(char for char, value in _CHAR_MAP.items() if not value)
+_C1_CHARS = ''.join(chr(c) for c in range(0x80, 0x90))
+
+# One combined pattern for the character pass on non-ASCII text, matching runs
+# of translate-table and invalid C1 byte characters. CPython's str.translate
+# falls back to a per-character dict lookup for non-ASCII input, which is slower
+# than letting the regex engine skip straight to the few characters that need
+# replacing. A single character class keeps that skip fast.
+_CHAR_PATTERN = re.compile(f'[{re.escape("".join(_CHAR_MAP) + _C1_CHARS)}]+')
+_C1_RUN = re.compile(f'[{re.escape(_C1_CHARS)}]+')
+_MULTIPLE_SPACES = re.compile(r'  +')
+
+# Characters whose output can merge with the following chunk; a streamed chunk
+# is only safe to emit up to the last character outside this set.
+_HOLDBACK_CHARS = frozenset(' \n\u00a0' + _C1_CHARS + _DELETED_CHARS)
+
+
+def _char_replacement(match: re.Match) -> str:
+    run = match.group()
+    replacement = _CHAR_MAP.get(run)
+    if replacement is not None:
+        return replacement
+    # Several characters in a row: translate them, then collapse invalid byte
+    # runs, which may have been separated only by now-deleted characters
+    return _C1_RUN.sub('????', run.translate(TRANSLATE_TABLE))
+
+
+def _sanitize(text: str) -> str:
+    """
+    sanitize_text in a single character pass plus space normalization.
+    
+    Same output as sanitize_text; its low fixed cost per call is what makes
+    sanitizing every streamed chunk cheap.
+    """
+    # Replace problematic characters, drop control characters, mark U+FFFD and
+    # collapse invalid byte runs
+    if text.isascii():
+        text = text.translate(_ASCII_TRANSLATE_TABLE)
+    else:
+        text = _CHAR_PATTERN.sub(_char_replacement, text)
+    
+    # Normalize multiple spaces (but preserve single tabs and newlines). Once
+    # space runs are collapsed, spaces around newlines are single characters.
+    if '  ' in text:
+        text = _MULTIPLE_SPACES.sub(' ', text)
+    return text.replace(' \n', '\n').replace('\n ', '\n')
+
 
 def sanitize_text(text: str) -> str:
     """
@@ -62,6 +123,38 @@ def sanitize_text(text: str) -> str:
     return text
 
 
+class StreamingSanitizer:
+    """
+    Incremental sanitize_text for streamed chunks.
+    
+    Whitespace runs and invalid byte runs can straddle chunk boundaries, so the
+    trailing part of each chunk that could still merge with the next one is held
+    back until more text (or flush) arrives. Concatenating every feed() result
+    and the final flush() equals sanitize_text() of the concatenated input.
+    """
+    
+    def __init__(self):
+        self._pending = ""
+    
+    def feed(self, chunk: str) -> str:
+        """Sanitize a chunk, returning the text that is now safe to emit."""
+        if not chunk:
+            return ""
+        text = self._pending + chunk
+        
+        # Hold back the trailing run of characters a later chunk could extend
+        cut = len(text)
+        while cut and text[cut - 1] in _HOLDBACK_CHARS:
+            cut -= 1
+        self._pending = text[cut:]
+        return _sanitize(text[:cut]) if cut else ""
+    
+    def flush(self) -> str:
+        """Return the sanitized remainder at the end of the stream."""
+        text, self._pending = self._pending, ""
+        return _sanitize(text) if text else ""
+
+
 def detect_problematic_chars(text: str) -> Dict[str, int]:
     """
     Detect problematic characters in text for debugging.
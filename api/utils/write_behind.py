@@ -0,0 +1,224 @@
+"""Write-behind queue that batches session inserts into multi-row writes."""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from supabase import Client
+
+from utils.db_executor import db_executor
+
+logger = logging.getLogger(__name__)
+# Rows given up on after repeated failures, one JSON line each, for manual replay
+dead_letter_logger = logging.getLogger(f"{__name__}.dead_letter")
+
+# Durability modes
+WRITE_THROUGH = "write_through"  # every write hits the database before returning
+WRITE_BEHIND = "write_behind"    # writes are buffered and flushed in batches
+
+# Natural keys rows are upserted on, so a batch that is sent again (after a
+# timeout whose insert still committed, say) is not written twice. Each needs
+# a unique constraint on these columns in the database; see
+# supabase/migrations/20261017000000_session_write_keys.sql.
+CONFLICT_KEYS = {
+    "session_drafts": "session_id,version",
+    "session_messages": "session_id,turn,agent_name",
+}
+
+
+def _missing_conflict_target(error: Exception) -> bool:
+    """Whether Postgres rejected an upsert because its conflict columns have no unique constraint."""
+    return getattr(error, "code", None) == "42P10" or "no unique or exclusion constraint" in str(error)
+
+
+class WriteBehindQueue:
+    """
+    Buffers session_messages/session_drafts inserts and story_sessions.updated_at
+    touches, flushing them as one multi-row insert per table plus one update per
+    session every ``flush_interval`` seconds.
+
+    Rows are written per table and session, so one session's failing writes
+    never hold up another's. A failed batch is retried on later flushes, up to
+    ``max_attempts`` times, and then moved to the dead-letter log.
+
+    Memory is bounded by ``max_pending`` rows: once reached, the writer awaits a
+    flush before its row is accepted. In write-behind mode a crash can lose up
+    to one flush interval of rows; use write-through mode when that is not
+    acceptable.
+    """
+
+    def __init__(self, supabase_client: Client, mode: str = WRITE_BEHIND,
+                 flush_interval: float = 0.5, max_pending: int = 500, max_attempts: int = 5):
+        if mode not in (WRITE_THROUGH, WRITE_BEHIND):
+            raise ValueError(f"Unknown persistence mode: {mode}")
+        self.supabase = supabase_client
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._rows: Dict[str, List[dict]] = {}
+        self._touched: Dict[str, str] = {}
+        # Consecutive failed flushes per (table, session_id)
+        self._attempts: Dict[Tuple[str, str], int] = {}
+        self.dead_letters: deque = deque(maxlen=100)
+        self.rows_dead_lettered = 0
+        # Tables whose database lacks the CONFLICT_KEYS constraint
+        self._plain_insert: Set[str] = set()
+        self._flush_lock = asyncio.Lock()
+        self._flusher_task: Optional[asyncio.Task] = None
+        self.flush_count = 0
+        self.rows_written = 0
+
+    @property
+    def pending(self) -> int:
+        return sum(len(rows) for rows in self._rows.values())
+
+    async def insert(self, table: str, row: dict) -> None:
+        """Queue a row for insertion (or insert immediately in write-through mode)."""
+        if self.mode == WRITE_THROUGH:
+            await self._execute_write(table, row, f"{table}.insert")
+            self.rows_written += 1
+            return
+
+        if self.pending >= self.max_pending:
+            # Apply backpressure instead of growing without bound
+            await self.flush()
+        self._rows.setdefault(table, []).append(row)
+        self._ensure_flusher()
+
+    async def touch_session(self, session_id: str, updated_at: str) -> None:
+        """Record a story_sessions.updated_at change, coalesced per flush."""
+        if self.mode == WRITE_THROUGH:
+            await db_executor.execute(self.supabase.table("story_sessions").update({
+                "updated_at": updated_at
+            }).eq("id", session_id), "story_sessions.update")
+            return
+
+        self._touched[session_id] = updated_at
+        self._ensure_flusher()
+
+    def _write(self, table: str, payload):
+        conflict_key = CONFLICT_KEYS.get(table)
+        if conflict_key and table not in self._plain_insert:
+            return self.supabase.table(table).upsert(payload, on_conflict=conflict_key, ignore_duplicates=True)
+        return self.supabase.table(table).insert(payload)
+
+    async def _execute_write(self, table: str, payload, operation: str):
+        try:
+            return await db_executor.execute(self._write(table, payload), operation)
+        except Exception as e:
+            if table in self._plain_insert or not _missing_conflict_target(e):
+                raise
+        # Without the constraint every upsert fails; inserting is better than
+        # dead-lettering the rows, at the cost of duplicates on a resent batch
+        self._plain_insert.add(table)
+        logger.warning(f"{table} has no unique constraint on ({CONFLICT_KEYS[table]}); falling back to plain "
+                       f"inserts. Apply supabase/migrations/20261017000000_session_write_keys.sql")
+        return await db_executor.execute(self._write(table, payload), operation)
+
+    def _failed(self, table: str, session_id: str, rows: List[dict], error: Exception) -> bool:
+        """Count a failed write; returns whether to retry it, dead-lettering the rows if not."""
+        key = (table, session_id)
+        self._attempts[key] = self._attempts.get(key, 0) + 1
+        if self._attempts[key] < self.max_attempts:
+            return True
+        del self._attempts[key]
+        self.rows_dead_lettered += len(rows)
+        for row in rows:
+            self.dead_letters.append({"table": table, "row": row, "error": str(error)})
+            dead_letter_logger.error(json.dumps({"table": table, "row": row, "error": str(error)}, default=str))
+        logger.error(f"Gave up writing {len(rows)} {table} row(s) for session {session_id} after "
+                     f"{self.max_attempts} attempts: {error}")
+        return False
+
+    async def flush(self) -> Set[str]:
+        """
+        Write every buffered row and session touch.
+
+        Returns:
+            The sessions some of whose writes failed; they stay queued for a
+            later flush unless they have run out of attempts
+        """
+        async with self._flush_lock:
+            rows, self._rows = self._rows, {}
+            touched, self._touched = self._touched, {}
+            failed: Set[str] = set()
+
+            # Tables are flushed in insertion order so drafts stay version-ordered
+            for table, table_rows in rows.items():
+                by_session: Dict[str, List[dict]] = {}
+                for row in table_rows:
+                    by_session.setdefault(row.get("session_id"), []).append(row)
+                for session_id, batch in by_session.items():
+                    try:
+                        await self._execute_write(table, batch, f"{table}.insert_batch")
+                    except Exception as e:
+                        failed.add(session_id)
+                        logger.error(f"Write-behind flush of {len(batch)} {table} row(s) for session "
+                                     f"{session_id} failed: {e}")
+                        if self._failed(table, session_id, batch, e):
+                            # Back in front of anything queued meanwhile
+                            self._rows[table] = batch + self._rows.get(table, [])
+                        continue
+                    self._attempts.pop((table, session_id), None)
+                    self.rows_written += len(batch)
+
+            for session_id, updated_at in touched.items():
+                try:
+                    await db_executor.execute(self.supabase.table("story_sessions").update({
+                        "updated_at": updated_at
+                    }).eq("id", session_id), "story_sessions.update")
+                except Exception as e:
+                    failed.add(session_id)
+                    logger.error(f"Write-behind touch of session {session_id} failed: {e}")
+                    if self._failed("story_sessions", session_id, [{"id": session_id, "updated_at": updated_at}], e):
+                        self._touched.setdefault(session_id, updated_at)
+                    continue
+                self._attempts.pop(("story_sessions", session_id), None)
+
+            self.flush_count += 1
+            return failed
+
+    def _ensure_flusher(self) -> None:
+        """Start the periodic flusher the first time work is queued."""
+        if self._flusher_task is None or self._flusher_task.done():
+            self._flusher_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if not self._rows and not self._touched:
+                continue
+            try:
+                failed = await self.flush()
+                if failed:
+                    logger.warning(f"Write-behind flush left {self.pending} rows pending for "
+                                   f"{len(failed)} session(s)")
+            except Exception as e:
+                logger.error(f"Error in write-behind flush loop: {e}")
+
+    async def close(self) -> None:
+        """Stop the flusher and write out anything still buffered."""
+        if self._flusher_task:
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+            self._flusher_task = None
+        if self._rows or self._touched:
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue statistics for health reporting."""
+        return {
+            "mode": self.mode,
+            "pending_rows": self.pending,
+            "pending_session_touches": len(self._touched),
+            "flushes": self.flush_count,
+            "rows_written": self.rows_written,
+            "rows_dead_lettered": self.rows_dead_lettered,
+            "plain_insert_tables": sorted(self._plain_insert)
+        }
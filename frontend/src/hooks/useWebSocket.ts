@@ -3,7 +3,7 @@ import { io, Socket } from 'socket.io-client'
 import { ThemeOptions } from '@/types/themeOptions'
 
 export interface AgentMessage {
-  type: 'status' | 'agent_message' | 'completed' | 'error' | 'agent_update' | 'agent_stream_chunk' | 'session_created' | 'auth_success'
+  type: 'status' | 'agent_message' | 'completed' | 'error' | 'agent_update' | 'agent_stream_chunk' | 'agent_stream_reset' | 'session_created' | 'auth_success' | 'resync' | 'usage'
   agent?: string
   message: string
   turn?: number
@@ -13,6 +13,8 @@ export interface AgentMessage {
   activity?: string
   chunk?: string
   session_id?: string
+  seq?: number
+  messages?: { agent: string; message: string; turn: number; phase?: string }[]
 }
 
 export interface StoryGenerationParams {
@@ -46,6 +48,12 @@ export function useWebSocket(url: string = 'http://localhost:8000', getAuthToken
   const [streamingMessages, setStreamingMessages] = useState<Record<string, string>>({})
   const [currentStreamingAgent, setCurrentStreamingAgent] = useState<string | null>(null)
   const socketRef = useRef<WebSocket | null>(null)
+  // Story jobs keep running server-side when the socket drops; these let us
+  // reconnect and resume the event stream from the last sequence number seen
+  const sessionIdRef = useRef<string | null>(null)
+  const lastSeqRef = useRef(0)
+  const generatingRef = useRef(false)
+  const closingRef = useRef(false)
 
   const connect = useCallback(() => {
     if (socketRef.current?.readyState === WebSocket.OPEN) return
@@ -63,6 +71,15 @@ export function useWebSocket(url: string = 'http://localhost:8000', getAuthToken
             type: 'auth',
             token: token
           }))
+          
+          // Pick up an in-progress generation after a dropped connection
+          if (generatingRef.current && sessionIdRef.current) {
+            ws.send(JSON.stringify({
+              type: 'resume',
+              session_id: sessionIdRef.current,
+              last_seq: lastSeqRef.current
+            }))
+          }
         } else {
           console.error('No auth token available')
           ws.close()
@@ -76,6 +93,18 @@ export function useWebSocket(url: string = 'http://localhost:8000', getAuthToken
     ws.onmessage = (event) => {
       const data: AgentMessage = JSON.parse(event.data)
       
+      if (data.seq) {
+        lastSeqRef.current = data.seq
+      }
+      
+      // Missed more events than the server buffers: rebuild from its snapshot
+      if (data.type === 'resync') {
+        setMessages((data.messages || []).map(m => ({ type: 'agent_message' as const, ...m })))
+        setStreamingMessages({})
+        setCurrentStreamingAgent(null)
+        return
+      }
+      
       // Handle auth response
       if (data.type === 'auth_success') {
         console.log('Authentication successful')
@@ -86,6 +115,7 @@ export function useWebSocket(url: string = 'http://localhost:8000', getAuthToken
       if (data.type === 'session_created' && data.session_id) {
         console.log('Session created:', data.session_id)
         setCurrentSessionId(data.session_id)
+        sessionIdRef.current = data.session_id
       }
       
       setMessages(prev => [...prev, data])
@@ -119,6 +149,15 @@ export function useWebSocket(url: string = 'http://localhost:8000', getAuthToken
         }))
       }
       
+      // The agent's response restarted after a dropped stream: discard its partial text
+      if (data.type === 'agent_stream_reset' && data.agent) {
+        setStreamingMessages(prev => {
+          const newState = { ...prev }
+          delete newState[data.agent!]
+          return newState
+        })
+      }
+      
       // Reset all agents to waiting when a new one becomes active
       if (data.type === 'agent_message' && data.agent) {
         // Clear streaming message for this agent since we now have the complete message
@@ -139,6 +178,7 @@ export function useWebSocket(url: string = 'http://localhost:8000', getAuthToken
       }
       
       if (data.type === 'completed' || data.type === 'error') {
+        generatingRef.current = false
         setIsGenerating(false)
         setCurrentAgent(null)
         setCurrentPhase(null)
@@ -167,7 +207,14 @@ export function useWebSocket(url: string = 'http://localhost:8000', getAuthToken
       console.log('WebSocket disconnected')
       console.log('Close event code:', event.code, 'reason:', event.reason)
       setIsConnected(false)
-      setIsGenerating(false)
+      socketRef.current = null
+      
+      // The story keeps generating server-side; reconnect and resume it
+      if (generatingRef.current && sessionIdRef.current && !closingRef.current) {
+        setTimeout(() => connect(), 1000)
+      } else {
+        setIsGenerating(false)
+      }
       
       // Log specific close reasons
       if (event.code === 1006) {
@@ -175,6 +222,7 @@ export function useWebSocket(url: string = 'http://localhost:8000', getAuthToken
       }
     }
 
+    closingRef.current = false
     socketRef.current = ws
   }, [url])
 
@@ -188,12 +236,16 @@ export function useWebSocket(url: string = 'http://localhost:8000', getAuthToken
     setStreamingMessages({})
     setCurrentStreamingAgent(null)
     setCurrentSessionId(null)
+    sessionIdRef.current = null
+    lastSeqRef.current = 0
+    generatingRef.current = true
     setIsGenerating(true)
     socketRef.current.send(JSON.stringify(params))
   }, [])
 
   const disconnect = useCallback(() => {
     if (socketRef.current) {
+      closingRef.current = true
       socketRef.current.close()
       socketRef.current = null
     }
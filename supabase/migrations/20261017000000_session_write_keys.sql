@@ -0,0 +1,23 @@
+-- Natural keys the API's write-behind queue upserts session rows on
+-- (api/utils/write_behind.py CONFLICT_KEYS), so a batch that is sent again
+-- after a timeout whose insert still committed is not written twice.
+
+-- Earlier deployments inserted without a key; keep the first copy of any duplicate
+DELETE FROM session_drafts a
+USING session_drafts b
+WHERE a.session_id = b.session_id
+  AND a.version = b.version
+  AND a.ctid > b.ctid;
+
+DELETE FROM session_messages a
+USING session_messages b
+WHERE a.session_id = b.session_id
+  AND a.turn = b.turn
+  AND a.agent_name = b.agent_name
+  AND a.ctid > b.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS session_drafts_session_id_version_key
+    ON session_drafts (session_id, version);
+
+CREATE UNIQUE INDEX IF NOT EXISTS session_messages_session_id_turn_agent_name_key
+    ON session_messages (session_id, turn, agent_name);